@@ -0,0 +1,161 @@
+"""
+Benchmark de arranque en frío del servicio.
+
+Cada corrida usa procesos nuevos, como una instancia de Cloud Run que escala desde cero:
+mide cuánto tarda `import main`, cuánto tarda uvicorn en responder `GET /` (incluye el
+lifespan y, con --warmup, el reporte desechable) y la latencia del primer y del segundo
+`POST /generar-pdf`. Guarda los resultados en JSON y los compara contra una línea base.
+
+Uso:
+    python benchmarks/bench_cold_start.py --runs 5 --output cold.json
+    python benchmarks/bench_cold_start.py --warmup --baseline cold.json
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+from bench_report import ROOT, build_payload, git_commit
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+METRICS = ("import_ms", "ready_ms", "first_request_ms", "second_request_ms")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_import(env):
+    """Seconds spent in `import main` in a fresh interpreter."""
+    out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return float(out.strip().splitlines()[-1])
+
+
+def post_pdf(url, body):
+    """POSTs a payload and returns the seconds until the whole PDF has been read."""
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    started = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=120) as response:
+        response.read()
+    return time.perf_counter() - started
+
+
+def measure_server(env, body, timeout=60):
+    """Starts uvicorn and returns (seconds until GET / answers, first POST, second POST)."""
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn terminó con código {server.returncode}")
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError("uvicorn no respondió a tiempo")
+            try:
+                with urllib.request.urlopen(base + "/", timeout=1) as response:
+                    response.read()
+                break
+            except OSError:
+                time.sleep(0.02)
+        ready = time.perf_counter() - started
+        first = post_pdf(base + "/generar-pdf", body)
+        second = post_pdf(base + "/generar-pdf", body)
+        return ready, first, second
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def run(args):
+    env = dict(os.environ, PDF_LOG_LEVEL="WARNING", PDF_WARMUP="1" if args.warmup else "0",
+               PDF_CACHE_MAX_BYTES="0", PDF_CACHE_DIR="")
+    payload = build_payload(args.subdims, args.indicadores, args.rows, args.seed)
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+    samples = {metric: [] for metric in METRICS}
+    for _ in range(args.runs):
+        samples["import_ms"].append(measure_import(env) * 1000)
+        ready, first, second = measure_server(env, body)
+        samples["ready_ms"].append(ready * 1000)
+        samples["first_request_ms"].append(first * 1000)
+        samples["second_request_ms"].append(second * 1000)
+
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "params": {
+            "warmup": args.warmup, "runs": args.runs, "subdims": args.subdims,
+            "indicadores": args.indicadores, "rows": args.rows, "seed": args.seed,
+        },
+        "metrics": {
+            metric: {"p50_ms": round(statistics.median(values), 1), "max_ms": round(max(values), 1)}
+            for metric, values in samples.items()
+        },
+    }
+
+
+def compare(result, baseline, max_regression):
+    """Prints p50 deltas against the baseline and returns the metrics that regressed."""
+    if baseline.get("params", {}).get("warmup") != result["params"]["warmup"]:
+        print("⚠️ La línea base se midió con otro modo de warmup; la comparación es orientativa.")
+    regressions = []
+    print(f"\nComparación contra {baseline.get('commit') or 'línea base'}:")
+    for metric, current in result["metrics"].items():
+        before = baseline.get("metrics", {}).get(metric)
+        if not before or not before["p50_ms"]:
+            continue
+        delta = current["p50_ms"] / before["p50_ms"] - 1
+        mark = "❌" if delta > max_regression else "  "
+        print(f"{mark} {metric:<18} {before['p50_ms']:>9.1f} → {current['p50_ms']:>9.1f} ms ({delta:+.1%})")
+        if delta > max_regression:
+            regressions.append(metric)
+    return regressions
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de arranque en frío del servicio.")
+    parser.add_argument("--runs", type=int, default=5, help="arranques en frío medidos")
+    parser.add_argument("--warmup", action="store_true", help="arrancar con PDF_WARMUP=1")
+    parser.add_argument("--subdims", type=int, default=4, help="subdimensiones por dimensión")
+    parser.add_argument("--indicadores", type=int, default=5, help="indicadores no atendidos por subdimensión")
+    parser.add_argument("--rows", type=int, default=30, help="filas de salarios y composicion_sexo")
+    parser.add_argument("--seed", type=int, default=0, help="semilla del generador")
+    parser.add_argument("--output", help="archivo JSON donde guardar los resultados")
+    parser.add_argument("--baseline", help="resultados JSON previos para comparar")
+    parser.add_argument("--max-regression", type=float, default=0.15,
+                        help="regresión máxima tolerada en p50 (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    result = run(args)
+    print(f"📊 {args.runs} arranques en frío (warmup {'activado' if args.warmup else 'desactivado'})")
+    for metric, values in result["metrics"].items():
+        print(f"   {metric:<18} p50 {values['p50_ms']:>9.1f} ms   max {values['max_ms']:>9.1f} ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"✅ Resultados guardados en {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(result, baseline, args.max_regression):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
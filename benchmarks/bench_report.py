@@ -0,0 +1,256 @@
+"""
+Benchmark de create_pdf_in_memory con payloads sintéticos de tamaño escalable.
+
+Genera un ReporteData con 9 dimensiones, N subdimensiones por dimensión, M indicadores
+no atendidos por subdimensión y listas largas de salarios/composicion_sexo, usando los
+fixtures de data/*.json como semilla. Mide por separado validación, armado del story,
+doc.build (layout) y serialización (canvas.save); reporta p50/p95, memoria pico y bytes
+de salida (por tipo: fuentes, imágenes, streams de página, forms), y guarda los resultados en JSON para compararlos contra una línea base.
+
+Uso:
+    python benchmarks/bench_report.py --subdims 4 --indicadores 6 --rows 40
+    python benchmarks/bench_report.py --output bench.json
+    python benchmarks/bench_report.py --baseline bench.json --max-regression 0.15
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = ROOT / "data"
+sys.path.insert(0, str(ROOT))
+
+from scoring import BANDS, META_RATIO, band_index  # noqa: E402
+
+STAGES = ("validate", "story", "build", "serialize", "splice", "total")
+
+
+def load_seeds():
+    """Reads the fixtures used as seeds for the synthetic payload."""
+    def read(name):
+        with open(DATA_DIR / name, encoding="utf-8") as f:
+            return json.load(f)
+
+    tabla = read("tabla_subdimensiones.json")["dimensiones"]
+    detalles = read("data_dimensiones.json")
+    preguntas = [p for d in detalles for pna in d.get("puntos_no_atendidos", []) for p in pna["preguntas"]]
+    brechas = read("detalles_dim_4.json")["brecha_por_genero"]
+    categorias = [s["categoría"] for s in read("detalles_dim_5.json")["salario_promedio_por_categoria"]]
+    return tabla, preguntas, brechas, categorias
+
+
+def build_payload(subdims, indicadores, rows, seed=0):
+    """Builds a ReporteData-shaped dict; the same arguments always give the same payload."""
+    rng = random.Random(seed)
+    tabla, preguntas, brechas, categorias = load_seeds()
+    nombres_sub = [s["nombre"] for d in tabla for s in d["subdimensiones"]]
+
+    dimensiones, grafica = [], []
+    for i, dim in enumerate(tabla[:9]):
+        subdimensiones = []
+        for j in range(subdims):
+            total = rng.randint(max(indicadores, 4), max(indicadores, 4) + 8)
+            atendidos = total - indicadores
+            porcentaje = round(atendidos / total * 100, 1)
+            subdimensiones.append({
+                "nombre": nombres_sub[(i * subdims + j) % len(nombres_sub)],
+                "total_indicadores": total,
+                "indicadores_atendidos": atendidos,
+                "porcentaje": porcentaje,
+                "meta_80": round(total * META_RATIO, 1),
+                "semaforo": BANDS[band_index(porcentaje)].capitalize(),
+                "indicadores_no_atendidos": [{"texto": rng.choice(preguntas)} for _ in range(indicadores)],
+            })
+        dimensiones.append({"orden": dim["id"], "nombre": dim["nombre"], "subdimensiones": subdimensiones})
+        grafica.append({"dimensionNombre": dim["nombre"], "porcentaje": round(rng.uniform(10, 100), 1)})
+
+    composicion = []
+    for k in range(rows):
+        b = brechas[k % len(brechas)]
+        mujeres, hombres = rng.randint(0, 60), rng.randint(0, 60)
+        composicion.append({
+            "pregunta_texto": b["pregunta"],
+            "descripcion": f'{b["grupo_o_categoria"]} {k + 1}',
+            "cantidad_mujeres": mujeres,
+            "cantidad_hombres": hombres,
+            "diferencia": abs(hombres - mujeres),
+        })
+    salarios = []
+    for k in range(rows):
+        hombres, mujeres = rng.randrange(3000, 40000, 500), rng.randrange(3000, 40000, 500)
+        salarios.append({
+            "categoria_nombre": f"{categorias[k % len(categorias)]} {k + 1}",
+            "cantidad_hombres": hombres,
+            "cantidad_mujeres": mujeres,
+            "diferencia": abs(hombres - mujeres),
+        })
+
+    return {
+        "organizacion": {
+            "nombre": "Institución de prueba", "responsable": "Responsable de prueba",
+            "cargo_responsable": "Rectoría", "fecha_aplicacion": "2025-01-01", "folio": "BENCH-0001",
+        },
+        "metadata": {},
+        "dimensiones": dimensiones,
+        "grafica_dimensiones": grafica,
+        "composicion_sexo": composicion,
+        "salarios": salarios,
+        "quejas": {
+            "quejas_personal_recibidas_mujeres": rng.randint(0, 20), "quejas_personal_recibidas_hombres": rng.randint(0, 20),
+            "quejas_personal_resueltas_mujeres": rng.randint(0, 20), "quejas_personal_resueltas_hombres": rng.randint(0, 20),
+            "quejas_estudiantes_recibidas_mujeres": rng.randint(0, 20), "quejas_estudiantes_recibidas_hombres": rng.randint(0, 20),
+            "quejas_estudiantes_resueltas_mujeres": rng.randint(0, 20), "quejas_estudiantes_resueltas_hombres": rng.randint(0, 20),
+        },
+        "atenciones": {
+            "atencion_reclutamiento": rng.randint(0, 10), "atencion_procesos_laborales": rng.randint(0, 10),
+            "atencion_estudiantes": rng.randint(0, 10),
+        },
+    }
+
+
+def render_once(main, payload):
+    """Runs one validation + render and returns (stage seconds, PDF bytes)."""
+    started = time.perf_counter()
+    data = main.ReporteData.model_validate(payload)
+    stats = {"validate": time.perf_counter() - started}
+    buffer = main.create_pdf_in_memory(data, stats=stats)
+    stats["total"] = time.perf_counter() - started
+    return stats, buffer.getvalue()
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    # Solo advertencias y errores del servicio; los logs de depuración no deben entrar en la medición.
+    os.environ.setdefault("PDF_LOG_LEVEL", "WARNING")
+    import main
+    import reportlab
+
+    payload = build_payload(args.subdims, args.indicadores, args.rows, args.seed)
+    for _ in range(args.warmup):
+        render_once(main, payload)
+
+    samples = {stage: [] for stage in STAGES}
+    sections = {}
+    for _ in range(args.iterations):
+        stats, pdf = render_once(main, payload)
+        for stage in STAGES:
+            samples[stage].append(stats.get(stage, 0.0))
+        for name, span in stats.get("spans", {}).items():
+            sections.setdefault(name, []).append(span["seconds"])
+
+    # Pasada aparte: tracemalloc frena el render y distorsionaría los tiempos.
+    tracemalloc.start()
+    render_once(main, payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "reportlab": reportlab.Version,
+        "params": {
+            "subdims": args.subdims, "indicadores": args.indicadores, "rows": args.rows,
+            "seed": args.seed, "iterations": args.iterations, "warmup": args.warmup,
+        },
+        "payload_bytes": len(json.dumps(payload, ensure_ascii=False).encode("utf-8")),
+        "pages": stats["pages"],
+        "output_bytes": len(pdf),
+        "output_breakdown": main.pdf_byte_breakdown(pdf),
+        "peak_memory_bytes": peak,
+        "stages": {
+            stage: {
+                "p50_ms": round(statistics.median(values) * 1000, 3),
+                "p95_ms": round(percentile(values, 95) * 1000, 3),
+                "min_ms": round(min(values) * 1000, 3),
+            }
+            for stage, values in samples.items()
+        },
+        "sections_p50_ms": {name: round(statistics.median(values) * 1000, 3) for name, values in sections.items()},
+    }
+
+
+def compare(result, baseline, max_regression):
+    """Prints p50 deltas against the baseline and returns the stages that regressed."""
+    payload_params = ("subdims", "indicadores", "rows", "seed")
+    if any(baseline.get("params", {}).get(k) != result["params"][k] for k in payload_params):
+        print("⚠️ La línea base se midió con otros parámetros; la comparación es orientativa.")
+    regressions = []
+    print(f"\nComparación contra {baseline.get('commit') or 'línea base'}:")
+    for stage, current in result["stages"].items():
+        before = baseline.get("stages", {}).get(stage)
+        # Etapas por debajo de 1 ms (validación, splice sin render por secciones) son puro ruido.
+        if not before or before["p50_ms"] < 1:
+            continue
+        delta = current["p50_ms"] / before["p50_ms"] - 1
+        mark = "❌" if delta > max_regression else "  "
+        print(f"{mark} {stage:<10} {before['p50_ms']:>9.1f} → {current['p50_ms']:>9.1f} ms ({delta:+.1%})")
+        if delta > max_regression:
+            regressions.append(stage)
+    for key in ("output_bytes", "peak_memory_bytes"):
+        if key in baseline:
+            print(f"   {key:<18} {baseline[key]:>10} → {result[key]:>10}")
+    for kind, before in baseline.get("output_breakdown", {}).items():
+        if kind != "total" and isinstance(before, int):
+            print(f"   {kind + '_bytes':<18} {before:>10} → {result['output_breakdown'][kind]:>10}")
+    return regressions
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de generación de reportes PDF.")
+    parser.add_argument("--subdims", type=int, default=4, help="subdimensiones por dimensión (N)")
+    parser.add_argument("--indicadores", type=int, default=5, help="indicadores no atendidos por subdimensión (M)")
+    parser.add_argument("--rows", type=int, default=30, help="filas de salarios y composicion_sexo")
+    parser.add_argument("--seed", type=int, default=0, help="semilla del generador")
+    parser.add_argument("--iterations", type=int, default=10, help="repeticiones medidas")
+    parser.add_argument("--warmup", type=int, default=2, help="repeticiones de calentamiento")
+    parser.add_argument("--output", help="archivo JSON donde guardar los resultados")
+    parser.add_argument("--baseline", help="resultados JSON previos para comparar")
+    parser.add_argument("--max-regression", type=float, default=0.15,
+                        help="regresión máxima tolerada en p50 (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    result = run(args)
+    print(f"📊 {result['pages']} páginas, {result['output_bytes']} bytes, "
+          f"memoria pico {result['peak_memory_bytes'] / 1024 / 1024:.1f} MB")
+    breakdown = result["output_breakdown"]
+    print("   bytes: " + ", ".join(f"{kind} {breakdown[kind]}" for kind in ("fonts", "images", "content", "forms", "other")))
+    for stage, values in result["stages"].items():
+        print(f"   {stage:<10} p50 {values['p50_ms']:>9.1f} ms   p95 {values['p95_ms']:>9.1f} ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"✅ Resultados guardados en {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(result, baseline, args.max_regression):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
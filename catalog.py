@@ -0,0 +1,97 @@
+"""
+Catálogo de dimensiones, subdimensiones e indicadores del autodiagnóstico DIGEI.
+
+Los textos del catálogo son los mismos para todas las instituciones: el payload puede mandar
+solo el `id` de cada entrada ("1" dimensión, "1.1" subdimensión, "1.1.1" indicador) y el
+servicio completa el texto al validar. El archivo (data/catalogo.json) lleva una `version`;
+un payload que declara otra versión se rechaza en vez de mezclar textos.
+
+El catálogo se carga una vez en tuplas planas (ids, textos, entrada padre) con un índice
+id -> posición, y se vuelve a leer solo si cambia el archivo.
+"""
+import hashlib
+import json
+import threading
+from pathlib import Path
+
+CATALOG_PATH = Path(__file__).parent / "data" / "catalogo.json"
+LEVELS = ("dimensiones", "subdimensiones", "indicadores")
+
+
+class Catalog:
+    '''
+    Read-only catalog: entry i has ids[i], texts[i] (name or question text) and parents[i]
+    (position of its parent entry, -1 for dimensions), in document order.
+    '''
+    __slots__ = ("version", "digest", "ids", "texts", "parents", "_index", "_texts")
+
+    def __init__(self, raw):
+        document = json.loads(raw)
+        ids, texts, parents = [], [], []
+
+        def load(entries, level, parent):
+            for entry in entries:
+                entry_id = str(entry["id"])
+                if parent >= 0 and entry_id.rpartition(".")[0] != ids[parent]:
+                    raise ValueError(f"El id {entry_id} no pertenece a {ids[parent]}")
+                position = len(ids)
+                ids.append(entry_id)
+                texts.append(entry.get("nombre") or entry.get("texto") or "")
+                parents.append(parent)
+                if level + 1 < len(LEVELS):
+                    load(entry.get(LEVELS[level + 1], ()), level + 1, position)
+
+        load(document.get("dimensiones", ()), 0, -1)
+        self.version = str(document.get("version", ""))
+        self.digest = hashlib.sha256(raw).hexdigest()
+        self.ids = tuple(ids)
+        self.texts = tuple(texts)
+        self.parents = tuple(parents)
+        self._index = {entry_id: i for i, entry_id in enumerate(ids)}
+        if len(self._index) != len(ids):
+            raise ValueError("El catálogo tiene ids repetidos")
+        self._texts = frozenset(texts)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, entry_id):
+        return entry_id in self._index
+
+    def text(self, entry_id, level=None):
+        '''
+        Name or question text of an entry; KeyError for an unknown id or, with `level` (index in
+        LEVELS), for an id of another level. Child ids extend their parent's, so the level is the
+        number of dots.
+        '''
+        if level is not None and entry_id.count(".") != level:
+            raise KeyError(entry_id)
+        return self.texts[self._index[entry_id]]
+
+    def parent(self, entry_id):
+        '''Id of the parent entry, None for a dimension.'''
+        parent = self.parents[self._index[entry_id]]
+        return self.ids[parent] if parent >= 0 else None
+
+    def has_text(self, text):
+        '''True when `text` is the text of some entry (same text in every report).'''
+        return text in self._texts
+
+
+_catalog = {"signature": None, "catalog": None}
+_catalog_lock = threading.Lock()
+
+
+def get_catalog(path=CATALOG_PATH):
+    '''The catalog in `path`, parsed again only when the file changes (None if there is no file).'''
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    signature = (str(path), stat.st_mtime_ns, stat.st_size)
+    if _catalog["signature"] != signature:
+        with _catalog_lock:
+            if _catalog["signature"] != signature:
+                _catalog["catalog"] = Catalog(path.read_bytes())
+                _catalog["signature"] = signature
+    return _catalog["catalog"]
@@ -0,0 +1,289 @@
+"""
+Ingesta de exportaciones crudas de encuestas de personal.
+
+Lee una exportación con un registro por persona (NDJSON, un arreglo JSON o objetos JSON
+concatenados) sin cargarla completa: el parser recibe el archivo o el body del request por
+bloques y solo guarda el registro incompleto del final de cada bloque. Los registros se
+acumulan en bloques de CHUNK_ROWS filas y cada bloque se agrupa con NumPy (bincount por grupo
+y sexo), así la memoria depende del número de puestos y áreas, no del de personas.
+
+Cada registro es un objeto con:
+    sexo     "mujer" / "hombre", "F" / "H" (o en "genero", ver SEXOS); otros valores solo se cuentan
+    puesto   categoría del puesto: pregunta de la composición por sexo y categoría de salarios
+    area     opcional, área o grupo dentro del puesto ("Total" si falta)
+    salario  opcional, salario mensual; sin él la persona solo cuenta en la composición
+
+El resultado trae `composicion_sexo` y `salarios` con la forma que espera ReporteData, y
+`brecha_por_genero` (hombres menos mujeres por puesto y área, con signo) con la forma de la tabla
+de brecha por género de la dimensión 4. La brecha salarial es la `diferencia` de cada fila de
+`salarios`. Una exportación donde ningún registro trae puesto y sexo reconocido es un error: casi
+siempre es un archivo ya agregado (como data/encuestas_personal.json) y no una persona por registro.
+
+Uso:
+    python ingest.py personal.ndjson
+    python ingest.py personal.json --reporte payload.json --output payload_completo.json
+"""
+import codecs
+import json
+import math
+
+# Filas agrupadas por bloque de NumPy
+CHUNK_ROWS = 8192
+# Un registro que no cierra dentro de esta cantidad de caracteres se trata como JSON inválido
+MAX_RECORD_CHARS = 1024 * 1024
+SEXOS = {
+    "mujer": 0, "mujeres": 0, "femenino": 0, "f": 0,
+    "hombre": 1, "hombres": 1, "masculino": 1, "h": 1,
+}
+SIN_AREA = "Total"
+
+
+# --- Parser incremental ---
+class JsonRecordStream:
+    '''
+    Push parser for a stream of JSON objects: NDJSON, one top-level array, or concatenated
+    values. feed() takes bytes as they arrive and returns the records completed so far.
+    '''
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8-sig")()
+        self._buffer = ""
+        self._started = False
+        self._in_array = False
+        self._done = False
+
+    def feed(self, data, final=False):
+        buffer = self._buffer + self._text.decode(data, final)
+        records = []
+        pos, size = 0, len(buffer)
+        while True:
+            while pos < size and (buffer[pos].isspace() or (self._in_array and buffer[pos] == ",")):
+                pos += 1
+            if pos == size:
+                break
+            if self._done:
+                raise ValueError(f"Datos después del final del arreglo: {buffer[pos:pos + 20]!r}")
+            if not self._started and buffer[pos] == "[":
+                self._in_array = True
+                pos += 1
+            elif self._in_array and buffer[pos] == "]":
+                self._done = True
+                pos += 1
+            else:
+                try:
+                    record, end = self._decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError as e:
+                    # Registro cortado por el bloque: se completa con el siguiente
+                    if final or size - pos > MAX_RECORD_CHARS:
+                        raise ValueError(f"JSON inválido cerca del carácter {e.pos}: {e.msg}") from None
+                    break
+                records.append(record)
+                pos = end
+            self._started = True
+        self._buffer = buffer[pos:]
+        return records
+
+    def close(self):
+        '''Returns the last records; raises ValueError if the stream ends mid-record or mid-array.'''
+        records = self.feed(b"", final=True)
+        if self._in_array and not self._done:
+            raise ValueError("El arreglo JSON no está cerrado")
+        return records
+
+
+def iter_records(stream, chunk_size=64 * 1024):
+    '''Yields the records of a binary file object, reading it chunk_size bytes at a time.'''
+    parser = JsonRecordStream()
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+
+# --- Agregación ---
+def _grow(array, size):
+    '''Array padded with zeros up to `size` entries (group codes only grow).'''
+    import numpy as np
+    if len(array) >= size:
+        return array
+    return np.concatenate((array, np.zeros(max(size, 2 * len(array)) - len(array), dtype=array.dtype)))
+
+
+class PersonalAggregator:
+    '''
+    Composition by sex (per puesto and área) and average salary by sex (per puesto) of a
+    personnel export. Groups get integer codes in first-seen order; rows are buffered as codes
+    and reduced with bincount every CHUNK_ROWS records.
+    '''
+    def __init__(self):
+        import numpy as np
+
+        self.registros = 0
+        self.descartados = 0
+        self.sin_sexo = 0
+        self._grupos = {}
+        self._puestos = {}
+        self._rows = ([], [], [], [])  # grupo, puesto, sexo, salario
+        # Por grupo y sexo (índice grupo * 2 + sexo)
+        self._personas = np.zeros(0, dtype=np.int64)
+        # Por puesto y sexo
+        self._salario_suma = np.zeros(0, dtype=np.float64)
+        self._salario_personas = np.zeros(0, dtype=np.int64)
+
+    def add(self, record):
+        self.registros += 1
+        puesto = record.get("puesto") if isinstance(record, dict) else None
+        if not puesto:
+            self.descartados += 1
+            return
+        sexo = SEXOS.get(str(record.get("sexo", record.get("genero", ""))).strip().lower())
+        if sexo is None:
+            self.sin_sexo += 1
+            return
+        puesto, area = str(puesto), str(record.get("area") or SIN_AREA)
+        salario = record.get("salario")
+        try:
+            salario = float(salario) if salario is not None else math.nan
+        except (TypeError, ValueError):
+            salario = math.nan
+
+        rows = self._rows
+        rows[0].append(self._grupos.setdefault((puesto, area), len(self._grupos)))
+        rows[1].append(self._puestos.setdefault(puesto, len(self._puestos)))
+        rows[2].append(sexo)
+        rows[3].append(salario)
+        if len(rows[0]) >= CHUNK_ROWS:
+            self._flush()
+
+    def extend(self, records):
+        for record in records:
+            self.add(record)
+
+    def _flush(self):
+        import numpy as np
+
+        if not self._rows[0]:
+            return
+        grupo = np.array(self._rows[0], dtype=np.intp)
+        puesto = np.array(self._rows[1], dtype=np.intp)
+        sexo = np.array(self._rows[2], dtype=np.intp)
+        salario = np.array(self._rows[3], dtype=np.float64)
+        for rows in self._rows:
+            rows.clear()
+
+        size = 2 * len(self._grupos)
+        self._personas = _grow(self._personas, size)
+        self._personas[:size] += np.bincount(grupo * 2 + sexo, minlength=size)
+
+        valid = np.isfinite(salario)
+        key = puesto[valid] * 2 + sexo[valid]
+        size = 2 * len(self._puestos)
+        self._salario_suma = _grow(self._salario_suma, size)
+        self._salario_personas = _grow(self._salario_personas, size)
+        self._salario_suma[:size] += np.bincount(key, weights=salario[valid], minlength=size)
+        self._salario_personas[:size] += np.bincount(key, minlength=size)
+
+    def result(self):
+        '''
+        composicion_sexo and salarios as ReporteData expects them, brecha_por_genero and record
+        counts. ValueError when no record was usable.
+        '''
+        import numpy as np
+
+        self._flush()
+        if not self._grupos:
+            raise ValueError(
+                f"Ningún registro trae puesto y sexo reconocido ({self.registros} registros, "
+                f"{self.descartados} sin puesto, {self.sin_sexo} sin sexo): se espera un registro por persona"
+            )
+        personas = self._personas[:2 * len(self._grupos)].reshape(-1, 2)
+        # Filas del mismo puesto juntas, en el orden en que aparecieron
+        grupos = sorted(zip(self._grupos, personas.tolist(), (personas[:, 1] - personas[:, 0]).tolist()),
+                        key=lambda row: self._puestos[row[0][0]])
+        composicion = [
+            {
+                "pregunta_texto": puesto,
+                "descripcion": area,
+                "cantidad_mujeres": int(mujeres),
+                "cantidad_hombres": int(hombres),
+                "diferencia": abs(brecha),
+            }
+            for (puesto, area), (mujeres, hombres), brecha in grupos
+        ]
+        brecha_por_genero = [
+            {"pregunta": puesto, "grupo_o_categoria": area, "mujeres": mujeres, "hombres": hombres, "brecha": brecha}
+            for (puesto, area), (mujeres, hombres), brecha in grupos
+        ]
+
+        size = 2 * len(self._puestos)
+        suma, conteo = self._salario_suma[:size], self._salario_personas[:size]
+        promedio = np.round(np.divide(suma, conteo, out=np.zeros(size), where=conteo > 0), 2).reshape(-1, 2)
+        pagados = conteo.reshape(-1, 2).sum(axis=1)
+        salarios = [
+            {
+                "categoria_nombre": puesto,
+                "cantidad_hombres": hombres,
+                "cantidad_mujeres": mujeres,
+                "diferencia": round(abs(hombres - mujeres), 2),
+            }
+            for puesto, (mujeres, hombres), pagado in zip(self._puestos, promedio.tolist(), pagados.tolist())
+            if pagado
+        ]
+        return {
+            "composicion_sexo": composicion,
+            "salarios": salarios,
+            "brecha_por_genero": brecha_por_genero,
+            "registros": self.registros,
+            "descartados": self.descartados,
+            "sin_sexo": self.sin_sexo,
+        }
+
+
+def aggregate_file(path):
+    '''Aggregates a personnel export on disk (NDJSON or JSON array) in constant memory.'''
+    aggregator = PersonalAggregator()
+    with open(path, "rb") as f:
+        aggregator.extend(iter_records(f))
+    return aggregator.result()
+
+
+def merge_into_report(payload, aggregates):
+    '''Copy of a ReporteData payload with composicion_sexo and salarios taken from the export.'''
+    return dict(payload, composicion_sexo=aggregates["composicion_sexo"], salarios=aggregates["salarios"])
+
+
+def main_cli(argv=None):
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Agrega una exportación de encuestas de personal para el reporte.")
+    parser.add_argument("export", help="exportación NDJSON o arreglo JSON, un registro por persona")
+    parser.add_argument("--reporte", help="payload de ReporteData al que se agregan composicion_sexo y salarios")
+    parser.add_argument("--output", help="archivo de salida (default: stdout)")
+    args = parser.parse_args(argv)
+
+    try:
+        aggregates = aggregate_file(args.export)
+    except ValueError as e:
+        print(f"❌ {args.export}: {e}", file=sys.stderr)
+        return 1
+    print(f"📊 {aggregates['registros']} registros, {aggregates['descartados']} sin puesto, "
+          f"{aggregates['sin_sexo']} sin sexo reconocido", file=sys.stderr)
+    if args.reporte:
+        with open(args.reporte, encoding="utf-8") as f:
+            result = merge_into_report(json.load(f), aggregates)
+    else:
+        result = {key: aggregates[key] for key in ("composicion_sexo", "salarios", "brecha_por_genero")}
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main_cli())
@@ -1,31 +1,213 @@
+import asyncio
+import base64
+import copy
+import hashlib
+import hmac
 import io
 import json
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import pickle
+import queue
 import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from bisect import bisect_right
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from functools import partial
+from types import MappingProxyType
 from pathlib import Path
-from typing import Optional
+from typing import Literal, Optional
+from urllib.parse import urlencode
 from html import escape
-from fastapi import FastAPI, Response, HTTPException
+from fastapi import FastAPI, Query, Request, Response, HTTPException
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import cm
 from reportlab.lib import colors
-from reportlab.platypus import BaseDocTemplate, PageTemplate, Frame, Paragraph, Spacer, Image, PageBreak, Table, TableStyle, Flowable
+from reportlab.platypus import BaseDocTemplate, PageTemplate, Frame, Paragraph, Spacer, PageBreak, Table, TableStyle, Flowable, HRFlowable
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_JUSTIFY, TA_CENTER, TA_LEFT
 from reportlab.lib.utils import ImageReader
+from reportlab.lib.rl_accel import fp_str
+from reportlab.pdfgen.canvas import Canvas
 import math
-from reportlab.graphics.shapes import Drawing, Line, Circle, Wedge, String, Polygon
-from reportlab.graphics.charts.barcharts import HorizontalBarChart
-from reportlab.graphics.charts.axes import XValueAxis
-from reportlab.graphics.charts.spider import SpiderChart
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.graphics.shapes import Drawing, Group, UserNode, Line, Circle, Wedge, String, Polygon, Rect
+from reportlab.graphics import renderPDF
+from reportlab.pdfbase import pdfmetrics, pdfdoc, ttfonts
+from reportlab.pdfbase.ttfonts import TTFont, TTFontFace
+from reportlab import rl_config, Version as REPORTLAB_VERSION
 from reportlab.rl_config import defaultEncoding
+from catalog import CATALOG_PATH, LEVELS, get_catalog
+from ingest import JsonRecordStream, PersonalAggregator
+from scoring import BANDS, DIMENSION_THRESHOLDS, META_PCT, SEMAFORO_THRESHOLDS, band_index, score_reports
+# pypdf, cProfile y los módulos de gráficas de ReportLab se importan donde se usan: pypdf solo hace
+# falta al unir las partes de un render por secciones y sumaba ~100 ms al arranque en frío.
 
 # Configurar encoding por defecto para soportar caracteres especiales
 defaultEncoding = 'utf-8'
 
+# --- Logging ---
+# Los registros se encolan y un hilo aparte los escribe a stdout como JSON (una línea por evento),
+# así el request no espera la escritura al pipeline de logs. Los mensajes se formatean solo si
+# el nivel está habilitado (PDF_LOG_LEVEL, default INFO).
+class JsonLogFormatter(logging.Formatter):
+    '''One JSON object per line, with the keys Cloud Logging recognizes (severity, message).'''
+    def format(self, record):
+        entry = {
+            "severity": record.levelname,
+            "message": record.getMessage(),
+            "logger": record.name,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+logger = logging.getLogger("pdf_reports")
+_log_listener = None
+
+def _stdout_log_handler(formatter):
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(formatter)
+    return handler
+
+def setup_logging():
+    '''Routes the service logger through a QueueHandler drained by a background QueueListener.'''
+    global _log_listener
+    log_queue = queue.SimpleQueue()
+    # QueueHandler.prepare() deja el registro ya formateado (incluida la excepción) como mensaje
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.setFormatter(JsonLogFormatter())
+    logger.handlers[:] = [queue_handler]
+    logger.setLevel(os.getenv("PDF_LOG_LEVEL", "INFO").upper())
+    logger.propagate = False
+    _log_listener = logging.handlers.QueueListener(log_queue, _stdout_log_handler(logging.Formatter("%(message)s")))
+    _log_listener.start()
+
+def stop_logging():
+    '''Flushes pending records and stops the listener thread.'''
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
+def _log_directly_in_child():
+    # Un proceso hijo creado con fork no hereda el hilo del listener: escribe directo a stdout
+    global _log_listener
+    _log_listener = None
+    logger.handlers[:] = [_stdout_log_handler(JsonLogFormatter())]
+
+setup_logging()
+os.register_at_fork(after_in_child=_log_directly_in_child)
+
+def log_event(message, level=logging.INFO, exc_info=False, **fields):
+    '''Emits one structured record; `fields` become top-level keys of the JSON line.'''
+    if logger.isEnabledFor(level):
+        logger.log(level, message, exc_info=exc_info, extra={"fields": fields})
+
+# --- Fuentes ---
+# Las tablas ya parseadas de cada TTF se guardan en fonts/.cache (se regeneran si cambia el archivo o
+# la versión de ReportLab) y los subsets que se embeben en cada PDF se memoizan por contenido.
+FONT_CACHE_DIR = Path(__file__).parent / "fonts" / ".cache"
+# Se asignan primero en cada documento para que el subset 0 (ASCII + español) sea el mismo en todos
+SPANISH_CHARSET = "áéíóúüñÁÉÍÓÚÜÑ¿¡«»“”‘’–—…•·°ºª€"
+FONT_SUBSET_CACHE_SIZE = 32
+_font_subsets = OrderedDict()
+_font_subsets_lock = threading.Lock()
+
+class CachedTTFontFace(TTFontFace):
+    '''TTFontFace loaded from a pickled parse in FONT_CACHE_DIR, with memoized glyph subsets.'''
+
+    @classmethod
+    def load(cls, filename):
+        stat = os.stat(filename)
+        fingerprint = hashlib.sha1(
+            f"{os.path.abspath(filename)}|{stat.st_size}|{stat.st_mtime_ns}|{REPORTLAB_VERSION}|{sys.version_info[:3]}".encode()
+        ).hexdigest()[:16]
+        cache_path = FONT_CACHE_DIR / f"{Path(filename).stem}-{fingerprint}.pickle"
+        try:
+            with open(cache_path, "rb") as f:
+                state = pickle.load(f)
+            face = cls.__new__(cls)
+            face.__dict__.update(state)
+            face._set_pdf_scale()
+        except Exception:
+            # Caché ausente, corrupta o de otra versión de Python/ReportLab: se vuelve a parsear
+            face = cls(filename)
+            face._store(cache_path)
+        return face
+
+    def _set_pdf_scale(self):
+        # _pdfScale es una lambda (no serializable): se reconstruye igual que en extractInfo
+        if self.unitsPerEm == 1000:
+            self._pdfScale = lambda x: x
+        else:
+            mult = 1000 / self.unitsPerEm
+            self._pdfScale = lambda x: x * mult
+
+    def _store(self, cache_path):
+        state = {k: v for k, v in self.__dict__.items() if k != "_pdfScale"}
+        tmp_path = cache_path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            tmp_path.unlink(missing_ok=True)
+            logger.warning("No se pudo guardar la caché de fuentes: %s", e)
+
+    def makeSubset(self, subset):
+        key = (self.filename, tuple(subset))
+        with _font_subsets_lock:
+            data = _font_subsets.get(key)
+            if data is not None:
+                _font_subsets.move_to_end(key)
+                return data
+        data = super().makeSubset(subset)
+        with _font_subsets_lock:
+            _font_subsets[key] = data
+            if len(_font_subsets) > FONT_SUBSET_CACHE_SIZE:
+                _font_subsets.popitem(last=False)
+        return data
+
+_face_factory_lock = threading.Lock()
+
+class CachedTTFont(TTFont):
+    '''TTFont backed by CachedTTFontFace that assigns SPANISH_CHARSET first in every document.'''
+    def __init__(self, name, filename):
+        face = CachedTTFontFace.load(filename)
+        # TTFont.__init__ crea su cara con ttfonts.TTFontFace: mientras corre, esa fábrica devuelve la
+        # cara de la caché en vez de parsear el TTF. Si ReportLab dejara de usarla, la cara se
+        # reemplaza después (mismo resultado, solo sin ahorrarse el parseo)
+        with _face_factory_lock:
+            ttfonts.TTFontFace = lambda *args, **kwargs: face
+            try:
+                super().__init__(name, filename)
+            finally:
+                ttfonts.TTFontFace = TTFontFace
+        if self.face is not face:
+            self.face = face
+
+    def splitString(self, text, doc, encoding='utf-8'):
+        if doc not in self.state:
+            super().splitString(SPANISH_CHARSET, doc)
+        return super().splitString(text, doc, encoding)
+
 # Registrar fuentes con soporte Unicode
 try:
     # Intentar usar fuentes del paquete reportlab que soporten Unicode
@@ -56,14 +238,14 @@ try:
         try:
             if os.path.exists(font_path):
                 bold_path = font_path.replace('DejaVuSans.ttf', 'DejaVuSans-Bold.ttf')
-                pdfmetrics.registerFont(TTFont('DejaVuSans', font_path))
+                pdfmetrics.registerFont(CachedTTFont('DejaVuSans', font_path))
                 if os.path.exists(bold_path):
-                    pdfmetrics.registerFont(TTFont('DejaVuSans-Bold', bold_path))
+                    pdfmetrics.registerFont(CachedTTFont('DejaVuSans-Bold', bold_path))
                 else:
-                    pdfmetrics.registerFont(TTFont('DejaVuSans-Bold', font_path))  # Usar regular si no hay bold
+                    pdfmetrics.registerFont(CachedTTFont('DejaVuSans-Bold', font_path))  # Usar regular si no hay bold
                 USE_CUSTOM_FONTS = True
                 font_found = True
-                print(f"✅ Fuentes Unicode cargadas desde: {font_path}")
+                logger.info("Fuentes Unicode cargadas desde: %s", font_path)
                 break
         except Exception as e:
             continue
@@ -74,9 +256,21 @@ try:
 except Exception as e:
     # Si no se encuentran las fuentes personalizadas, usar las estándar
     USE_CUSTOM_FONTS = False
-    print("⚠️  No se pudieron cargar fuentes personalizadas, usando fuentes estándar")
-
-app = FastAPI()
+    logger.warning("No se pudieron cargar fuentes personalizadas, usando fuentes estándar")
+
+@asynccontextmanager
+async def lifespan(app):
+    if WARMUP:
+        # Un reporte desechable recorre todas las secciones y deja listas las cachés e imports diferidos
+        started = time.perf_counter()
+        await asyncio.to_thread(warmup_render)
+        log_event("Warmup completado", duration_ms=round((time.perf_counter() - started) * 1000, 1))
+    yield
+    shutdown_job_pool()
+    shutdown_section_pool()
+    stop_logging()
+
+app = FastAPI(lifespan=lifespan)
 
 # Configurar CORS para permitir peticiones desde el frontend
 app.add_middleware(
@@ -94,61 +288,291 @@ INTRO_PATH = script_dir / "content" / "01_introduccion.md"
 MARCO_PATH = script_dir / "content" / "02_marco_dimensiones.md"
 TABLE_DATA_PATH = script_dir / "data" / "tabla_subdimensiones.json"
 CHART_DATA_PATH = script_dir / "data" / "grafica_dimensiones.json"
-DIMENSION_DATA_PATH = script_dir / "data" / "data_dimensiones.json" # --- Reusable Markdown Parser ---
-def parse_markdown_to_flowables(filepath, styles):
-    '''Reads a markdown file with simple conventions and returns a list of flowables.'''
+DIMENSION_DATA_PATH = script_dir / "data" / "data_dimensiones.json"
+# Umbrales del semáforo y meta: cambian las bandas de todos los reportes
+SCORING_PATH = script_dir / "scoring.py"
+# Resolución de ids del catálogo
+CATALOG_MODULE_PATH = script_dir / "catalog.py"
+
+# --- Configuración por variables de entorno ---
+# Renderizar un reporte desechable al arrancar, antes de aceptar requests
+WARMUP = os.getenv("PDF_WARMUP", "0") == "1"
+# Jobs asíncronos (/jobs): procesos de render, límite de cola, timeout por job y retención de resultados
+JOB_WORKERS = int(os.getenv("PDF_JOB_WORKERS", str(os.cpu_count() or 1)))
+JOB_QUEUE_LIMIT = int(os.getenv("PDF_JOB_QUEUE_LIMIT", str(JOB_WORKERS * 4)))
+JOB_TIMEOUT = float(os.getenv("PDF_JOB_TIMEOUT", "120"))
+JOB_TTL = float(os.getenv("PDF_JOB_TTL", "600"))
+# Reportes en vuelo por request de /generar-pdf/batch
+BATCH_IN_FLIGHT = int(os.getenv("PDF_BATCH_IN_FLIGHT", str(JOB_WORKERS * 2)))
+BATCH_SPOOL_BYTES = 8 * 1024 * 1024
+# Caché de PDFs por hash del payload: tamaño en memoria (0 la desactiva), directorio opcional en disco
+# y bytes máximos en ese directorio
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", "")
+PDF_CACHE_DISK_BYTES = int(os.getenv("PDF_CACHE_DISK_BYTES", str(1024 * 1024 * 1024)))
+# PDFs mayores a este tamaño se escriben a un archivo temporal en vez de memoria
+PDF_SPOOL_BYTES = int(os.getenv("PDF_SPOOL_BYTES", str(4 * 1024 * 1024)))
+PDF_STREAM_CHUNK = 64 * 1024
+# Imágenes (logo DIGEI y logos por institución): resolución de embebido y tamaño de la caché LRU
+PDF_IMAGE_DPI = int(os.getenv("PDF_IMAGE_DPI", "300"))
+PDF_IMAGE_CACHE_BYTES = int(os.getenv("PDF_IMAGE_CACHE_BYTES", str(16 * 1024 * 1024)))
+# Directorio donde se guardan los perfiles cProfile de los requests con ?profile=1 (vacío: desactivado)
+PDF_PROFILE_DIR = os.getenv("PDF_PROFILE_DIR", "")
+# Salida compacta: streams binarios (sin ASCII85), compresión de páginas forzada, encabezado y pie
+# como form XObjects y, al unir las partes de un render por secciones, objetos duplicados (fuentes) eliminados
+PDF_COMPACT = os.getenv("PDF_COMPACT", "1") == "1"
+if PDF_COMPACT:
+    # ASCII85 solo sirve para transportes de 7 bits y agrega ~25% a cada stream. Es global en
+    # ReportLab: aplica a todo el proceso, incluidas las imágenes que se codifican para la caché.
+    rl_config.useA85 = 0
+# Almacenamiento de PDFs para ?delivery=url: "" (desactivado), "local" o "s3" (AWS S3, GCS por su API
+# XML con claves HMAC, MinIO). Las credenciales de "s3" se leen de las variables AWS_* estándar.
+PDF_STORAGE = os.getenv("PDF_STORAGE", "").lower()
+PDF_STORAGE_DIR = os.getenv("PDF_STORAGE_DIR", str(script_dir / "storage"))
+PDF_STORAGE_BUCKET = os.getenv("PDF_STORAGE_BUCKET", "")
+PDF_STORAGE_ENDPOINT = os.getenv("PDF_STORAGE_ENDPOINT", "")
+PDF_STORAGE_REGION = os.getenv("PDF_STORAGE_REGION", "")
+PDF_STORAGE_PREFIX = os.getenv("PDF_STORAGE_PREFIX", "reportes/")
+PDF_STORAGE_POOL = int(os.getenv("PDF_STORAGE_POOL", "10"))
+# Tamaño de parte de las subidas multipart; S3 rechaza partes menores a 5 MB
+PDF_STORAGE_PART_BYTES = max(5 * 1024 * 1024, int(os.getenv("PDF_STORAGE_PART_BYTES", str(8 * 1024 * 1024))))
+# Vigencia de las URLs firmadas y secreto HMAC de las URLs del backend local
+PDF_URL_TTL = int(os.getenv("PDF_URL_TTL", "3600"))
+PDF_URL_SECRET = os.getenv("PDF_URL_SECRET", "")
+# Render por secciones: procesos que maquetan partes de un mismo reporte en paralelo (0 lo desactiva) y
+# filas estimadas mínimas por parte, para que los reportes chicos no paguen la unión de páginas
+SECTION_WORKERS = int(os.getenv("PDF_SECTION_WORKERS", "0"))
+SECTION_MIN_ROWS = max(1, int(os.getenv("PDF_SECTION_MIN_ROWS", "400")))
+# Gráficas sueltas (/charts y /preview): bytes máximos de la LRU y resolución por defecto de los PNG
+PDF_CHART_CACHE_BYTES = int(os.getenv("PDF_CHART_CACHE_BYTES", str(8 * 1024 * 1024)))
+CHART_PNG_DPI = 144
+# Incrementar cuando cambie el layout del reporte para invalidar la caché
+REPORT_TEMPLATE_VERSION = "2"
+
+# --- Geometría de página compartida ---
+PAGE_MARGINS = dict(leftMargin=2*cm, rightMargin=2*cm, topMargin=2.2*cm, bottomMargin=2*cm)
+# Número de página del pie (alineado a la derecha); fix_up_pages lo replica en el render por secciones
+PAGE_NUMBER_FONT = "Helvetica-Bold"
+PAGE_NUMBER_SIZE = 9
+PAGE_NUMBER_COLOR = colors.grey
+PAGE_NUMBER_ANCHOR = (A4[0] - 2*cm, 1.1*cm)
+
+def page_number_text(page):
+    return f"Página {page}"
+REPORT_TITLE = "Reporte de Resultados del Autodiagnóstico para el proceso de Transversalización e Institucionalización de la Perspectiva de Género y Convivencia Pacífica"
+
+# --- Contenido Markdown ---
+# Los archivos de content/ se compilan una vez con `markdown` a una lista de bloques con markup de
+# Paragraph ya resuelto; se recompilan solo si cambia su mtime/tamaño y, además, su hash. Los
+# flowables se crean desde esos bloques en cada documento (un Paragraph no se comparte entre builds).
+_compiled_content = {}
+_compiled_content_lock = threading.Lock()
+
+def _inline_markup(element):
+    '''ReportLab Paragraph markup for the inline content of an element produced by markdown.'''
+    parts = [escape(element.text or '', quote=False)]
+    for child in element:
+        inner = _inline_markup(child)
+        if child.tag in ('strong', 'b'):
+            parts.append(f"<b>{inner}</b>")
+        elif child.tag in ('em', 'i'):
+            parts.append(f"<i>{inner}</i>")
+        elif child.tag == 'code':
+            parts.append(f"<font face='Courier'>{inner}</font>")
+        elif child.tag == 'a':
+            parts.append(f'<a href="{escape(child.get("href", ""))}" color="blue">{inner}</a>')
+        elif child.tag == 'br':
+            parts.append("<br/>")
+        else:
+            parts.append(inner)
+        parts.append(escape(child.tail or '', quote=False))
+    return ''.join(parts)
+
+def _compile_list(element, blocks, depth):
+    ordered = element.tag == 'ol'
+    for n, item in enumerate(element.findall('li'), start=int(element.get('start', 1))):
+        nested = [child for child in item if child.tag in ('ul', 'ol')]
+        paragraphs = [child for child in item if child.tag == 'p']
+        if paragraphs:  # lista "holgada": cada ítem trae sus propios <p>
+            text = '<br/>'.join(_inline_markup(p).strip() for p in paragraphs)
+        else:
+            for child in nested:
+                item.remove(child)
+            text = _inline_markup(item).strip()
+        blocks.append(('li', text, f"{n}." if ordered else '•', depth))
+        for child in nested:
+            _compile_list(child, blocks, depth + 1)
+
+def _compile_blocks(root):
+    '''Block list for a markdown document: (kind, ...) tuples with Paragraph markup.'''
+    blocks = []
+    for element in root:
+        tag = element.tag
+        if tag in ('h1', 'h2', 'h3', 'h4', 'h5', 'h6'):
+            blocks.append((tag if tag in ('h1', 'h2') else 'h3', _inline_markup(element).strip()))
+        elif tag in ('ul', 'ol'):
+            _compile_list(element, blocks, 0)
+        elif tag == 'table':
+            header = [_inline_markup(th).strip() for th in element.iter('th')]
+            rows = [[_inline_markup(td).strip() for td in tr.findall('td')]
+                    for tr in element.iter('tr') if tr.find('td') is not None]
+            blocks.append(('table', header, rows))
+        elif tag == 'pre':
+            code = escape(''.join(element.itertext()).rstrip('\n'), quote=False).replace('\n', '<br/>')
+            blocks.append(('p', f"<font face='Courier'>{code}</font>"))
+        elif tag == 'blockquote':
+            blocks.extend(_compile_blocks(element))
+        elif tag == 'hr':
+            blocks.append(('hr',))
+        else:
+            blocks.append(('p', _inline_markup(element).strip()))
+    return blocks
+
+def compile_markdown(text):
+    '''Parses markdown (with tables) into the block list used by markdown_flowables.'''
+    import markdown
+    import xml.etree.ElementTree as ET
+    from html.entities import name2codepoint
+
+    md = markdown.Markdown(extensions=['tables'], output_format='xhtml')
+    # El HTML crudo se trata como texto: la salida siempre es XML válido
+    md.preprocessors.deregister('html_block')
+    md.inlinePatterns.deregister('html')
+    html = md.convert(text)
+    # Entidades HTML con nombre (&copy;, &nbsp;...) a referencias numéricas, que XML sí conoce
+    html = re.sub(r'&(\w+);', lambda m: f"&#{name2codepoint[m[1]]};" if m[1] in name2codepoint else m[0], html)
+    return _compile_blocks(ET.fromstring(f"<div>{html}</div>"))
+
+def compiled_content(filepath):
+    '''Cached block list of a content file, recompiled only when its bytes change.'''
+    path = Path(filepath)
+    stat = path.stat()
+    signature = (stat.st_mtime_ns, stat.st_size)
+    entry = _compiled_content.get(path)
+    if entry is not None and entry[0] == signature:
+        return entry[2]
+    with _compiled_content_lock:
+        raw = path.read_bytes()
+        digest = hashlib.sha256(raw).hexdigest()
+        entry = _compiled_content.get(path)
+        if entry is not None and entry[1] == digest:
+            blocks = entry[2]  # Solo cambió el mtime (touch, checkout): se reutiliza la compilación
+        else:
+            blocks = compile_markdown(raw.decode('utf-8'))
+            log_event("Contenido compilado", level=logging.DEBUG, archivo=path.name, bloques=len(blocks))
+        _compiled_content[path] = (signature, digest, blocks)
+        return blocks
+
+def _list_style(styles, depth):
+    base = styles['li']
+    if depth == 0:
+        return base
+    return ParagraphStyle(name=f"{base.name}{depth}", parent=base,
+                          leftIndent=base.leftIndent * (depth + 1), bulletIndent=base.bulletIndent + base.leftIndent * depth)
+
+def markdown_flowables(blocks, styles):
+    '''Flowables for a compiled block list; a 0.3cm spacer separates blocks, list items stay together.'''
     flowables = []
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            
-        for i, line in enumerate(lines):
-            line = line.strip()
-            
-            # Si la línea está vacía, agregar un espaciador
-            if not line:
-                flowables.append(Spacer(1, 0.3*cm))
-                continue
-
-            # Handle inline styles first
-            line = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', line)
-            line = re.sub(r'\*(.*?)\*', r'<i>\1</i>', line)
+    previous = None
+    for block in blocks:
+        kind = block[0]
+        if previous is not None and not (kind == 'li' and previous == 'li'):
+            flowables.append(Spacer(1, 0.3*cm))
+        previous = kind
+        if kind == 'li':
+            _, text, bullet, depth = block
+            flowables.append(Paragraph(text, _list_style(styles, depth), bulletText=bullet))
+        elif kind == 'table':
+            _, header, body = block
+            columns = max([len(header)] + [len(row) for row in body])
+            width = (A4[0] - PAGE_MARGINS['leftMargin'] - PAGE_MARGINS['rightMargin']) / max(columns, 1)
+            rows = [header_row(header, styles['table_header'])] if header else []
+            rows.extend(striped_rows([row + [''] * (columns - len(row)) for row in body]))
+            flowables.append(FixedTable(rows, [width] * columns, [styles['table_text']] * columns,
+                                        wrap_cols=tuple(range(columns)), valign='TOP'))
+        elif kind == 'hr':
+            flowables.append(HRFlowable(width='100%', thickness=0.5, color=MEDIUM_GRAY))
+        else:
+            flowables.append(Paragraph(block[1], styles[kind]))
+    return flowables
 
-            if line.startswith('# '):
-                flowables.append(Paragraph(line[2:], styles['h1']))
-            elif line.startswith('## '):
-                flowables.append(Paragraph(line[3:], styles['h2']))
-            elif line.startswith('* '):
-                flowables.append(Paragraph(line[2:], styles['li']))
-            else:
-                flowables.append(Paragraph(line, styles['p']))
+def parse_markdown_to_flowables(filepath, styles):
+    '''Flowables for a markdown content file, compiled once and cached by mtime and content hash.'''
+    try:
+        blocks = compiled_content(filepath)
     except FileNotFoundError:
         error_message = f"<b>Error:</b> Archivo de contenido no encontrado en <u>{filepath}</u>."
-        flowables.append(Paragraph(error_message, styles['p']))
+        return [Paragraph(error_message, styles['p'])]
+    return markdown_flowables(blocks, styles)
+
+# --- Capas estáticas de gráficas ---
+# Ejes, etiquetas, línea meta y fondos no dependen del reporte: se construyen una vez por proceso,
+# y en cada documento se emiten una sola vez como form XObject que se reutiliza por nombre.
+_CHART_LAYERS = {}
+FORM_BOUNDS = (-A4[0], -A4[1], 2*A4[0], 2*A4[1])  # Las etiquetas pueden salir del área del Drawing
+
+def _expand_user_nodes(group):
+    '''Replaces user nodes (charts, labels) in a private drawing by the primitive shapes they provide.'''
+    for i, child in enumerate(group.contents):
+        while isinstance(child, UserNode):
+            child = child.provideNode()
+        if isinstance(child, Group):
+            _expand_user_nodes(child)
+        group.contents[i] = child
+    return group
+
+def cached_chart_layer(key, build):
+    '''Returns the static drawing for `key`, built once by `build()` and expanded to primitive shapes.'''
+    layer = _CHART_LAYERS.get(key)
+    if layer is None:
+        layer = _CHART_LAYERS.setdefault(key, _expand_user_nodes(build()))
+    return layer
+
+def draw_form_once(canv, name, draw):
+    '''Defines form XObject `name` on the document the first time it is used, then draws it.'''
+    if not canv.hasForm(name):
+        canv.beginForm(name, *FORM_BOUNDS)
+        draw(canv)
+        canv.endForm()
+    canv.doForm(name)
+
+class LayeredDrawing(Flowable):
+    '''
+    Chart drawn as a stack of layers, bottom to top. A layer is either a Drawing rendered for this
+    report or a (form_name, Drawing) pair whose drawing is shared and emitted as a form XObject.
+    '''
+    def __init__(self, width, height, layers):
+        super().__init__()
+        self.width = width
+        self.height = height
+        self.layers = layers
 
-    return flowables
+    def wrap(self, aw, ah):
+        return self.width, self.height
+
+    def draw(self):
+        for layer in self.layers:
+            if isinstance(layer, tuple):
+                form_name, drawing = layer
+                draw_form_once(self.canv, form_name, lambda canv: renderPDF.draw(drawing, canv, 0, 0))
+            else:
+                renderPDF.draw(layer, self.canv, 0, 0)
 
 # --- Chart Generation Function ---
-def create_dimensiones_chart(data, styles):
-    """Creates a horizontal bar chart from the dimension data."""
-    chart_title_text = "<b>PORCENTAJE DE INDICADORES ATENDIDOS POR DIMENSIÓN</b><br/><font size='-2'>(GRÁFICA 01)</font>"
-    chart_title = Paragraph(chart_title_text, styles['chart_title'])
-    
-    # 1. Extract data and create labels
-    chart_data = [item['pct_vs_100'] for item in data]
-    
-    short_names = [
-        "Formación", "Investigación", "Comunicación", "Participación",
-        "Condiciones Lab.", "Acoso/Violencia", "Corresponsabilidad",
-        "Institucionalidad", "Infraestructura"
-    ]
-    
+BAR_CHART_SHORT_NAMES = [
+    "Formación", "Investigación", "Comunicación", "Participación",
+    "Condiciones Lab.", "Acoso/Violencia", "Corresponsabilidad",
+    "Institucionalidad", "Infraestructura"
+]
+
+def _dimensiones_bar_chart(chart_data):
+    '''HorizontalBarChart with the geometry and styling of GRÁFICA 01.'''
     # Create labels in the format "Dim 1 - Name"
-    category_names = [f"Dim {i+1} - {name}" for i, name in enumerate(short_names[:len(chart_data)])]
+    category_names = [f"Dim {i+1} - {name}" for i, name in enumerate(BAR_CHART_SHORT_NAMES[:len(chart_data)])]
+
+    from reportlab.graphics.charts.barcharts import HorizontalBarChart
+    from reportlab.graphics.charts.axes import XValueAxis
 
-    # 2. Create the chart object
-    drawing = Drawing(width=17*cm, height=11*cm)
-    
     bc = HorizontalBarChart()
     bc.x = 70
     bc.y = 50
@@ -156,21 +580,20 @@ def create_dimensiones_chart(data, styles):
     bc.width = 10*cm
     bc.data = [chart_data]
 
-    # 3. Style the chart bars
+    # Style the chart bars
     bc.barSpacing = 2
     bc.barWidth = 7
     bc.groupSpacing = 8
     bc.bars[0].fillColor = colors.HexColor("#6A1B9A")
     bc.bars[0].strokeColor = colors.transparent
 
-    # 4. Add and style bar labels (percentages)
+    # Add and style bar labels (percentages)
     bc.barLabelFormat = '%.1f%%'  # Format as "62.0%"
     bc.barLabels.nudge = 7      # Distance from the end of the bar
     bc.barLabels.fontName = 'Helvetica'
     bc.barLabels.fontSize = 7
     bc.barLabels.boxAnchor = 'w' # Anchor to the west (left) of the text
 
-    # 5. Style Axes
     # Style X-axis (value axis)
     bc.valueAxis = XValueAxis()
     bc.valueAxis.valueMin = 0
@@ -178,129 +601,318 @@ def create_dimensiones_chart(data, styles):
     bc.valueAxis.valueStep = 10
     bc.valueAxis.labels.fontName = 'Helvetica'
     bc.valueAxis.labels.fontSize = 8
-    
+
     # Style Y-axis (category axis)
     bc.categoryAxis.categoryNames = category_names
     bc.categoryAxis.labels.fontName = 'Helvetica'
     bc.categoryAxis.labels.fontSize = 8
     bc.categoryAxis.labels.boxAnchor = 'e'
     bc.categoryAxis.labels.dx = -5
+    return bc
 
-    drawing.add(bc)
+def _dimensiones_chart_axes(category_count):
+    '''Static layer of GRÁFICA 01: both axes with their labels, no bars.'''
+    drawing = Drawing(width=17*cm, height=11*cm)
+    drawing.add(_dimensiones_bar_chart([None] * category_count))
+    return drawing
 
-    # 6. Manually draw the 80% target line
+def _dimensiones_chart_target_line():
+    '''Static overlay of GRÁFICA 01: the dashed target line (META_PCT), drawn above the bars.'''
+    bc = _dimensiones_bar_chart([None])
+    drawing = Drawing(width=17*cm, height=11*cm)
     x_start = bc.x
     plot_width = bc.width
     value_range = bc.valueAxis.valueMax - bc.valueAxis.valueMin
-    x_80 = x_start + (80 / value_range) * plot_width
-    
-    y_start = bc.y
-    y_end = bc.y + bc.height
+    x_80 = x_start + (META_PCT / value_range) * plot_width
 
-    target_line = Line(x_80, y_start, x_80, y_end)
+    target_line = Line(x_80, bc.y, x_80, bc.y + bc.height)
     target_line.strokeColor = colors.red
     target_line.strokeWidth = 1
     target_line.strokeDashArray = [3, 1]
     drawing.add(target_line)
+    return drawing
+
+def dimensiones_chart_drawing(data):
+    '''GRÁFICA 01 as a LayeredDrawing: shared axes and target line around this report's bars.'''
+    chart_data = [item['pct_vs_100'] for item in data]
+    category_count = len(BAR_CHART_SHORT_NAMES[:len(chart_data)])
+
+    # Only the bars and their labels depend on the report; axes are hidden in this layer
+    bars = _dimensiones_bar_chart(chart_data)
+    bars.valueAxis.visible = 0
+    bars.categoryAxis.visible = 0
+    bars_drawing = Drawing(width=17*cm, height=11*cm)
+    bars_drawing.add(bars)
+
+    return LayeredDrawing(17*cm, 11*cm, [
+        (f"barras_ejes_{category_count}", cached_chart_layer(("barras_ejes", category_count), lambda: _dimensiones_chart_axes(category_count))),
+        bars_drawing,
+        ("barras_meta_80", cached_chart_layer(("barras_meta_80",), _dimensiones_chart_target_line)),
+    ])
+
+def create_dimensiones_chart(data, styles):
+    """Creates a horizontal bar chart from the dimension data."""
+    chart_title_text = "<b>PORCENTAJE DE INDICADORES ATENDIDOS POR DIMENSIÓN</b><br/><font size='-2'>(GRÁFICA 01)</font>"
+    chart_title = Paragraph(chart_title_text, styles['chart_title'])
 
     # Return flowables
     return [
         chart_title,
         Spacer(1, 0.5*cm),
-        drawing,
+        dimensiones_chart_drawing(data),
         PageBreak()
     ]
 
+# --- Tablas de esquema fijo ---
+# Las tablas del reporte tienen columnas conocidas: FixedTable mide cada fila una sola vez (solo las
+# celdas Paragraph se envuelven, el resto son strings), parte entre filas con sumas acumuladas y
+# dibuja fondos, celdas y rejilla directamente, sin la maquinaria de estilos por celda de Table.
+class FixedRow:
+    '''
+    One FixedTable row. `cells` is a list with a str or Paragraph per column (a spanned row has a
+    single cell), `backgrounds` is a list of (first_col, last_col, color) and `keep_with_next`
+    forbids a page break right after the row. `group` is the index of the row that heads this
+    row's group: it is repeated on top of a piece that starts in the middle of the group.
+    '''
+    __slots__ = ('cells', 'backgrounds', 'span', 'keep_with_next', 'group')
+
+    def __init__(self, cells, backgrounds=(), span=False, keep_with_next=False, group=None):
+        self.cells = cells
+        self.backgrounds = backgrounds
+        self.span = span
+        self.keep_with_next = keep_with_next
+        self.group = group
+
+class FixedTable(Flowable):
+    '''
+    Fixed-schema table with the look of a Table with uniform padding, VALIGN and GRID. String
+    cells are drawn with the ParagraphStyle of their column (font, size, leading, alignment,
+    color) on one line, like Table strings. In `wrap_cols`, a string with markup or wider than
+    its column becomes a Paragraph of that style instead, so free text still wraps. Paragraph
+    cells are wrapped once. Splits only between rows and, with `repeat_rows`, repeats the first
+    rows on every piece (plus the group header of a group cut by the split).
+
+    Rows are measured once for the whole table and every split is a bisect over prefix sums of
+    their heights, so laying out a table of n rows costs O(n) whatever the number of pages.
+    '''
+    def __init__(self, rows, col_widths, col_styles, wrap_cols=(), padding=(8, 8, 6, 6), valign='MIDDLE',
+                 grid=None, repeat_rows=0, _layout=None, _range=None, _lead=()):
+        super().__init__()
+        self.hAlign = 'LEFT'
+        self.rows = rows
+        self.col_widths = col_widths
+        self.col_styles = col_styles
+        self.wrap_cols = wrap_cols
+        self.padding = padding
+        self.valign = valign
+        self.grid = grid or (0.5, MEDIUM_GRAY)
+        self.repeat_rows = repeat_rows
+        self.width = sum(col_widths)
+        self._layout = _layout  # (alturas, sumas acumuladas), compartido entre las partes de un split
+        self.start, self.end = _range or (repeat_rows, len(rows))
+        self._lead = _lead  # filas repetidas entre el encabezado y `start` (encabezado de grupo)
+
+    def _measure(self):
+        '''Row heights and their prefix sums, computed once for the whole table.'''
+        left, right, top, bottom = self.padding
+        heights, cumulative, total = [], [0], 0
+        for row in self.rows:
+            widths = [self.width] if row.span else self.col_widths
+            h = 0
+            for k, (cell, width, style) in enumerate(zip(row.cells, widths, self.col_styles)):
+                inner = width - left - right
+                wraps = k in self.wrap_cols and not row.span
+                if wraps and not isinstance(cell, Flowable) and not self._fits(cell, style, inner):
+                    cell = row.cells[k] = Paragraph(cell, style)
+                if isinstance(cell, Flowable):
+                    ch = cell.wrap(inner, 1e9)[1]
+                else:
+                    ch = (cell.count('\n') + 1) * style.leading
+                h = max(h, ch + top + bottom)
+            heights.append(h)
+            total += h
+            cumulative.append(total)
+        return heights, cumulative
+
+    @staticmethod
+    def _fits(text, style, width):
+        '''True when `text` draws exactly like a one-line Paragraph (or is explicit multi-line text).'''
+        if '\n' in text:
+            return True
+        if not text or '<' in text or '&' in text or text != ' '.join(text.split()):
+            return False
+        return pdfmetrics.stringWidth(text, style.fontName, style.fontSize) <= width
+
+    def _row_indexes(self):
+        return list(range(self.repeat_rows)) + list(self._lead) + list(range(self.start, self.end))
+
+    def wrap(self, aw, ah):
+        if self._layout is None:
+            self._layout = self._measure()
+        heights, cumulative = self._layout
+        self.height = (cumulative[self.repeat_rows] + sum(heights[i] for i in self._lead)
+                       + cumulative[self.end] - cumulative[self.start])
+        return self.width, self.height
+
+    def split(self, aw, ah):
+        self.wrap(aw, ah)
+        heights, cumulative = self._layout
+        # Última fila que cabe: mayor n con altura(encabezado + filas start..n) <= ah
+        fixed = self.height - (cumulative[self.end] - cumulative[self.start])
+        n = bisect_right(cumulative, ah - fixed + cumulative[self.start]) - 1
+        if n >= self.end:
+            return [self]
+        while n > self.start and self.rows[n - 1].keep_with_next:
+            n -= 1
+        if n <= self.start:
+            return []
+        kwargs = dict(wrap_cols=self.wrap_cols, padding=self.padding, valign=self.valign, grid=self.grid,
+                      repeat_rows=self.repeat_rows, _layout=self._layout)
+        group = self.rows[n].group
+        return [
+            FixedTable(self.rows, self.col_widths, self.col_styles, _range=(self.start, n), _lead=self._lead, **kwargs),
+            FixedTable(self.rows, self.col_widths, self.col_styles, _range=(n, self.end),
+                       _lead=(group,) if group is not None else (), **kwargs),
+        ]
+
+    def draw(self):
+        c = self.canv
+        heights = self._layout[0]
+        left, right, top, bottom = self.padding
+        col_x = [0]
+        for w in self.col_widths:
+            col_x.append(col_x[-1] + w)
+        rows = [(self.rows[i], heights[i]) for i in self._row_indexes()]
+
+        c.saveState()
+        # Fondos
+        y = self.height
+        for row, h in rows:
+            y -= h
+            for first, last, color in row.backgrounds:
+                last = last % len(self.col_widths)
+                c.setFillColor(color)
+                c.rect(col_x[first], y + h, col_x[last + 1] - col_x[first], -h, stroke=0, fill=1)
+
+        # Celdas: los Paragraph se dibujan solos; todos los strings van en un único objeto de texto
+        text = c.beginText()
+        current_style = None
+        y = self.height
+        for row, h in rows:
+            y -= h
+            positions = [(0, self.width)] if row.span else zip(col_x, self.col_widths)
+            for cell, (x, width), style in zip(row.cells, positions, self.col_styles):
+                if isinstance(cell, Flowable):
+                    ch = cell.height
+                    if self.valign == 'TOP':
+                        cy = y + h - top - ch
+                    else:
+                        cy = y + (h + bottom - top + ch) / 2.0 - ch
+                    cell.drawOn(c, x + left, cy)
+                elif cell:
+                    lines = cell.split('\n')
+                    if self.valign == 'TOP':
+                        cy = y + h - top - style.fontSize
+                    else:
+                        cy = y + (bottom + h - top + len(lines) * style.leading) / 2.0 - style.fontSize
+                    if style is not current_style:
+                        text.setFillColor(style.textColor)
+                        text.setFont(style.fontName, style.fontSize, style.leading)
+                        current_style = style
+                    for line in lines:
+                        if style.alignment == TA_CENTER:
+                            lx = x + (width + left - right) * 0.5 - pdfmetrics.stringWidth(line, style.fontName, style.fontSize) * 0.5
+                        else:
+                            lx = x + left
+                        text.setTextOrigin(lx, cy)
+                        text.textOut(line)
+                        cy -= style.leading
+        c.drawText(text)
+
+        # Rejilla: horizontales completas; verticales interiores cortadas en las filas con span
+        weight, color = self.grid
+        c.setStrokeColor(color)
+        c.setLineWidth(weight)
+        c.setLineCap(1)
+        c.setLineJoin(1)
+        row_y = [self.height]
+        for _, h in rows:
+            row_y.append(row_y[-1] - h)
+        for y in row_y:
+            c.line(0, y, self.width, y)
+        for k, x in enumerate(col_x):
+            if k in (0, len(col_x) - 1):
+                c.line(x, row_y[0], x, row_y[-1])
+                continue
+            segment_top = None
+            for (row, _), y0 in zip(rows, row_y):
+                if row.span:
+                    if segment_top is not None:
+                        c.line(x, segment_top, x, y0)
+                        segment_top = None
+                elif segment_top is None:
+                    segment_top = y0
+            if segment_top is not None:
+                c.line(x, segment_top, x, row_y[-1])
+        c.restoreState()
+
+def zebra(row_index, first_col=0, last_col=-1):
+    '''Background of a striped body row: LIGHT_GRAY on even table rows.'''
+    return ((first_col, last_col, LIGHT_GRAY),) if row_index % 2 == 0 else ()
+
+def header_row(labels, style):
+    '''Bold header row on PRIMARY_COLOR; labels may contain <br/>.'''
+    return FixedRow([Paragraph(f"<b>{label}</b>", style) for label in labels], backgrounds=((0, -1, PRIMARY_COLOR),))
+
+def striped_rows(rows):
+    '''Body rows after a one-row header, zebra-striped across the whole width.'''
+    return [FixedRow(cells, zebra(i)) for i, cells in enumerate(rows, start=1)]
+
 # --- Table Generation Function ---
 def create_subdimensiones_table(data, styles):
-    '''Creates a styled ReportLab Table from the JSON data.'''
+    '''Creates TABLA 01 (subdimensions grouped by dimension) as a FixedTable.'''
     table_title = "SUBDIMENSIONES POR DIMENSIÓN <font size='-2'>(TABLA 01)</font>"
     table_description = data.get("descripcion", "")
     dimensiones = data.get("dimensiones", [])
 
-    table_data = []
-    headers = [
-        Paragraph("<b>ID</b>", styles['table_header_small']),
-        Paragraph("<b>Subdimensión</b>", styles['table_header_small']),
-        Paragraph("<b>Indicadores<br/>(Total)</b>", styles['table_header_small']),
-        Paragraph("<b>Indicadores<br/>(Atendidos)</b>", styles['table_header_small']),
-        Paragraph("<b>% vs<br/>100</b>", styles['table_header_small']),
-        Paragraph("<b>% vs<br/>80</b>", styles['table_header_small']),
-        Paragraph("<b>Semáforo</b>", styles['table_header_small'])
-    ]
-    table_data.append(headers)
-
-    table_styles = [
-        ('BACKGROUND', (0, 0), (-1, 0), PRIMARY_COLOR),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('GRID', (0, 0), (-1, -1), 0.5, MEDIUM_GRAY),
-        ('ALIGN', (6, 0), (6, -1), 'CENTER'),  # Asegurar que columna Semáforo esté centrada
-        ('LEFTPADDING', (0, 0), (-1, -1), 8),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-        ('TOPPADDING', (0, 0), (-1, -1), 6),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-    ]
-    
+    rows = [header_row(
+        ["ID", "Subdimensión", "Indicadores<br/>(Total)", "Indicadores<br/>(Atendidos)", "% vs<br/>100", f"% vs<br/>{META_PCT}", "Semáforo"],
+        styles['table_header_small'],
+    )]
+
     semaforo_colors = {
         "alto": colors.HexColor("#4CAF50"),
         "medio": colors.HexColor("#FFC107"),
         "bajo": colors.HexColor("#F44336")
     }
+    dimension_background = ((0, -1, colors.HexColor("#F0F0F0")),)
 
-    row_index = 1
     for dimension in dimensiones:
+        # El título de la dimensión no se separa de su primera subdimensión
         dim_name = f"<b>{dimension['id']}. {dimension['nombre']}</b>"
-        table_data.append([Paragraph(dim_name, styles['table_text'])])
-        
-        # Calcular el rango de filas para esta dimensión (título + subdimensiones)
-        dimension_start_row = row_index
-        dimension_end_row = row_index + len(dimension['subdimensiones'])
-        
-        table_styles.extend([
-            ('SPAN', (0, row_index), (-1, row_index)),
-            ('BACKGROUND', (0, row_index), (-1, row_index), colors.HexColor("#F0F0F0")),
-            ('ALIGN', (0, row_index), (0, row_index), 'LEFT'),
-            # Evitar separación de página entre título y subdimensiones
-            ('KEEPWITHNEXT', (0, row_index), (-1, row_index), True)
-        ])
-        
-        # Si hay más de 3 subdimensiones, aplicar keep together al grupo
-        if len(dimension['subdimensiones']) > 0:
-            table_styles.append(('KEEPTOGETHER', (0, dimension_start_row), (-1, dimension_end_row), True))
-        
-        row_index += 1
+        rows.append(FixedRow([Paragraph(dim_name, styles['table_text'])], dimension_background, span=True, keep_with_next=True))
 
-        for i, sub in enumerate(dimension['subdimensiones']):
-            table_data.append([
-                Paragraph(str(sub['id']), styles['table_text']),
-                Paragraph(sub['nombre'], styles['table_text']),
-                str(sub['indicadores_total']),
-                str(sub['indicadores_atendidos']),
-                f"{sub['porcentaje_vs_100']:.1f}%",
-                f"{sub['porcentaje_vs_80']:.1f}%",
-                Paragraph(sub['semaforo'].capitalize(), styles['table_text_centered'])
-            ])
-            table_styles.append(('ALIGN', (1, row_index), (1, row_index), 'LEFT'))
-            table_styles.append(('ALIGN', (6, row_index), (6, row_index), 'CENTER'))  # Centrar columna Semáforo
-            
-            # Para la primera subdimensión, mantener con el título
-            if i == 0:
-                table_styles.append(('KEEPWITHPREV', (0, row_index), (-1, row_index), True))
-            
-            # Zebra striping - filas alternadas
-            if row_index % 2 == 0:
-                table_styles.append(('BACKGROUND', (0, row_index), (5, row_index), LIGHT_GRAY))
-            
+        for sub in dimension['subdimensiones']:
             semaforo_color = semaforo_colors.get(sub['semaforo'], colors.white)
-            table_styles.append(('BACKGROUND', (6, row_index), (6, row_index), semaforo_color))
-            row_index += 1
+            rows.append(FixedRow(
+                [
+                    str(sub['id']),
+                    sub['nombre'],
+                    str(sub['indicadores_total']),
+                    str(sub['indicadores_atendidos']),
+                    f"{sub['porcentaje_vs_100']:.1f}%",
+                    f"{sub['porcentaje_vs_80']:.1f}%",
+                    sub['semaforo'].capitalize(),
+                ],
+                # Zebra en las columnas de datos; la de semáforo lleva su color
+                zebra(len(rows), 0, 5) + ((6, 6, semaforo_color),),
+            ))
 
     col_widths = [1.5*cm, 6*cm, 2*cm, 2*cm, 1.5*cm, 1.5*cm, 2*cm]
-    gen_table = Table(table_data, colWidths=col_widths, hAlign='LEFT')
-    gen_table.setStyle(TableStyle(table_styles))
+    number = styles['table_cell']
+    gen_table = FixedTable(rows, col_widths, [
+        styles['table_text'], styles['table_text'], number, number, number, number, styles['table_text_centered'],
+    ], wrap_cols=(1,))
 
     flowables = [
         Spacer(1, 1*cm),
@@ -316,27 +928,41 @@ def create_subdimensiones_table(data, styles):
 
 
 # --- Gauge Chart Generation ---
-def create_gauge_chart(data, styles):
-    """Creates a gauge chart showing the overall average progress."""
+GAUGE_SIZE = (10*cm, 6.5*cm)
+GAUGE_CENTER = (5*cm, 1.5*cm)
+GAUGE_RADIUS = 4*cm
+
+def _gauge_background():
+    '''Static layer of the gauge: colored wedges, inner donut circle and the 0%/100% labels.'''
+    d = Drawing(*GAUGE_SIZE)
+    cx, cy = GAUGE_CENTER
+    radius = GAUGE_RADIUS
+    # Mismas bandas que el semáforo de cada dimensión: rojo, amarillo y verde desde la meta
+    a_red, a_yellow = (180 - t * 180 / 100 for t in DIMENSION_THRESHOLDS)
+    # Ángulos en orden creciente: renderSVG dibuja el arco complementario si van de mayor a menor
+    d.add(Wedge(cx, cy, radius, a_red, 180, fillColor=colors.HexColor("#F44336")))
+    d.add(Wedge(cx, cy, radius, a_yellow, a_red, fillColor=colors.HexColor("#FFC107")))
+    d.add(Wedge(cx, cy, radius, 0, a_yellow, fillColor=colors.HexColor("#4CAF50")))
+    
+    # Add a white inner circle to make it a donut
+    d.add(Circle(cx, cy, radius * 0.7, fillColor=colors.white, strokeColor=colors.lightgrey))
+    d.add(String(cx - radius - 10, cy, "0%", textAnchor="end", fillColor=colors.grey))
+    d.add(String(cx + radius + 10, cy, "100%", textAnchor="start", fillColor=colors.grey))
+    return d
+
+def gauge_chart_drawing(data):
+    '''Gauge of the average dimension percentage as a LayeredDrawing over the shared background.'''
     
     # 1. Calculate the average value
     values = [item['pct_vs_100'] for item in data]
     avg_value = sum(values) / len(values) if values else 0
     
     # 2. Setup geometry
-    d = Drawing(width=10*cm, height=6.5*cm)
-    cx, cy = 5*cm, 1.5*cm # Center of the gauge
-    radius = 4*cm
-
-    # 3. Draw background wedges
-    d.add(Wedge(cx, cy, radius, 180, 90, fillColor=colors.HexColor("#F44336"))) # Red 0-50
-    d.add(Wedge(cx, cy, radius, 90, 36, fillColor=colors.HexColor("#FFC107"))) # Yellow 50-80
-    d.add(Wedge(cx, cy, radius, 36, 0, fillColor=colors.HexColor("#4CAF50"))) # Green 80-100
-    
-    # Add a white inner circle to make it a donut
-    d.add(Circle(cx, cy, radius * 0.7, fillColor=colors.white, strokeColor=colors.lightgrey))
+    d = Drawing(*GAUGE_SIZE)
+    cx, cy = GAUGE_CENTER
+    radius = GAUGE_RADIUS
 
-    # 4. Draw the needle
+    # 3. Draw the needle
     value_angle_rad = math.radians(180 - (avg_value / 100.0) * 180)
     needle_end_x = cx + (radius * 0.9) * math.cos(value_angle_rad)
     needle_end_y = cy + (radius * 0.9) * math.sin(value_angle_rad)
@@ -344,16 +970,20 @@ def create_gauge_chart(data, styles):
     d.add(Line(cx, cy, needle_end_x, needle_end_y, strokeColor=colors.black, strokeWidth=2))
     d.add(Circle(cx, cy, 5, fillColor=colors.black))
 
-    # 5. Add labels
-    d.add(String(cx - radius - 10, cy, "0%", textAnchor="end", fillColor=colors.grey))
-    d.add(String(cx + radius + 10, cy, "100%", textAnchor="start", fillColor=colors.grey))
-    
+    # 4. Add the value label
     value_str = f"{avg_value:.1f}%"
     d.add(String(cx, cy, value_str, textAnchor="middle", fontSize=18, fontName="Helvetica-Bold"))
 
+    return LayeredDrawing(*GAUGE_SIZE, [
+        ("gauge_fondo", cached_chart_layer(("gauge_fondo",), _gauge_background)),
+        d,
+    ])
+
+def create_gauge_chart(data, styles):
+    """Creates a gauge chart showing the overall average progress."""
     return [
         Spacer(1, 1*cm),
-        d,
+        gauge_chart_drawing(data),
         PageBreak()
     ]
 
@@ -367,11 +997,12 @@ class SemaforoDIGEI_Lite(Flowable):
     - Sin título interno (gestiónalo fuera)
     - Sin meta
     """
-    def __init__(self, current, thresholds=(40, 70), unit="%",
+    def __init__(self, current, thresholds=SEMAFORO_THRESHOLDS, unit="%",
                  width=10*cm, height=6*cm, no_border=False):
         super().__init__()
         self.current = current
-        self.t_red, self.t_yellow = thresholds
+        self.thresholds = tuple(thresholds)
+        self.t_red, self.t_yellow = self.thresholds
         self.unit = unit
         self.width = width
         self.height = height
@@ -389,20 +1020,11 @@ class SemaforoDIGEI_Lite(Flowable):
         return self.width, self.height
 
     def _state_for(self, v):
-        if v < self.t_red:      return "red"
-        elif v < self.t_yellow: return "yellow"
-        else:                   return "green"
-
-    def draw(self):
-        c = self.canv
-        W, H = self.width, self.height
-
-        # Card base
-        if not self.no_border:
-            c.setFillColor(colors.white)
-            c.setStrokeColor(self.c_border)
-            c.rect(0, 0, W, H, fill=1, stroke=1)
+        return ("red", "yellow", "green")[band_index(v, self.thresholds)]
 
+    def _lamps(self):
+        '''Lamp radius, lamp centers and the x of the right column for the current card size.'''
+        H = self.height
         pad = 0.8*cm
         col_w = 3.0*cm
         left_x, left_y = pad, pad
@@ -412,25 +1034,58 @@ class SemaforoDIGEI_Lite(Flowable):
         r = min(0.40*cm, left_h/9.0)
         gap = max(0.35*cm, (left_h - 6*r)/2.0)
         cx = left_x + 0.9*cm
-        lab_x = cx + r + 0.30*cm
 
         cy_top    = left_y + left_h - r
         cy_middle = cy_top - (2*r + gap)
         cy_bottom = cy_middle - (2*r + gap)
 
         centers = {"green":(cx,cy_top), "yellow":(cx,cy_middle), "red":(cx,cy_bottom)}
+        right_x = left_x + col_w + 0.8*cm
+        return r, centers, right_x
+
+    def _draw_chrome(self, c):
+        '''Everything that does not depend on the value: card, lamps, lamp labels and legend.'''
+        W, H = self.width, self.height
+        r, centers, right_x = self._lamps()
 
-        # 3 focos
-        c.setStrokeColor(colors.transparent)
+        # Card base
+        if not self.no_border:
+            c.setFillColor(colors.white)
+            c.setStrokeColor(self.c_border)
+            c.rect(0, 0, W, H, fill=1, stroke=1)
+
+        # 3 focos (sin colores con alpha: ReportLab no registra ExtGState dentro de un form XObject)
         c.setFillColor(self.c_green);  c.circle(*centers["green"],  r, fill=1, stroke=0)
         c.setFillColor(self.c_yellow); c.circle(*centers["yellow"], r, fill=1, stroke=0)
         c.setFillColor(self.c_red);    c.circle(*centers["red"],    r, fill=1, stroke=0)
 
         # Etiquetas sutiles
+        lab_x = centers["green"][0] + r + 0.30*cm
         c.setFont("Helvetica", 8); c.setFillColor(self.c_muted)
-        c.drawString(lab_x, cy_top-3,    "Alto")
-        c.drawString(lab_x, cy_middle-3, "Medio")
-        c.drawString(lab_x, cy_bottom-3, "Bajo")
+        c.drawString(lab_x, centers["green"][1]-3,  "Alto")
+        c.drawString(lab_x, centers["yellow"][1]-3, "Medio")
+        c.drawString(lab_x, centers["red"][1]-3,    "Bajo")
+
+        # Leyenda "Niveles" vertical (con reglas)
+        base_y = H - 2.4*cm
+        c.setFont("Helvetica-Bold", 8); c.setFillColor(self.c_muted)
+        c.drawString(right_x, base_y, "Niveles:")
+        c.setFont("Helvetica", 8)
+        c.drawString(right_x, base_y - 0.45*cm, f"• Alto  ≥ {self.t_yellow}")
+        c.drawString(right_x, base_y - 0.90*cm, f"• Medio {self.t_red}–{self.t_yellow - 1}")
+        c.drawString(right_x, base_y - 1.35*cm, f"• Bajo  < {self.t_red}")
+
+    def draw(self):
+        c = self.canv
+        H = self.height
+        r, centers, right_x = self._lamps()
+
+        # El marco de la card se comparte entre todas las cards del mismo tamaño del documento
+        form_name = (f"semaforo_{self.width:.0f}x{self.height:.0f}_{self.t_red}_{self.t_yellow}"
+                     f"{'_sin_borde' if self.no_border else ''}")
+        c.saveState()
+        draw_form_once(c, form_name, self._draw_chrome)
+        c.restoreState()
 
         # Aro del estado actual
         st = self._state_for(self.current)
@@ -438,23 +1093,11 @@ class SemaforoDIGEI_Lite(Flowable):
         c.setStrokeColor(self.c_current); c.setLineWidth(3)
         c.circle(ccx, ccy, r + 0.16*cm, fill=0, stroke=1)
 
-        # Columna derecha (valor + leyenda)
-        right_x = left_x + col_w + 0.8*cm
-
         # Valor grande
         c.setFont("Helvetica-Bold", 30); c.setFillColor(self.c_value)
         val = f"{int(self.current)}{self.unit}" if self.unit else f"{int(self.current)}"
         c.drawString(right_x, H - 1.4*cm, val)
 
-        # Leyenda "Niveles" vertical (con reglas)
-        base_y = H - 2.4*cm
-        c.setFont("Helvetica-Bold", 8); c.setFillColor(self.c_muted)
-        c.drawString(right_x, base_y, "Niveles:")
-        c.setFont("Helvetica", 8)
-        c.drawString(right_x, base_y - 0.45*cm, "• Alto  ≥ 70")
-        c.drawString(right_x, base_y - 0.90*cm, "• Medio 40–69")
-        c.drawString(right_x, base_y - 1.35*cm, "• Bajo  < 40")
-
 def create_semaforo_flowables(doc, styles, pct_vs_100=0, pct_vs_80=0):
     '''Creates the two-column semaforo layout.'''
     
@@ -463,7 +1106,7 @@ def create_semaforo_flowables(doc, styles, pct_vs_100=0, pct_vs_80=0):
     
     # Titles for the cards
     title_a_text = "<b>PORCENTAJE DE INDICADORES ATENDIDOS RESPECTO AL 100% DE INDICADORES</b>"
-    title_b_text = "<b>PORCENTAJE DE INDICADORES ATENDIDOS RESPECTO AL 80% DE INDICADORES</b>"
+    title_b_text = f"<b>PORCENTAJE DE INDICADORES ATENDIDOS RESPECTO AL {META_PCT}% DE INDICADORES</b>"
     title_a = Paragraph(title_a_text, styles['card_title'])
     title_b = Paragraph(title_b_text, styles['card_title'])
 
@@ -494,6 +1137,37 @@ def create_semaforo_flowables(doc, styles, pct_vs_100=0, pct_vs_80=0):
         PageBreak()
     ]
 
+# --- Textos del catálogo en tablas ---
+# Las preguntas del catálogo son las mismas en todos los reportes: se parten en líneas una vez por
+# estilo y ancho, y cada tabla recibe una copia superficial (comparte las líneas; drawOn asigna el
+# canvas a la copia, no al original).
+_CATALOG_CELLS = {}
+
+class CatalogParagraph(Paragraph):
+    '''Paragraph already broken into lines for its width: wrap() at that width costs nothing.'''
+    def wrap(self, availWidth, availHeight):
+        if availWidth == getattr(self, 'width', None):
+            return self.width, self.height
+        return super().wrap(availWidth, availHeight)
+
+def catalog_cell(catalog, text, style, width):
+    '''
+    FixedTable cell for `text` in a wrap column `width` wide (inner). Text of `catalog` that does
+    not fit on one line comes back as a copy of its cached CatalogParagraph; anything else unchanged.
+    '''
+    if catalog is None or not catalog.has_text(text):
+        return text
+    key = (text, style.name, width)
+    cell = _CATALOG_CELLS.get(key)
+    if cell is None:
+        if FixedTable._fits(text, style, width):
+            cell = text
+        else:
+            cell = CatalogParagraph(text, style)
+            cell.wrap(width, 1e9)
+        _CATALOG_CELLS[key] = cell
+    return cell if isinstance(cell, str) else copy.copy(cell)
+
 def create_dimension_detail_flowables(dimension_data, styles, doc_width):
     flowables = []
 
@@ -513,12 +1187,10 @@ def create_dimension_detail_flowables(dimension_data, styles, doc_width):
     # Percentage attended as a SemaforoDIGEI_Lite card
     porcentaje_atendido = dimension_data["porcentaje_atendido"]
     
-    # Define thresholds for this specific semaforo
-    thresholds = (50, 80) # Red below 50, Yellow 50-80, Green above 80
 
     # Create the semaforo card centered and without border for individual dimensions
     from reportlab.platypus import Table, TableStyle
-    semaforo_card = SemaforoDIGEI_Lite(current=porcentaje_atendido, thresholds=thresholds, unit="%", width=7*cm, height=4*cm, no_border=True)
+    semaforo_card = SemaforoDIGEI_Lite(current=porcentaje_atendido, thresholds=DIMENSION_THRESHOLDS, unit="%", width=7*cm, height=4*cm, no_border=True)
     
     # Center the semaforo using a table with explicit width control
     centered_semaforo = Table([[semaforo_card]], colWidths=[doc_width], hAlign='CENTER')
@@ -542,20 +1214,25 @@ def create_dimension_detail_flowables(dimension_data, styles, doc_width):
         flowables.append(Paragraph(table_title_text, styles['chart_title'])) # Using chart_title style for consistency
         flowables.append(Spacer(1, 0.2*cm))
 
-        table_data = []
-        table_styles_list = []
-        current_row_index = 0
+        # Tabla larga: cada subdimensión abre un grupo cuyo encabezado se repite si el grupo
+        # continúa en la página siguiente
+        col_widths = [doc_width * 0.05, doc_width * 0.95 - 1*cm] # Small first column for bullet, large second for text
+        padding = (5, 5, 2, 2)
+        # Mismo ancho interior que calcula FixedTable para la columna de texto
+        text_width = col_widths[1] - padding[0] - padding[1]
+        catalog = get_catalog()
+        rows = []
         question_number = 1  # Numeración continua para todas las preguntas
 
         for item in unattended_points:
             # Subdimension as a header row (solo si hay preguntas)
             if 'preguntas' in item and item['preguntas']:
-                table_data.append([Paragraph(f"<b>{item['subdimension']}</b>", styles['table_header']), ''])
-                table_styles_list.append(('SPAN', (0, current_row_index), (1, current_row_index)))
-                table_styles_list.append(('BACKGROUND', (0, current_row_index), (1, current_row_index), LIGHT_GRAY))
-                table_styles_list.append(('LEFTPADDING', (0, current_row_index), (1, current_row_index), 8))
-                current_row_index += 1
-                
+                group = len(rows)
+                rows.append(FixedRow(
+                    [Paragraph(f"<b>{item['subdimension']}</b>", styles['table_header'])],
+                    ((0, -1, LIGHT_GRAY),), span=True, keep_with_next=True,
+                ))
+
                 # Agregar preguntas
                 for pregunta in item['preguntas']:
                     # Asegurar que el texto sea una cadena Unicode válida
@@ -563,23 +1240,13 @@ def create_dimension_detail_flowables(dimension_data, styles, doc_width):
                     # Saltar si es un texto muy largo (probablemente descripción)
                     if len(pregunta_text) > 300:
                         continue
-                    table_data.append([str(question_number), Paragraph(pregunta_text, styles['table_text'])])
-                    current_row_index += 1
+                    rows.append(FixedRow([str(question_number), catalog_cell(catalog, pregunta_text, styles['table_text'], text_width)], group=group))
                     question_number += 1
 
-        # General table styles
-        table_styles_list.extend([
-            ('VALIGN', (0,0), (-1,-1), 'TOP'),
-            ('LEFTPADDING', (0,0), (-1,-1), 5),
-            ('RIGHTPADDING', (0,0), (-1,-1), 5),
-            ('BOTTOMPADDING', (0,0), (-1,-1), 2),
-            ('TOPPADDING', (0,0), (-1,-1), 2),
-            ('GRID', (0,0), (-1,-1), 1, colors.lightgrey),
-        ])
-        
-        col_widths = [doc_width * 0.05, doc_width * 0.95 - 1*cm] # Small first column for bullet, large second for text
-        unattended_table = Table(table_data, colWidths=col_widths, hAlign='LEFT')
-        unattended_table.setStyle(TableStyle(table_styles_list))
+        unattended_table = FixedTable(
+            rows, col_widths, [styles['table_cell_left'], styles['table_text']], wrap_cols=(1,),
+            padding=padding, valign='TOP', grid=(1, colors.lightgrey),
+        )
         flowables.append(unattended_table)
     else:
         flowables.append(Paragraph("No hay puntos no atendidos para esta dimensión.", styles['p']))
@@ -793,69 +1460,38 @@ def create_special_section_with_data(data, styles, doc_width):
     # --- Tabla de Composición por Sexo (Dimensión 4) ---
     if data.composicion_sexo and len(data.composicion_sexo) > 0:
         table_title_text = "COMPOSICIÓN POR SEXO <font size='-2'>(TABLA 02)</font>"
-        flowables.append(Paragraph(table_title_text, styles['chart_title']))
+        flowables.extend(mark_section([Paragraph(table_title_text, styles['chart_title'])], "composicion"))
         flowables.append(Spacer(1, 0.2*cm))
         
-        table_data = []
-        table_data.append([
-            Paragraph("<b>Pregunta</b>", styles['table_header']),
-            Paragraph("<b>Descripción</b>", styles['table_header']),
-            Paragraph("<b>Mujeres</b>", styles['table_header']),
-            Paragraph("<b>Hombres</b>", styles['table_header']),
-            Paragraph("<b>Diferencia</b>", styles['table_header'])
-        ])
-        
+        body = []
         for item in data.composicion_sexo:
             item_dict = item if isinstance(item, dict) else item.__dict__
             descripcion = item_dict.get('descripcion', '') or 'N/A'
-            
-            table_data.append([
-                Paragraph(item_dict.get('pregunta_texto', 'N/A'), styles['table_text']),
-                Paragraph(descripcion, styles['table_text']),
+            body.append([
+                item_dict.get('pregunta_texto', 'N/A'),
+                descripcion,
                 str(item_dict.get('cantidad_mujeres', 0)),
                 str(item_dict.get('cantidad_hombres', 0)),
                 str(item_dict.get('diferencia', 0))
             ])
-        
-        table_style_commands = [
-            ('BACKGROUND', (0, 0), (-1, 0), PRIMARY_COLOR),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('ALIGN', (0, 1), (1, -1), 'LEFT'),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('GRID', (0, 0), (-1, -1), 0.5, MEDIUM_GRAY),
-            ('LEFTPADDING', (0, 0), (-1, -1), 8),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-        ]
-        
-        # Zebra striping
-        for i in range(1, len(table_data)):
-            if i % 2 == 0:
-                table_style_commands.append(('BACKGROUND', (0, i), (-1, i), LIGHT_GRAY))
-        
-        table_style = TableStyle(table_style_commands)
-        
-        table = Table(table_data, colWidths=[doc_width*0.25, doc_width*0.25, doc_width*0.15, doc_width*0.15, doc_width*0.1], hAlign='LEFT')
-        table.setStyle(table_style)
+
+        rows = [header_row(["Pregunta", "Descripción", "Mujeres", "Hombres", "Diferencia"], styles['table_header'])]
+        rows.extend(striped_rows(body))
+        number = styles['table_cell']
+        table = FixedTable(
+            rows, [doc_width*0.25, doc_width*0.25, doc_width*0.15, doc_width*0.15, doc_width*0.1],
+            [styles['table_text'], styles['table_text'], number, number, number], wrap_cols=(0, 1), valign='TOP',
+        )
         flowables.append(table)
         flowables.append(PageBreak())  # Separar en página diferente
     
     # --- Tabla de Salarios (Dimensión 5) ---
     if data.salarios and len(data.salarios) > 0:
         table_title_text = "BRECHA SALARIAL POR CATEGORÍA <font size='-2'>(TABLA 03)</font>"
-        flowables.append(Paragraph(table_title_text, styles['chart_title']))
+        flowables.extend(mark_section([Paragraph(table_title_text, styles['chart_title'])], "salarios"))
         flowables.append(Spacer(1, 0.2*cm))
         
-        table_data = []
-        table_data.append([
-            Paragraph("<b>Categoría</b>", styles['table_header']),
-            Paragraph("<b>Hombres</b>", styles['table_header']),
-            Paragraph("<b>Mujeres</b>", styles['table_header']),
-            Paragraph("<b>Diferencia</b>", styles['table_header'])
-        ])
-        
+        body = []
         for item in data.salarios:
             item_dict = item if isinstance(item, dict) else item.__dict__
             
@@ -864,33 +1500,20 @@ def create_special_section_with_data(data, styles, doc_width):
             mujeres = item_dict.get('cantidad_mujeres', 0)
             diferencia = item_dict.get('diferencia', 0)
             
-            table_data.append([
-                Paragraph(item_dict.get('categoria_nombre', 'N/A'), styles['table_text']),
+            body.append([
+                item_dict.get('categoria_nombre', 'N/A'),
                 f"${hombres:,.2f}",
                 f"${mujeres:,.2f}",
                 f"${diferencia:,.2f}"
             ])
-        
-        table_style_commands = [
-            ('BACKGROUND', (0, 0), (-1, 0), PRIMARY_COLOR),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('ALIGN', (0, 1), (0, -1), 'LEFT'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('GRID', (0, 0), (-1, -1), 0.5, MEDIUM_GRAY),
-            ('LEFTPADDING', (0, 0), (-1, -1), 8),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-        ]
-        
-        # Zebra striping
-        for i in range(1, len(table_data)):
-            if i % 2 == 0:
-                table_style_commands.append(('BACKGROUND', (0, i), (-1, i), LIGHT_GRAY))
-        
-        table = Table(table_data, colWidths=[doc_width*0.4, doc_width*0.2, doc_width*0.2, doc_width*0.15], hAlign='LEFT')
-        table.setStyle(TableStyle(table_style_commands))
+
+        rows = [header_row(["Categoría", "Hombres", "Mujeres", "Diferencia"], styles['table_header'])]
+        rows.extend(striped_rows(body))
+        number = styles['table_cell']
+        table = FixedTable(
+            rows, [doc_width*0.4, doc_width*0.2, doc_width*0.2, doc_width*0.15],
+            [styles['table_text'], number, number, number], wrap_cols=(0,),
+        )
         flowables.append(table)
         flowables.append(PageBreak())  # Separar en página diferente
     
@@ -899,60 +1522,28 @@ def create_special_section_with_data(data, styles, doc_width):
         quejas_dict = data.quejas if isinstance(data.quejas, dict) else data.quejas.__dict__
         
         table_title_text = "QUEJAS DE ACOSO Y HOSTIGAMIENTO <font size='-2'>(TABLA 04)</font>"
-        flowables.append(Paragraph(table_title_text, styles['chart_title']))
+        flowables.extend(mark_section([Paragraph(table_title_text, styles['chart_title'])], "quejas"))
         flowables.append(Spacer(1, 0.2*cm))
         
-        table_data = []
-        table_data.append([
-            Paragraph("<b>Tipo de Queja</b>", styles['table_header']),
-            Paragraph("<b>Mujeres</b>", styles['table_header']),
-            Paragraph("<b>Hombres</b>", styles['table_header'])
-        ])
-        
-        # Quejas de personal
-        table_data.append([
-            Paragraph("Quejas Personal - Recibidas", styles['table_text']),
-            str(quejas_dict.get('quejas_personal_recibidas_mujeres', 0)),
-            str(quejas_dict.get('quejas_personal_recibidas_hombres', 0))
-        ])
-        table_data.append([
-            Paragraph("Quejas Personal - Resueltas", styles['table_text']),
-            str(quejas_dict.get('quejas_personal_resueltas_mujeres', 0)),
-            str(quejas_dict.get('quejas_personal_resueltas_hombres', 0))
-        ])
-        
-        # Quejas de estudiantes
-        table_data.append([
-            Paragraph("Quejas Estudiantes - Recibidas", styles['table_text']),
-            str(quejas_dict.get('quejas_estudiantes_recibidas_mujeres', 0)),
-            str(quejas_dict.get('quejas_estudiantes_recibidas_hombres', 0))
-        ])
-        table_data.append([
-            Paragraph("Quejas Estudiantes - Resueltas", styles['table_text']),
-            str(quejas_dict.get('quejas_estudiantes_resueltas_mujeres', 0)),
-            str(quejas_dict.get('quejas_estudiantes_resueltas_hombres', 0))
-        ])
-        
-        table_style_commands = [
-            ('BACKGROUND', (0, 0), (-1, 0), PRIMARY_COLOR),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('ALIGN', (0, 1), (0, -1), 'LEFT'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('GRID', (0, 0), (-1, -1), 0.5, MEDIUM_GRAY),
-            ('LEFTPADDING', (0, 0), (-1, -1), 8),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
+        body = [
+            ["Quejas Personal - Recibidas",
+             str(quejas_dict.get('quejas_personal_recibidas_mujeres', 0)),
+             str(quejas_dict.get('quejas_personal_recibidas_hombres', 0))],
+            ["Quejas Personal - Resueltas",
+             str(quejas_dict.get('quejas_personal_resueltas_mujeres', 0)),
+             str(quejas_dict.get('quejas_personal_resueltas_hombres', 0))],
+            ["Quejas Estudiantes - Recibidas",
+             str(quejas_dict.get('quejas_estudiantes_recibidas_mujeres', 0)),
+             str(quejas_dict.get('quejas_estudiantes_recibidas_hombres', 0))],
+            ["Quejas Estudiantes - Resueltas",
+             str(quejas_dict.get('quejas_estudiantes_resueltas_mujeres', 0)),
+             str(quejas_dict.get('quejas_estudiantes_resueltas_hombres', 0))],
         ]
-        
-        # Zebra striping
-        for i in range(1, len(table_data)):
-            if i % 2 == 0:
-                table_style_commands.append(('BACKGROUND', (0, i), (-1, i), LIGHT_GRAY))
-        
-        table = Table(table_data, colWidths=[doc_width*0.5, doc_width*0.2, doc_width*0.2], hAlign='LEFT')
-        table.setStyle(TableStyle(table_style_commands))
+
+        rows = [header_row(["Tipo de Queja", "Mujeres", "Hombres"], styles['table_header'])]
+        rows.extend(striped_rows(body))
+        number = styles['table_cell']
+        table = FixedTable(rows, [doc_width*0.5, doc_width*0.2, doc_width*0.2], [styles['table_text'], number, number])
         flowables.append(table)
         flowables.append(Spacer(1, 0.5*cm))  # Espacio pequeño entre quejas y atenciones
     
@@ -961,48 +1552,18 @@ def create_special_section_with_data(data, styles, doc_width):
         atenciones_dict = data.atenciones if isinstance(data.atenciones, dict) else data.atenciones.__dict__
         
         table_title_text = "ATENCIONES A MUJERES <font size='-2'>(TABLA 05)</font>"
-        flowables.append(Paragraph(table_title_text, styles['chart_title']))
+        flowables.extend(mark_section([Paragraph(table_title_text, styles['chart_title'])], "atenciones"))
         flowables.append(Spacer(1, 0.2*cm))
         
-        table_data = []
-        table_data.append([
-            Paragraph("<b>Tipo de Atención</b>", styles['table_header']),
-            Paragraph("<b>Cantidad</b>", styles['table_header'])
-        ])
-        
-        table_data.append([
-            Paragraph("Atención en Reclutamiento", styles['table_text']),
-            str(atenciones_dict.get('atencion_reclutamiento', 0))
-        ])
-        table_data.append([
-            Paragraph("Atención en Procesos Laborales", styles['table_text']),
-            str(atenciones_dict.get('atencion_procesos_laborales', 0))
-        ])
-        table_data.append([
-            Paragraph("Atención a Estudiantes", styles['table_text']),
-            str(atenciones_dict.get('atencion_estudiantes', 0))
-        ])
-        
-        table_style_commands = [
-            ('BACKGROUND', (0, 0), (-1, 0), PRIMARY_COLOR),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('ALIGN', (0, 1), (0, -1), 'LEFT'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('GRID', (0, 0), (-1, -1), 0.5, MEDIUM_GRAY),
-            ('LEFTPADDING', (0, 0), (-1, -1), 8),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
+        body = [
+            ["Atención en Reclutamiento", str(atenciones_dict.get('atencion_reclutamiento', 0))],
+            ["Atención en Procesos Laborales", str(atenciones_dict.get('atencion_procesos_laborales', 0))],
+            ["Atención a Estudiantes", str(atenciones_dict.get('atencion_estudiantes', 0))],
         ]
-        
-        # Zebra striping
-        for i in range(1, len(table_data)):
-            if i % 2 == 0:
-                table_style_commands.append(('BACKGROUND', (0, i), (-1, i), LIGHT_GRAY))
-        
-        table = Table(table_data, colWidths=[doc_width*0.6, doc_width*0.3], hAlign='LEFT')
-        table.setStyle(TableStyle(table_style_commands))
+
+        rows = [header_row(["Tipo de Atención", "Cantidad"], styles['table_header'])]
+        rows.extend(striped_rows(body))
+        table = FixedTable(rows, [doc_width*0.6, doc_width*0.3], [styles['table_text'], styles['table_cell']])
         flowables.append(table)
         flowables.append(Spacer(1, 1*cm))
     
@@ -1014,15 +1575,134 @@ def create_special_section_with_data(data, styles, doc_width):
 # Funciones removidas - encuestas ya no se incluyen en el reporte
 
 # --- Pydantic Models ---
+class Indicador(BaseModel):
+    id: Optional[int | str] = None
+    texto: str = ''
+
+class Subdimension(BaseModel):
+    id: Optional[int | str] = None
+    nombre: str = ''
+    # Conteos fraccionarios (ponderados) se aceptan tal cual, como en los reportes anteriores
+    total_indicadores: int | float = 0
+    indicadores_atendidos: int | float = 0
+    porcentaje: float = 0
+    meta_80: float = 1
+    # null equivale a 'N/A' (banda calculada con el porcentaje)
+    semaforo: Optional[str] = 'N/A'
+    indicadores_no_atendidos: list[Indicador] = []
+
+class Dimension(BaseModel):
+    orden: Optional[int | str] = None
+    id: Optional[int | str] = None
+    nombre: str = ''
+    subdimensiones: list[Subdimension] = []
+
+class GraficaDimension(BaseModel):
+    dimensionNombre: str = 'N/A'
+    porcentaje: float = 0
+
 class ReporteData(BaseModel):
     organizacion: dict
     metadata: dict
-    dimensiones: list
-    grafica_dimensiones: list
+    dimensiones: list[Dimension]
+    grafica_dimensiones: list[GraficaDimension]
     composicion_sexo: Optional[list] = None
     salarios: Optional[list] = None
     quejas: Optional[dict] = None
     atenciones: Optional[dict] = None
+    # Versión del catálogo a la que se refieren los ids (opcional)
+    catalogo: Optional[str] = None
+
+    @model_validator(mode='after')
+    def resolve_catalog_ids(self):
+        '''Checks the declared catalog version and fills the empty names and texts of entries sent by id.'''
+        catalog = None
+
+        def current_catalog():
+            nonlocal catalog
+            if catalog is None:
+                catalog = get_catalog()
+                if catalog is None:
+                    raise ValueError("No hay catálogo cargado: cada entrada debe traer su texto")
+            return catalog
+
+        def lookup(entry_id, level):
+            try:
+                return current_catalog().text(str(entry_id), level)
+            except KeyError:
+                raise ValueError(f"El id {entry_id} no existe en el catálogo {catalog.version} ({LEVELS[level]})") from None
+
+        # La versión declarada se valida aunque todas las entradas traigan su texto
+        if self.catalogo and self.catalogo != current_catalog().version:
+            raise ValueError(f"Catálogo {self.catalogo} no disponible (versión actual: {catalog.version})")
+        for dim in self.dimensiones:
+            if not dim.nombre and dim.id is not None:
+                dim.nombre = lookup(dim.id, 0)
+            for sub in dim.subdimensiones:
+                if not sub.nombre and sub.id is not None:
+                    sub.nombre = lookup(sub.id, 1)
+                for indicador in sub.indicadores_no_atendidos:
+                    if not indicador.texto and indicador.id is not None:
+                        indicador.texto = lookup(indicador.id, 2)
+        return self
+
+# --- Vista precalculada del reporte ---
+class ReportView:
+    '''
+    Everything the section builders need from a ReporteData, computed in a single pass over the
+    dimensions: global totals and percentages, bar chart values, the subdimension table rows and
+    the per-dimension detail blocks with unattended indicators grouped by subdimension. The
+    numbers come from scoring.score_reports; pass `scores` when they were computed for a batch.
+    '''
+    def __init__(self, data: ReporteData, scores=None):
+        scores = scores or score_reports([data])[0]
+        sub_pct_vs_80 = iter(scores.sub_pct_vs_80.tolist())
+        sub_band = iter(scores.sub_band.tolist())
+        dim_pct = scores.dim_pct.tolist()
+        self.dimension_names = []
+        self.chart_data = [{'pct_vs_100': g.porcentaje} for g in data.grafica_dimensiones]
+        self.radar_values = [g.porcentaje for g in data.grafica_dimensiones[:9]]
+        self.tabla = {
+            "descripcion": "La siguiente tabla muestra el nivel de cumplimiento por dimensión y subdimensión",
+            "dimensiones": [],
+        }
+        self.detalles = []
+
+        for d, dim in enumerate(data.dimensiones):
+            orden = dim.orden if dim.orden is not None else dim.id
+            self.dimension_names.append(dim.nombre)
+            filas = []
+            preguntas_por_sub = {}
+            for i, sub in enumerate(dim.subdimensiones, start=1):
+                semaforo = (sub.semaforo or 'N/A').lower()
+                band = BANDS[next(sub_band)]
+                filas.append({
+                    "id": f"{orden}.{i}",
+                    "nombre": sub.nombre,
+                    "indicadores_total": sub.total_indicadores,
+                    "indicadores_atendidos": sub.indicadores_atendidos,
+                    "porcentaje_vs_100": sub.porcentaje,
+                    "porcentaje_vs_80": next(sub_pct_vs_80),
+                    # Sin etiqueta válida (N/A) se usa la banda calculada a partir del porcentaje
+                    "semaforo": semaforo if semaforo in BANDS else band,
+                })
+                if sub.indicadores_no_atendidos:
+                    # Subdimensiones con el mismo nombre se agrupan en un solo bloque
+                    preguntas_por_sub.setdefault(sub.nombre, []).extend(ind.texto for ind in sub.indicadores_no_atendidos)
+
+            self.tabla["dimensiones"].append({"id": orden, "nombre": dim.nombre, "subdimensiones": filas})
+            self.detalles.append({
+                "dimension_nombre": f"{orden}. {dim.nombre}",
+                "porcentaje_atendido": dim_pct[d],
+                "puntos_no_atendidos": [
+                    {"subdimension": nombre, "preguntas": preguntas} for nombre, preguntas in preguntas_por_sub.items()
+                ],
+            })
+
+        self.total_indicadores = scores.total
+        self.indicadores_atendidos = scores.atendidos
+        self.pct_vs_100 = scores.pct_vs_100
+        self.pct_vs_80 = scores.pct_vs_80
 
 # --- Paleta de colores profesional para impresión ---
 PRIMARY_COLOR = colors.HexColor("#757575")  # Gris tenue oscuro para encabezados
@@ -1035,7 +1715,98 @@ LIGHT_GRAY = colors.HexColor("#FAFAFA")  # Gris muy claro para fondos alternados
 MEDIUM_GRAY = colors.HexColor("#BDBDBD")  # Gris medio para bordes
 
 # --- Índice de Contenidos ---
-def create_table_of_contents(data, styles):
+# Cada línea del índice lleva a la derecha la página donde empieza su sección. En un render de un
+# solo documento la línea dibuja un form XObject que se define al llegar al encabezado de la sección
+# (referencia hacia adelante); en el render por secciones se guardan las posiciones y los números se
+# dibujan al unir las páginas (fix_up_pages).
+TOC_NUMBER_FONT = "Helvetica"
+TOC_NUMBER_WIDTH = 1.5*cm
+
+class PageRefs:
+    '''Pages where the marked sections start and positions of the TOC lines that cite them.'''
+    def __init__(self, forward=True):
+        self.forward = forward
+        self.marks = {}  # sección -> página
+        self.lines = []  # (sección, página, x derecha, línea base, tamaño de fuente, color) en coordenadas de página
+        self.doc = None
+
+    def attach(self, doc):
+        self.doc = doc
+        doc.afterFlowable = self.after_flowable
+
+    def after_flowable(self, flowable):
+        key = getattr(flowable, 'section_key', None)
+        if key is None or key in self.marks:
+            return
+        self.marks[key] = self.doc.page
+        if self.forward:
+            for i, line in enumerate(self.lines):
+                if line[0] == key:
+                    self._define_form(self.doc.canv, i, self.doc.page)
+
+    def line(self, canv, key, x, y, font_size, color):
+        '''Registers a TOC line whose number goes at local (x, y); returns the form to draw, if any.'''
+        ax, ay = canv.absolutePosition(x, y)
+        self.lines.append((key, canv.getPageNumber(), ax, ay, font_size, color))
+        return f"toc_{len(self.lines) - 1}" if self.forward else None
+
+    def _define_form(self, canv, i, page):
+        key, _, x, y, font_size, color = self.lines[i]
+        canv.beginForm(f"toc_{i}", *FORM_BOUNDS)
+        if page is not None:
+            canv.setFont(TOC_NUMBER_FONT, font_size)
+            canv.setFillColor(color)
+            canv.drawRightString(x, y, str(page))
+        canv.endForm()
+
+    def close(self, canv):
+        # Secciones citadas que no aparecieron en el reporte: su form queda vacío
+        if self.forward:
+            for i, line in enumerate(self.lines):
+                if line[0] not in self.marks:
+                    self._define_form(canv, i, None)
+
+def mark_section(flowables, key):
+    '''Tags the first non-spacer flowable (the section heading) as the start of section `key`.'''
+    for flowable in flowables:
+        if not isinstance(flowable, Spacer):
+            flowable.section_key = key
+            break
+    return flowables
+
+class TocLine(Flowable):
+    '''TOC paragraph with the page number of its section right-aligned on the first baseline.'''
+    def __init__(self, text, style, key, refs):
+        super().__init__()
+        self.para = Paragraph(text, style)
+        self.style = style
+        self.key = key
+        self.refs = refs
+
+    def wrap(self, aw, ah):
+        self.width = aw
+        _, self.height = self.para.wrap(aw - TOC_NUMBER_WIDTH, ah)
+        return self.width, self.height
+
+    def getSpaceBefore(self):
+        return self.para.getSpaceBefore()
+
+    def getSpaceAfter(self):
+        return self.para.getSpaceAfter()
+
+    def draw(self):
+        self.para.drawOn(self.canv, 0, 0)
+        # Mismo cálculo de línea base que Paragraph para la primera línea
+        style = self.style
+        form = self.refs.line(self.canv, self.key, self.width, self.height - style.fontSize, style.fontSize, style.textColor)
+        if form:
+            # El form se define con coordenadas de página: se dibuja sin la traslación del flowable
+            self.canv.saveState()
+            self.canv.transform(1, 0, 0, 1, *[-v for v in self.canv.absolutePosition(0, 0)])
+            self.canv.doForm(form)
+            self.canv.restoreState()
+
+def create_table_of_contents(view, styles, refs):
     """Crea un índice de contenidos del reporte en formato formal"""
     flowables = []
     
@@ -1048,53 +1819,36 @@ def create_table_of_contents(data, styles):
     flowables.append(HRFlowable(width="100%", thickness=2, color=PRIMARY_COLOR, spaceBefore=0, spaceAfter=20))
     
     # Estilo para el índice
-    toc_style = ParagraphStyle(
-        name='TOC',
-        parent=styles['p'],
-        fontSize=11,
-        leading=18,
-        leftIndent=0,
-        spaceAfter=8
-    )
-    
-    toc_subsection_style = ParagraphStyle(
-        name='TOCSubsection',
-        parent=styles['p'],
-        fontSize=10,
-        leading=16,
-        leftIndent=20,
-        spaceAfter=6
-    )
+    toc_style = styles['toc']
+    toc_subsection_style = styles['toc_subsection']
     
-    # Secciones principales
+    # Secciones principales (con la clave que marca el inicio de cada una, ver mark_section)
     sections = [
-        ("I.", "Introducción y Marco Conceptual"),
-        ("II.", "Indicadores de Nivel de Cumplimiento"),
-        ("III.", "Panorama General por Dimensión"),
-        ("IV.", "Porcentaje de Indicadores Atendidos por Dimensión"),
-        ("V.", "Subdimensiones por Dimensión"),
+        ("I.", "Introducción y Marco Conceptual", "contenido"),
+        ("II.", "Indicadores de Nivel de Cumplimiento", "semaforos"),
+        ("III.", "Panorama General por Dimensión", "radar"),
+        ("IV.", "Porcentaje de Indicadores Atendidos por Dimensión", "barras"),
+        ("V.", "Subdimensiones por Dimensión", "subdimensiones"),
     ]
     
     # Agregar secciones principales
-    for num, desc in sections:
-        flowables.append(Paragraph(f"<b>{num}</b> {desc}", toc_style))
+    for num, desc, key in sections:
+        flowables.append(TocLine(f"<b>{num}</b> {desc}", toc_style, key, refs))
     
     # Agregar dimensiones como subsecciones
     flowables.append(Spacer(1, 0.3*cm))
-    flowables.append(Paragraph("<b>VI. Análisis por Dimensión</b>", toc_style))
+    flowables.append(TocLine("<b>VI. Análisis por Dimensión</b>", toc_style, "detalle-1", refs))
     
-    for idx, dim in enumerate(data.dimensiones if hasattr(data, 'dimensiones') else [], start=1):
-        dim_dict = dim if isinstance(dim, dict) else dim.__dict__
-        dim_nombre = dim_dict.get('nombre', f'Dimensión {idx}')
-        flowables.append(Paragraph(f"{idx}. {dim_nombre}", toc_subsection_style))
+    for idx, dim_nombre in enumerate(view.dimension_names, start=1):
+        flowables.append(TocLine(f"{idx}. {dim_nombre}", toc_subsection_style, f"detalle-{idx}", refs))
     
     # Agregar secciones finales
     flowables.append(Spacer(1, 0.3*cm))
-    flowables.append(Paragraph("<b>VII.</b> Datos Complementarios", toc_style))
-    flowables.append(Paragraph("• Composición por Sexo", toc_subsection_style))
-    flowables.append(Paragraph("• Brecha Salarial por Categoría", toc_subsection_style))
-    flowables.append(Paragraph("• Quejas de Acoso y Hostigamiento", toc_subsection_style))
-    flowables.append(Paragraph("• Atenciones a Mujeres", toc_subsection_style))
+    flowables.append(TocLine("<b>VII.</b> Datos Complementarios", toc_style, "especial", refs))
+    flowables.append(TocLine("• Composición por Sexo", toc_subsection_style, "composicion", refs))
+    flowables.append(TocLine("• Brecha Salarial por Categoría", toc_subsection_style, "salarios", refs))
+    flowables.append(TocLine("• Quejas de Acoso y Hostigamiento", toc_subsection_style, "quejas", refs))
+    flowables.append(TocLine("• Atenciones a Mujeres", toc_subsection_style, "atenciones", refs))
     
     flowables.append(Spacer(1, 1*cm))
     flowables.append(HRFlowable(width="100%", thickness=1, color=MEDIUM_GRAY, spaceBefore=0, spaceAfter=0))
@@ -1103,30 +1857,16 @@ def create_table_of_contents(data, styles):
     return flowables
 
 # --- Gráfica de Radar ---
-def create_radar_chart(data, styles):
-    """Crea una gráfica de radar/araña con las 9 dimensiones"""
-    chart_title_text = "<b>PANORAMA GENERAL POR DIMENSIÓN</b><br/><font size='-2'>(GRÁFICA DE RADAR)</font>"
-    chart_title = Paragraph(chart_title_text, styles['chart_title'])
-    
-    # Preparar datos
-    dimension_names = [
-        "Formación", "Investigación", "Comunicación", "Participación",
-        "Condiciones Lab.", "Acoso/Violencia", "Corresponsabilidad",
-        "Institucionalidad", "Infraestructura"
-    ]
-    
-    # Limitar a 9 dimensiones
-    values = [item.get('porcentaje', 0) if isinstance(item, dict) else getattr(item, 'porcentaje', 0) for item in data[:9]]
-    
-    # Asegurar que tengamos exactamente 9 valores
-    while len(values) < 9:
-        values.append(0)
-    values = values[:9]
-    
-    # Crear el dibujo
-    drawing = Drawing(width=15*cm, height=15*cm)
-    
-    # Crear el spider chart
+RADAR_DIMENSION_NAMES = [
+    "Formación", "Investigación", "Comunicación", "Participación",
+    "Condiciones Lab.", "Acoso/Violencia", "Corresponsabilidad",
+    "Institucionalidad", "Infraestructura"
+]
+
+def _radar_spider(values):
+    '''SpiderChart with the geometry and styling of the radar chart.'''
+    from reportlab.graphics.charts.spider import SpiderChart
+
     spider = SpiderChart()
     spider.x = 2*cm
     spider.y = 2*cm
@@ -1134,7 +1874,7 @@ def create_radar_chart(data, styles):
     spider.height = 11*cm
     
     spider.data = [values]
-    spider.labels = dimension_names
+    spider.labels = RADAR_DIMENSION_NAMES
     
     spider.strands[0].fillColor = colors.HexColor("#6A1B9A40")  # Morado con transparencia
     spider.strands[0].strokeColor = PRIMARY_COLOR
@@ -1142,8 +1882,44 @@ def create_radar_chart(data, styles):
     
     spider.strandLabels.fontName = 'Helvetica'
     spider.strandLabels.fontSize = 8
-    
+    return spider
+
+def _radar_web():
+    '''Static layer of the radar chart: spokes and dimension labels, without strands.'''
+    spider = _radar_spider([1] * len(RADAR_DIMENSION_NAMES))
+    spider.strands[0].fillColor = None
+    spider.strands[0].strokeColor = None
+    drawing = Drawing(width=15*cm, height=15*cm)
     drawing.add(spider)
+    return drawing
+
+def radar_chart_drawing(values):
+    '''Radar chart of the 9 dimensions as a LayeredDrawing: this report's strands under the shared web.'''
+    # Limitar a 9 dimensiones
+    values = list(values[:9])
+    
+    # Asegurar que tengamos exactamente 9 valores
+    while len(values) < 9:
+        values.append(0)
+    values = values[:9]
+    
+    # Capa del reporte: solo la figura de los datos (rayos sin trazo y sin etiquetas)
+    spider = _radar_spider(values)
+    spider.labels = None
+    spider.spokes.strokeColor = None
+    strands = Drawing(width=15*cm, height=15*cm)
+    strands.add(spider)
+
+    # Los rayos y etiquetas van encima de la figura, igual que en SpiderChart
+    return LayeredDrawing(15*cm, 15*cm, [
+        strands,
+        ("radar_rayos", cached_chart_layer(("radar_rayos",), _radar_web)),
+    ])
+
+def create_radar_chart(values, styles):
+    """Crea una gráfica de radar/araña con las 9 dimensiones"""
+    chart_title_text = "<b>PANORAMA GENERAL POR DIMENSIÓN</b><br/><font size='-2'>(GRÁFICA DE RADAR)</font>"
+    chart_title = Paragraph(chart_title_text, styles['chart_title'])
     
     return [
         Spacer(1, 1*cm),
@@ -1151,23 +1927,22 @@ def create_radar_chart(data, styles):
         Spacer(1, 0.2*cm),
         Paragraph("Esta gráfica muestra el porcentaje de cumplimiento en cada una de las 9 dimensiones evaluadas.", styles['p']),
         Spacer(1, 0.5*cm),
-        drawing,
+        radar_chart_drawing(values),
         PageBreak()
     ]
 
-# --- PDF Generation ---
-def create_pdf_in_memory(data: ReporteData):
-    '''
-    Generates a complex PDF document in memory using Platypus and returns the buffer.
-    '''
-    buffer = io.BytesIO()
-    
-    W, H = A4
+# --- Registro de estilos del reporte ---
+# Los estilos se construyen una sola vez por (fuentes disponibles, tema) y se comparten entre requests:
+# ningún builder debe modificarlos.
+_STYLE_REGISTRY = {}
+
+def _build_report_styles(use_custom_fonts, theme):
+    '''Builds the paragraph styles used by the report from a private sample style sheet.'''
     base_styles = getSampleStyleSheet()
     
     # Configurar fuentes según disponibilidad
-    font_name = 'DejaVuSans' if USE_CUSTOM_FONTS else 'Helvetica'
-    font_name_bold = 'DejaVuSans-Bold' if USE_CUSTOM_FONTS else 'Helvetica-Bold'
+    font_name = 'DejaVuSans' if use_custom_fonts else 'Helvetica'
+    font_name_bold = 'DejaVuSans-Bold' if use_custom_fonts else 'Helvetica-Bold'
     
     md_styles = {
         'h1': ParagraphStyle(name='MarkdownH1', parent=base_styles['h1'], fontSize=12, spaceBefore=12, spaceAfter=4, fontName=font_name_bold),
@@ -1184,26 +1959,419 @@ def create_pdf_in_memory(data: ReporteData):
     md_styles['table_text'] = ParagraphStyle(name='TableText', parent=base_styles['Normal'], fontSize=9, fontName=font_name)
     md_styles['table_header'] = ParagraphStyle(name='TableHeader', parent=base_styles['Normal'], fontSize=9, fontName=font_name_bold)
     md_styles['table_header_small'] = ParagraphStyle(name='TableHeaderSmall', parent=base_styles['Normal'], fontSize=8, fontName=font_name_bold)
+    # Celdas de texto plano (números) en FixedTable: la fuente por defecto de una celda de Table
+    md_styles['table_cell'] = ParagraphStyle(name='TableCell', parent=base_styles['Normal'], alignment=TA_CENTER)
+    md_styles['table_cell_left'] = ParagraphStyle(name='TableCellLeft', parent=md_styles['table_cell'], alignment=TA_LEFT)
     md_styles['table_text_centered'] = ParagraphStyle(name='TableTextCentered', parent=base_styles['Normal'], fontSize=9, fontName=font_name, alignment=TA_CENTER)
-    TITLE_STYLE = base_styles['h1']; TITLE_STYLE.alignment=TA_LEFT; TITLE_STYLE.fontName=font_name_bold
+    md_styles['title'] = ParagraphStyle(name='ReportTitle', parent=base_styles['h1'], alignment=TA_LEFT, fontName=font_name_bold)
+    md_styles['body'] = ParagraphStyle(name='ReportBody', parent=base_styles['BodyText'])
+    # Índice
+    md_styles['toc'] = ParagraphStyle(name='TOC', parent=md_styles['p'], fontSize=11, leading=18, leftIndent=0, spaceAfter=8)
+    md_styles['toc_subsection'] = ParagraphStyle(name='TOCSubsection', parent=md_styles['p'], fontSize=10, leading=16, leftIndent=20, spaceAfter=6)
+    return MappingProxyType(md_styles)
+
+def get_report_styles(theme="default"):
+    '''Returns the shared, read-only style mapping for the current font availability and theme.'''
+    key = (USE_CUSTOM_FONTS, theme)
+    styles = _STYLE_REGISTRY.get(key)
+    if styles is None:
+        styles = _STYLE_REGISTRY.setdefault(key, _build_report_styles(*key))
+    return styles
+
+get_report_styles()
+
+# --- Imágenes ---
+class ImageAsset:
+    '''
+    An image decoded once, downsampled to its display size and kept as ready-to-embed XObjects.
+    `source` (the original file) is only drawn again if the XObjects cannot be embedded directly.
+    '''
+    def __init__(self, name, xobject, smask, source):
+        self.name = name
+        self.xobject = xobject
+        self.smask = smask
+        self.source = source
+        self.aspect = xobject.height / float(xobject.width)
+        self.size = len(xobject.streamContent) + (len(smask.streamContent) if smask is not None else 0) + len(source)
+
+class ImageAssetCache:
+    '''LRU of ImageAssets keyed by image content, display width and DPI, bounded by encoded bytes.'''
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, source: bytes, display_width: float, dpi: int = None):
+        dpi = dpi or PDF_IMAGE_DPI
+        key = hashlib.sha256(source).hexdigest()[:24] + f"-{display_width:.0f}-{dpi}"
+        with self._lock:
+            asset = self._entries.get(key)
+            if asset is not None:
+                self._entries.move_to_end(key)
+                return asset
+        asset = self._encode(key, source, display_width, dpi)
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = asset
+                self._size += asset.size
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted.size
+        return asset
+
+    @staticmethod
+    def _encode(key, source, display_width, dpi):
+        from PIL import Image as PILImage
+
+        im = PILImage.open(io.BytesIO(source))
+        im.load()
+        target_px = math.ceil(display_width / 72 * dpi)
+        if im.width > target_px:
+            im = im.resize((target_px, max(1, round(im.height * target_px / im.width))), PILImage.LANCZOS)
+        xobject = pdfdoc.PDFImageXObject(f"img{key.replace('-', '_')}", None, mask='auto')
+        xobject.loadImageFromSRC(ImageReader(im))
+        smask = xobject.__dict__.pop('_smask', None)
+        return ImageAsset(xobject.name, xobject, smask, source)
+
+image_assets = ImageAssetCache(PDF_IMAGE_CACHE_BYTES)
+_image_files = {}
+
+def load_image_asset(path, display_width):
+    '''ImageAsset for a file on disk; the file is only read again when its mtime changes.'''
+    path = Path(path)
+    mtime = path.stat().st_mtime_ns
+    cached = _image_files.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = _image_files[path] = (mtime, path.read_bytes())
+    return image_assets.get(cached[1], display_width)
+
+def decode_logo(value: str):
+    '''Bytes of a base64 logo, accepting a plain string or a data: URL.'''
+    if value.startswith("data:"):
+        value = value.partition(",")[2]
+    return base64.b64decode(value, validate=True)
+
+def embed_image_asset(canv, asset):
+    '''
+    Registers the XObjects of `asset` in the canvas document once, as Canvas.drawImage does, with a
+    copy of the encoded XObject. This needs Canvas._setXObjects and Canvas._doc: returns False
+    when this ReportLab does not have them, so the caller can fall back to drawImage.
+    '''
+    set_xobjects = getattr(canv, "_setXObjects", None)
+    doc = getattr(canv, "_doc", None)
+    if set_xobjects is None or doc is None:
+        return False
+    reg_name = doc.getXObjectName(asset.name)
+    if doc.idToObject.get(reg_name) is None:
+        xobject = copy.copy(asset.xobject)
+        set_xobjects(xobject)
+        doc.Reference(xobject, reg_name)
+        doc.addForm(asset.name, xobject)
+        if asset.smask is not None:
+            smask = copy.copy(asset.smask)
+            set_xobjects(smask)
+            xobject.smask = doc.Reference(smask, doc.getXObjectName(smask.name))
+    return True
+
+class AssetImage(Flowable):
+    '''
+    Draws an ImageAsset. The encoded XObject is copied into each document as-is, so the image is
+    neither decoded nor recompressed per report (canvas.drawImage would do both).
+    '''
+    def __init__(self, asset, width, hAlign='CENTER'):
+        Flowable.__init__(self)
+        self.asset = asset
+        self.width = width
+        self.height = width * asset.aspect
+        self.hAlign = hAlign
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def draw(self):
+        canv = self.canv
+        if not embed_image_asset(canv, self.asset):
+            canv.drawImage(ImageReader(io.BytesIO(self.asset.source)), 0, 0, self.width, self.height, mask='auto')
+            return
+        # El XObject registrado se dibuja como cualquier form: escalado al tamaño de la imagen
+        canv.saveState()
+        canv.scale(self.width, self.height)
+        canv.doForm(self.asset.name)
+        canv.restoreState()
+
+# --- Portada y contenido estático ---
+def create_cover_flowables(styles):
+    '''Logo page and report title page (pages 1 and 2), without page breaks between templates.'''
+    flowables = [Spacer(1, 6*cm)]
+    try:
+        target_width = 8*cm
+        flowables.append(AssetImage(load_image_asset(LOGO_PATH, target_width), target_width))
+    except Exception as e:
+        flowables.append(Paragraph(f"Error al cargar logo: {e}", styles['p']))
+    flowables.append(PageBreak())
+    flowables.append(Spacer(1, 6*cm))
+    flowables.append(Paragraph(REPORT_TITLE, styles['title']))
+    return flowables
 
-    doc = BaseDocTemplate(
+def create_content_flowables(styles):
+    '''Introduction and dimensions framework pages from the markdown content files.'''
+    flowables = parse_markdown_to_flowables(INTRO_PATH, styles)
+    flowables.append(Spacer(1, 1*cm))
+    flowables.extend(parse_markdown_to_flowables(MARCO_PATH, styles))
+    return flowables
+
+# --- Instrumentación ---
+@contextmanager
+def report_span(spans, name, story):
+    '''Times a story builder and counts the flowables it appended; repeated calls accumulate.'''
+    started = time.perf_counter()
+    before = len(story)
+    try:
+        yield
+    finally:
+        span = spans.setdefault(name, {"seconds": 0.0, "flowables": 0, "calls": 0})
+        span["seconds"] += time.perf_counter() - started
+        span["flowables"] += len(story) - before
+        span["calls"] += 1
+
+PDF_BYTE_KINDS = ("fonts", "images", "content", "forms", "other")
+
+def pdf_byte_breakdown(pdf: bytes):
+    '''
+    Bytes of a rendered PDF by kind: fonts (font dicts, widths and embedded programs), images,
+    content (page streams), forms (form XObjects) and other (catalog, page tree, info, xref).
+    Also lists the embedded fonts that are not subsets ("ABCDEF+Name"), which embed every glyph.
+    '''
+    from pypdf import PdfReader
+    from pypdf.generic import IndirectObject
+
+    reader = PdfReader(io.BytesIO(pdf))
+    kinds = {}
+    fonts = []
+
+    def claim(obj, kind):
+        # Todo lo alcanzable desde obj que no se haya asignado antes (descriptores, subsets, SMasks)
+        stack = [obj]
+        while stack:
+            obj = stack.pop()
+            if isinstance(obj, IndirectObject):
+                if obj.idnum in kinds:
+                    continue
+                kinds[obj.idnum] = kind
+                obj = obj.get_object()
+            if isinstance(obj, dict):
+                stack.extend(dict.values(obj))
+            elif isinstance(obj, list):
+                stack.extend(list.__iter__(obj))
+
+    forms = set()
+
+    def claim_resources(resources):
+        resources = resources.get_object() if resources is not None else None
+        if not resources:
+            return
+        font_dict = dict.get(resources, "/Font")
+        for ref in dict.values(font_dict.get_object()) if font_dict is not None else ():
+            if isinstance(ref, IndirectObject) and ref.idnum not in kinds:
+                fonts.append(ref.get_object())
+            claim(ref, "fonts")
+        xobjects = dict.get(resources, "/XObject")
+        for ref in dict.values(xobjects.get_object()) if xobjects is not None else ():
+            xobject = ref.get_object()
+            if xobject.get("/Subtype") != "/Form":
+                claim(ref, "images")
+            elif id(xobject) not in forms:
+                forms.add(id(xobject))
+                claim_resources(dict.get(xobject, "/Resources"))
+                claim(ref, "forms")
+
+    for page in reader.pages:
+        claim_resources(dict.get(page, "/Resources"))
+        claim(dict.get(page, "/Contents"), "content")
+
+    # Tamaño de cada objeto: distancia hasta el siguiente offset de la tabla xref (o hasta la tabla)
+    offsets = sorted((offset, idnum) for idnum, offset in reader.xref.get(0, {}).items())
+    startxref = re.search(rb"startxref\s+(\d+)", pdf[-1024:])
+    ends = [offset for offset, _ in offsets[1:]] + [int(startxref.group(1)) if startxref else len(pdf)]
+    breakdown = dict.fromkeys(PDF_BYTE_KINDS, 0)
+    for (offset, idnum), end in zip(offsets, ends):
+        breakdown[kinds.get(idnum, "other")] += end - offset
+    breakdown["other"] += len(pdf) - sum(breakdown.values())
+
+    def embedded(font):
+        descriptor = font.get("/FontDescriptor")
+        if descriptor is None and "/DescendantFonts" in font:
+            descriptor = font["/DescendantFonts"][0].get_object().get("/FontDescriptor")
+        return descriptor is not None and any(k in descriptor for k in ("/FontFile", "/FontFile2", "/FontFile3"))
+
+    full_fonts = {str(font.get("/BaseFont")) for font in fonts
+                  if embedded(font) and not re.match(r"/?[A-Z]{6}\+", str(font.get("/BaseFont", "")))}
+    return dict(breakdown, total=len(pdf), fonts_not_subset=sorted(full_fonts))
+
+def pdf_breakdown_header(breakdown):
+    '''Formats a pdf_byte_breakdown as an X-PDF-Bytes header value.'''
+    return ", ".join(f"{kind}={breakdown[kind]}" for kind in ("total",) + PDF_BYTE_KINDS)
+
+class ReportMetrics:
+    '''Process-wide render metrics exposed in Prometheus text format by /metrics.'''
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    PAGE_BUCKETS = (10, 20, 40, 80, 160, 320)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sections = {}
+        self._flowables = {}
+        self._pages = [0] * len(self.PAGE_BUCKETS)
+        self._pages_sum = 0
+        self._bytes_sum = 0
+        self._renders = 0
+        self._cache = {"hit": 0, "miss": 0}
+
+    @staticmethod
+    def _new_histogram(size):
+        return {"buckets": [0] * size, "sum": 0.0, "count": 0}
+
+    def _observe(self, histogram, bounds, value):
+        for i, bound in enumerate(bounds):
+            if value <= bound:
+                histogram["buckets"][i] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+
+    def observe(self, stats, size=None):
+        '''Records the spans, flowable and page counts collected by create_pdf_in_memory.'''
+        with self._lock:
+            self._renders += 1
+            for name, span in stats.get("spans", {}).items():
+                histogram = self._sections.setdefault(name, self._new_histogram(len(self.BUCKETS)))
+                self._observe(histogram, self.BUCKETS, span["seconds"])
+                if "flowables" in span:
+                    self._flowables[name] = self._flowables.get(name, 0) + span["flowables"]
+            pages = stats.get("pages", 0)
+            for i, bound in enumerate(self.PAGE_BUCKETS):
+                if pages <= bound:
+                    self._pages[i] += 1
+            self._pages_sum += pages
+            if size is not None:
+                self._bytes_sum += size
+
+    def cache_result(self, hit):
+        with self._lock:
+            self._cache["hit" if hit else "miss"] += 1
+
+    def render(self):
+        '''Returns the metrics in Prometheus text exposition format.'''
+        def histogram_lines(name, labels, bounds, buckets, total, count):
+            prefix = f"{labels}," if labels else ""
+            for bound, value in zip(bounds, buckets):
+                yield f'{name}_bucket{{{prefix}le="{bound}"}} {value}'
+            yield f'{name}_bucket{{{prefix}le="+Inf"}} {count}'
+            suffix = f"{{{labels}}}" if labels else ""
+            yield f"{name}_sum{suffix} {total}"
+            yield f"{name}_count{suffix} {count}"
+
+        with self._lock:
+            lines = [
+                "# HELP pdf_renders_total Reportes PDF renderizados.",
+                "# TYPE pdf_renders_total counter",
+                f"pdf_renders_total {self._renders}",
+                "# HELP pdf_render_section_seconds Duración de cada sección del render.",
+                "# TYPE pdf_render_section_seconds histogram",
+            ]
+            for name, h in sorted(self._sections.items()):
+                lines.extend(histogram_lines("pdf_render_section_seconds", f'section="{name}"',
+                                             self.BUCKETS, h["buckets"], h["sum"], h["count"]))
+            lines += [
+                "# HELP pdf_render_flowables_total Flowables generados por sección.",
+                "# TYPE pdf_render_flowables_total counter",
+            ]
+            lines.extend(f'pdf_render_flowables_total{{section="{name}"}} {count}'
+                         for name, count in sorted(self._flowables.items()))
+            lines += [
+                "# HELP pdf_render_pages Páginas por reporte.",
+                "# TYPE pdf_render_pages histogram",
+            ]
+            lines.extend(histogram_lines("pdf_render_pages", "", self.PAGE_BUCKETS,
+                                         self._pages, self._pages_sum, self._renders))
+            lines += [
+                "# HELP pdf_render_bytes_total Bytes de PDF generados.",
+                "# TYPE pdf_render_bytes_total counter",
+                f"pdf_render_bytes_total {self._bytes_sum}",
+                "# HELP pdf_cache_requests_total Consultas a la caché de /generar-pdf.",
+                "# TYPE pdf_cache_requests_total counter",
+            ]
+            lines.extend(f'pdf_cache_requests_total{{result="{result}"}} {count}'
+                         for result, count in self._cache.items())
+        return "\n".join(lines) + "\n"
+
+report_metrics = ReportMetrics()
+
+def server_timing_header(stats):
+    '''Formats the render spans as a Server-Timing header value (milliseconds).'''
+    entries = [f"{name};dur={span['seconds'] * 1000:.1f}" for name, span in stats.get("spans", {}).items()]
+    if "story" in stats:
+        entries.append(f"total;dur={(stats['story'] + stats['build'] + stats['serialize'] + stats['splice']) * 1000:.1f}")
+    return ", ".join(entries)
+
+def dump_profile(profiler, folio):
+    '''Writes a cProfile dump to PDF_PROFILE_DIR and returns its path.'''
+    directory = Path(PDF_PROFILE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    safe_folio = re.sub(r"[^A-Za-z0-9_.-]", "_", str(folio))
+    path = directory / f"{safe_folio}-{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}.prof"
+    profiler.dump_stats(path)
+    return path
+
+# --- PDF Generation ---
+class TimedCanvas(Canvas):
+    '''
+    Canvas that records how long the final PDF serialization (save) takes. `before_save(canvas)`
+    runs first, outside the timing, for drawing that must wait until the last page is laid out.
+    '''
+    save_seconds = 0.0
+
+    def __init__(self, *args, before_save=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.before_save = before_save
+
+    def save(self):
+        if self.before_save is not None:
+            self.before_save(self)
+        started = time.perf_counter()
+        super().save()
+        self.save_seconds = time.perf_counter() - started
+
+def _report_doc(buffer, data: ReporteData, compact: bool):
+    '''BaseDocTemplate with the report geometry and metadata.'''
+    return BaseDocTemplate(
         buffer, 
         pagesize=A4, 
-        leftMargin=2*cm, 
-        rightMargin=2*cm, 
-        topMargin=2.2*cm, 
-        bottomMargin=2*cm,
+        **PAGE_MARGINS,
+        pageCompression=1 if compact else None,
         title=f"Reporte DIGEI - {data.organizacion.get('nombre', 'Organización')}",
         author="DIGEI - Distintivo Genera Igualdad",
         subject="Autodiagnóstico de Igualdad de Género",
         creator="Sistema DIGEI",
         keywords="género, igualdad, diagnóstico, DIGEI"
     )
+
+def _add_report_page_templates(doc, data: ReporteData, compact: bool, front_matter=True):
+    '''
+    Adds the page templates. Without `front_matter` (a part of a sectioned render) only BODY is
+    added and its footer leaves out the page number, which fix_up_pages draws after the merge.
+    '''
+    W, H = A4
     frame = Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height, id='F1')
 
-    def header(canvas, doc):
-        canvas.saveState()
+    def draw_chrome(canvas, name, draw):
+        # En modo compacto la parte fija de cada página se emite una vez y se referencia con Do
+        if compact:
+            draw_form_once(canvas, name, draw)
+        else:
+            draw(canvas)
+
+    def header_chrome(canvas):
         canvas.setFont("Helvetica", 9)
         canvas.setFillColor(PRIMARY_COLOR)
         canvas.drawString(2*cm, H-1.5*cm, "DIGEI · Distintivo que Genera igualdad y Convivencia Pacífica")
@@ -1211,10 +2379,8 @@ def create_pdf_in_memory(data: ReporteData):
         canvas.setStrokeColor(MEDIUM_GRAY)
         canvas.setLineWidth(0.5)
         canvas.line(2*cm, H-1.7*cm, W-2*cm, H-1.7*cm)
-        canvas.restoreState()
 
-    def footer(canvas, doc):
-        canvas.saveState()
+    def footer_chrome(canvas):
         canvas.setFont("Helvetica", 8)
         canvas.setFillColor(colors.grey)
         
@@ -1228,55 +2394,65 @@ def create_pdf_in_memory(data: ReporteData):
         org_nombre = data.organizacion.get('nombre', '')[:40]  # Limitar longitud
         canvas.drawCentredString(W/2, 1.1*cm, org_nombre)
         
-        # Derecha: Número de página
-        canvas.setFont("Helvetica-Bold", 9)
-        canvas.drawRightString(W-2*cm, 1.1*cm, f"Página {doc.page}")
-        
         # Línea separadora
         canvas.setStrokeColor(PRIMARY_COLOR)
         canvas.setLineWidth(1)
         canvas.line(2*cm, 1.5*cm, W-2*cm, 1.5*cm)
+
+    def header(canvas, doc):
+        canvas.saveState()
+        draw_chrome(canvas, "encabezado", header_chrome)
         canvas.restoreState()
 
-    doc.addPageTemplates([
-        PageTemplate(id='PORTADA1', frames=[frame]),
-        PageTemplate(id='TITULO', frames=[frame]),
-        PageTemplate(id='PORTADA2', frames=[frame]),
-        PageTemplate(id='BODY', frames=[frame], onPage=header, onPageEnd=footer)
-    ])
+    def footer(canvas, doc):
+        canvas.saveState()
+        draw_chrome(canvas, "pie", footer_chrome)
+        
+        # Derecha: Número de página
+        if front_matter:
+            canvas.setFont(PAGE_NUMBER_FONT, PAGE_NUMBER_SIZE)
+            canvas.setFillColor(PAGE_NUMBER_COLOR)
+            canvas.drawRightString(*PAGE_NUMBER_ANCHOR, page_number_text(doc.page))
+        canvas.restoreState()
 
+    templates = [PageTemplate(id='BODY', frames=[frame], onPage=header, onPageEnd=footer)]
+    if front_matter:
+        templates[:0] = [
+            PageTemplate(id='PORTADA1', frames=[frame]),
+            PageTemplate(id='TITULO', frames=[frame]),
+            PageTemplate(id='PORTADA2', frames=[frame]),
+        ]
+    doc.addPageTemplates(templates)
+
+def _front_matter_story(doc, data: ReporteData, view, styles, spans, refs):
+    '''
+    Cover, institution page, TOC, introduction/framework and semáforos. They always render in
+    the same part: the semáforos follow the framework without a page break.
+    '''
     story = []
 
-    # Page 1: Logo
-    story.append(Spacer(1, 6*cm))
-    try:
-        target_width = 8*cm
-        img_reader = ImageReader(LOGO_PATH)
-        img_width, img_height = img_reader.getSize()
-        aspect_ratio = img_height / float(img_width)
-        new_height = target_width * aspect_ratio
-        story.append(Image(LOGO_PATH, width=target_width, height=new_height, hAlign='CENTER'))
-    except Exception as e:
-        story.append(Paragraph(f"Error al cargar logo: {e}", md_styles['p']))
+    # Pages 1-2: Logo and Report Title
+    story.extend(create_cover_flowables(styles))
     story.append(PageBreak())
     doc.handle_nextPageTemplate('TITULO')
-
-    # Page 2: Report Title
-    story.append(Spacer(1, 6*cm))
-    title_text = "Reporte de Resultados del Autodiagnóstico para el proceso de Transversalización e Institucionalización de la Perspectiva de Género y Convivencia Pacífica"
-    story.append(Paragraph(title_text, TITLE_STYLE))
-    story.append(PageBreak())
     doc.handle_nextPageTemplate('PORTADA2')
 
     # Page 3: Institution Data
+    tenant_logo = data.organizacion.get('logo')
+    if tenant_logo:
+        try:
+            logo_width = 4*cm
+            story.append(AssetImage(image_assets.get(decode_logo(tenant_logo), logo_width), logo_width, hAlign='LEFT'))
+        except Exception as e:
+            logger.warning("Logo de la organización inválido, se omite: %s", e)
     story.append(Spacer(1, 2*cm))
-    story.append(Paragraph(data.organizacion.get('nombre', 'Sin nombre'), TITLE_STYLE))
+    story.append(Paragraph(data.organizacion.get('nombre', 'Sin nombre'), styles['title']))
     story.append(Spacer(1, 1*cm))
     inst_data = [
-        [Paragraph('<b>Responsable:</b>', base_styles['BodyText']), Paragraph(data.organizacion.get('responsable', 'Sin responsable'), base_styles['BodyText'])],
-        [Paragraph('<b>Cargo:</b>', base_styles['BodyText']), Paragraph(data.organizacion.get('cargo_responsable', ''), base_styles['BodyText'])],
-        [Paragraph('<b>Fecha de aplicación:</b>', base_styles['BodyText']), Paragraph(data.organizacion.get('fecha_aplicacion', ''), base_styles['BodyText'])],
-        [Paragraph('<b>Folio:</b>', base_styles['BodyText']), Paragraph(data.organizacion.get('folio', ''), base_styles['BodyText'])],
+        [Paragraph('<b>Responsable:</b>', styles['body']), Paragraph(data.organizacion.get('responsable', 'Sin responsable'), styles['body'])],
+        [Paragraph('<b>Cargo:</b>', styles['body']), Paragraph(data.organizacion.get('cargo_responsable', ''), styles['body'])],
+        [Paragraph('<b>Fecha de aplicación:</b>', styles['body']), Paragraph(data.organizacion.get('fecha_aplicacion', ''), styles['body'])],
+        [Paragraph('<b>Folio:</b>', styles['body']), Paragraph(data.organizacion.get('folio', ''), styles['body'])],
     ]
     inst_table = Table(inst_data, colWidths=[5*cm, 10*cm], hAlign='LEFT')
     inst_table.setStyle(TableStyle([('VALIGN', (0, 0), (-1, -1), 'TOP'), ('LEFTPADDING', (0, 0), (-1, -1), 0), ('RIGHTPADDING', (0, 0), (-1, -1), 0)]))
@@ -1285,189 +2461,1426 @@ def create_pdf_in_memory(data: ReporteData):
     doc.handle_nextPageTemplate('BODY')
 
     # Page 4: Índice de Contenidos
-    story.extend(create_table_of_contents(data, md_styles))
+    with report_span(spans, "toc", story):
+        story.extend(create_table_of_contents(view, styles, refs))
 
     # Page 5+: Report Content
-    story.extend(parse_markdown_to_flowables(INTRO_PATH, md_styles))
-    story.append(Spacer(1, 1*cm))
-    story.extend(parse_markdown_to_flowables(MARCO_PATH, md_styles))
+    story.extend(mark_section(create_content_flowables(styles), "contenido"))
     story.append(Spacer(1, 1*cm))
 
     # --- Add Semaforo cards with data from request ---
-    # Calcular porcentajes de indicadores atendidos
-    total_indicadores = 0
-    indicadores_atendidos = 0
-    
-    if data.dimensiones:
-        for dim in data.dimensiones:
-            dim_dict = dim if isinstance(dim, dict) else dim.__dict__
-            for sub in dim_dict.get('subdimensiones', []):
-                sub_dict = sub if isinstance(sub, dict) else sub.__dict__
-                total_indicadores += sub_dict.get('total_indicadores', 0)
-                indicadores_atendidos += sub_dict.get('indicadores_atendidos', 0)
-    
-    # Calcular porcentajes
-    pct_vs_100 = (indicadores_atendidos / total_indicadores * 100) if total_indicadores > 0 else 0
-    pct_vs_80 = (indicadores_atendidos / (total_indicadores * 0.8) * 100) if total_indicadores > 0 else 0
-    
-    print(f"  📊 Semáforos: {indicadores_atendidos}/{total_indicadores} = {pct_vs_100:.1f}% vs 100%, {pct_vs_80:.1f}% vs 80%")
-    
-    story.extend(create_semaforo_flowables(doc, md_styles, pct_vs_100, pct_vs_80))
-
-    # --- Add Chart from request data ---
-    if data.grafica_dimensiones:
-        # Convertir los datos al formato esperado por la función
-        chart_data = []
-        for dim in data.grafica_dimensiones:
-            if isinstance(dim, dict):
-                porcentaje = dim.get('porcentaje', 0)
-                print(f"  📊 Dimensión (dict): {dim.get('dimensionNombre', 'N/A')} = {porcentaje}%")
-                chart_data.append({'pct_vs_100': porcentaje})
-            else:
-                # Si es un objeto Pydantic, acceder como atributo
-                porcentaje = getattr(dim, 'porcentaje', 0)
-                print(f"  📊 Dimensión (obj): {getattr(dim, 'dimensionNombre', 'N/A')} = {porcentaje}%")
-                chart_data.append({'pct_vs_100': porcentaje})
-        
-        print(f"  📊 Chart data final: {chart_data}")
-        
-        if chart_data:  # Solo agregar si hay datos
-            story.extend(create_dimensiones_chart(chart_data, md_styles))
-            
-            # Agregar gráfica de radar después de la gráfica de barras
-            print("  📊 Generando gráfica de radar")
-            story.extend(create_radar_chart(data.grafica_dimensiones, md_styles))
-
-    # --- Add Table from request data ---
+    logger.debug("Semáforos: %s/%s = %.1f%% vs 100%%, %.1f%% vs 80%%",
+                 view.indicadores_atendidos, view.total_indicadores, view.pct_vs_100, view.pct_vs_80)
+    story.extend(mark_section(create_semaforo_flowables(doc, styles, view.pct_vs_100, view.pct_vs_80), "semaforos"))
+    return story
+
+# Costo de maquetación estimado en filas de tabla (~0.3 ms por fila): fijo por sección, de las dos
+# gráficas y de la portada al semáforo
+SECTION_BASE_ROWS = 15
+CHART_ROWS = 60
+FRONT_MATTER_ROWS = 60
+
+def report_section_plan(data: ReporteData, view):
+    '''
+    Body sections after the semáforos, in document order, as (key, weight). Each one starts on a
+    new page, so any contiguous run of them can be laid out as a separate document. The weight
+    estimates the layout cost in table rows.
+    '''
+    plan = []
+    if view.chart_data:
+        plan.append(("graficas", CHART_ROWS))
     if data.dimensiones:
-        # Convertir datos al formato esperado por create_subdimensiones_table
-        table_data_converted = {
-            "descripcion": "La siguiente tabla muestra el nivel de cumplimiento por dimensión y subdimensión",
-            "dimensiones": []
-        }
-        
-        for dim in data.dimensiones:
-            dim_dict = dim if isinstance(dim, dict) else dim.__dict__
-            
-            dim_converted = {
-                "id": dim_dict.get('orden', dim_dict.get('id')),
-                "nombre": dim_dict.get('nombre', ''),
-                "subdimensiones": []
-            }
-            
-            for sub in dim_dict.get('subdimensiones', []):
-                sub_dict = sub if isinstance(sub, dict) else sub.__dict__
-                
-                # Calcular porcentaje vs 80
-                meta_80 = sub_dict.get('meta_80', 1)
-                indicadores_atendidos = sub_dict.get('indicadores_atendidos', 0)
-                porcentaje_vs_80 = (indicadores_atendidos / meta_80 * 100) if meta_80 > 0 else 0
-                
-                # Mapear semáforo
-                semaforo_label = sub_dict.get('semaforo', 'N/A').lower()
-                if semaforo_label == 'alto':
-                    semaforo = 'alto'
-                elif semaforo_label == 'medio':
-                    semaforo = 'medio'
-                elif semaforo_label == 'bajo':
-                    semaforo = 'bajo'
-                else:
-                    semaforo = 'bajo'  # Default para N/A
-                
-                sub_converted = {
-                    "id": f"{dim_dict.get('orden', dim_dict.get('id'))}.{len(dim_converted['subdimensiones']) + 1}",
-                    "nombre": sub_dict.get('nombre', ''),
-                    "indicadores_total": sub_dict.get('total_indicadores', 0),
-                    "indicadores_atendidos": indicadores_atendidos,
-                    "porcentaje_vs_100": sub_dict.get('porcentaje', 0),
-                    "porcentaje_vs_80": porcentaje_vs_80,
-                    "semaforo": semaforo
-                }
-                dim_converted['subdimensiones'].append(sub_converted)
-            
-            table_data_converted['dimensiones'].append(dim_converted)
-        
-        print(f"  📋 Generando tabla con {len(table_data_converted['dimensiones'])} dimensiones")
-        story.extend(create_subdimensiones_table(table_data_converted, md_styles))
+        rows = sum(len(dimension["subdimensiones"]) + 1 for dimension in view.tabla["dimensiones"])
+        plan.append(("subdimensiones", SECTION_BASE_ROWS + rows))
+    for i, detalle in enumerate(view.detalles, start=1):
+        rows = sum(len(punto["preguntas"]) + 1 for punto in detalle["puntos_no_atendidos"])
+        plan.append((f"detalle-{i}", SECTION_BASE_ROWS + rows))
+    plan.append(("especial", SECTION_BASE_ROWS + len(data.composicion_sexo or ()) + len(data.salarios or ())))
+    return plan
+
+def append_report_section(story, key, data: ReporteData, view, styles, doc_width, spans):
+    '''Appends the flowables of one section of report_section_plan to `story`.'''
+    if key == "graficas":
+        logger.debug("Chart data: %s", view.chart_data)
+        story.extend(mark_section(create_dimensiones_chart(view.chart_data, styles), "barras"))
+        # Agregar gráfica de radar después de la gráfica de barras
+        story.extend(mark_section(create_radar_chart(view.radar_values, styles), "radar"))
+    elif key == "subdimensiones":
+        with report_span(spans, "subdimensiones", story):
+            story.extend(mark_section(create_subdimensiones_table(view.tabla, styles), key))
+    elif key == "especial":
+        # Composición por sexo, salarios, quejas y atenciones
+        with report_span(spans, "especial", story):
+            story.extend(mark_section(create_special_section_with_data(data, styles, doc_width), key))
+    else:
+        detalle = view.detalles[int(key.removeprefix("detalle-")) - 1]
+        with report_span(spans, "detalles", story):
+            story.extend(mark_section(create_dimension_detail_flowables(detalle, styles, doc_width), key))
 
-    # --- Add Dimension Details from request data ---
-    if data.dimensiones:
-        print(f"  📄 Generando detalles de {len(data.dimensiones)} dimensiones")
-        for dim in data.dimensiones:
-            dim_dict = dim if isinstance(dim, dict) else dim.__dict__
-            
-            # Convertir al formato esperado por create_dimension_detail_flowables
-            dim_orden = dim_dict.get('orden', dim_dict.get('id'))
-            dim_nombre = dim_dict.get('nombre', '')
-            
-            # Calcular porcentaje atendido de la dimensión
-            total_indicadores_dim = sum(sub.get('total_indicadores', 0) if isinstance(sub, dict) else sub.__dict__.get('total_indicadores', 0) for sub in dim_dict.get('subdimensiones', []))
-            indicadores_atendidos_dim = sum(sub.get('indicadores_atendidos', 0) if isinstance(sub, dict) else sub.__dict__.get('indicadores_atendidos', 0) for sub in dim_dict.get('subdimensiones', []))
-            porcentaje_atendido = (indicadores_atendidos_dim / total_indicadores_dim * 100) if total_indicadores_dim > 0 else 0
-            
-            dim_detail = {
-                "dimension_nombre": f"{dim_orden}. {dim_nombre}",
-                "porcentaje_atendido": porcentaje_atendido,
-                "puntos_no_atendidos": []
-            }
-            
-            # Agrupar preguntas por subdimensión
-            subdimensiones_dict = {}
-            for sub in dim_dict.get('subdimensiones', []):
-                sub_dict = sub if isinstance(sub, dict) else sub.__dict__
-                sub_nombre = sub_dict.get('nombre', '')
-                
-                # Extraer indicadores no atendidos
-                for ind in sub_dict.get('indicadores_no_atendidos', []):
-                    ind_dict = ind if isinstance(ind, dict) else ind.__dict__
-                    
-                    # Agrupar por subdimensión
-                    if sub_nombre not in subdimensiones_dict:
-                        subdimensiones_dict[sub_nombre] = []
-                    subdimensiones_dict[sub_nombre].append(ind_dict.get('texto', ''))
-            
-            # Convertir el diccionario a la estructura esperada
-            for sub_nombre, preguntas in subdimensiones_dict.items():
-                dim_detail['puntos_no_atendidos'].append({
-                    "subdimension": sub_nombre,
-                    "preguntas": preguntas
-                })
-            
-            story.extend(create_dimension_detail_flowables(dim_detail, md_styles, doc.width))
+def partition_sections(plan, parts):
+    '''
+    Splits the plan into at most `parts` contiguous runs of similar weight. The first run is
+    rendered after the front matter (FRONT_MATTER_ROWS). Runs keep document order so that
+    consecutive sections, which share most of their fonts, land in the same part.
+    '''
+    target = (FRONT_MATTER_ROWS + sum(weight for _, weight in plan)) / parts
+    runs = [[] for _ in range(parts)]
+    done = FRONT_MATTER_ROWS
+    for key, weight in plan:
+        runs[min(parts - 1, int((done + weight / 2) / target))].append(key)
+        done += weight
+    return [runs[0]] + [run for run in runs[1:] if run]
+
+def render_report_part(data: ReporteData, sections=None, front_matter=True, compact=True, sectioned=False,
+                       output=None, view=None):
+    '''
+    Lays out one part of the report: the front matter (if `front_matter`) followed by `sections`
+    (keys of report_section_plan; None renders all of them). Also the entry point of the section
+    pool workers. Returns a dict with the PDF buffer, its page count, the local page of every
+    marked section, the TOC lines (see PageRefs) and the stage stats.
+    With `sectioned` the TOC numbers are left for fix_up_pages; otherwise they are drawn as forms
+    defined when each section is reached.
+    '''
+    started = time.perf_counter()
+    spans = {}
+    view = view or ReportView(data)
+    if sections is None:
+        sections = [key for key, _ in report_section_plan(data, view)]
+    buffer = output if output is not None else io.BytesIO()
+    md_styles = get_report_styles()
+
+    doc = _report_doc(buffer, data, compact)
+    _add_report_page_templates(doc, data, compact, front_matter)
+    refs = PageRefs(forward=not sectioned)
+    refs.attach(doc)
 
-    # --- Add Special Section with real data ---
-    # Preparar datos de composición por sexo, salarios, quejas y atenciones
-    print("  📊 Generando sección especial (composición, salarios, quejas)")
-    story.extend(create_special_section_with_data(data, md_styles, doc.width))
+    story = []
+    if front_matter:
+        story = _front_matter_story(doc, data, view, md_styles, spans, refs)
+    for key in sections:
+        append_report_section(story, key, data, view, md_styles, doc.width, spans)
 
-    # --- Secciones de encuestas y autodiagnóstico removidas ---
+    story_done = time.perf_counter()
+    flowable_count = len(story)  # doc.build consume la lista
+    # Los números del índice de secciones que no aparecieron se definen justo antes de guardar
+    doc.build(story, canvasmaker=partial(TimedCanvas, before_save=refs.close))
+    build_done = time.perf_counter()
 
-    doc.build(story)
-    
     buffer.seek(0)
+    build_seconds = build_done - story_done - doc.canv.save_seconds
+    spans["build"] = {"seconds": build_seconds, "flowables": flowable_count, "calls": 1}
+    spans["serialize"] = {"seconds": doc.canv.save_seconds, "calls": 1}
+    return {
+        "pdf": buffer,
+        "pages": doc.page,
+        "marks": refs.marks,
+        "lines": refs.lines,
+        "stats": {
+            "story": story_done - started,
+            "build": build_seconds,
+            "serialize": doc.canv.save_seconds,
+            "pages": doc.page,
+            "flowables": flowable_count,
+            "spans": spans,
+        },
+    }
+
+def _sum_spans(parts):
+    spans = {}
+    for part in parts:
+        for name, span in part["stats"]["spans"].items():
+            total = spans.setdefault(name, dict.fromkeys(span, 0))
+            for field, value in span.items():
+                total[field] = total.get(field, 0) + value
+    return spans
+
+def create_pdf_in_memory(data: ReporteData, output=None, stats: Optional[dict] = None,
+                         compact: Optional[bool] = None, sectioned: Optional[bool] = None, scores=None):
+    '''
+    Generates a complex PDF document in memory using Platypus and returns the buffer.
+    `output` is an optional writable file object (e.g. a SpooledTemporaryFile) used instead of a
+    new BytesIO; it is returned rewound to the start.
+    If `stats` is a dict it receives the seconds spent in each stage (story, build, serialize,
+    splice), the page and flowable counts, and per-section spans (see report_span).
+    `compact` (default: PDF_COMPACT) forces page compression, draws the header and footer as form
+    XObjects shared by every page and deduplicates the objects repeated across sectioned parts.
+    With `sectioned` (default: PDF_SECTION_WORKERS > 0) a large report is split into parts laid out
+    at the same time in the section pool and merged page by page; the stages are those of the part
+    rendered in this process, and splice is the wait for the others plus the merge (0 otherwise).
+    `scores` are this report's ReportScores when they were computed with a batch (see ReportView).
+    '''
+    started = time.perf_counter()
+    if compact is None:
+        compact = PDF_COMPACT
+    if sectioned is None:
+        sectioned = SECTION_WORKERS > 0
+
+    # Una sola pasada sobre las dimensiones alimenta todas las secciones
+    view = ReportView(data, scores)
+    runs = [None]
+    if sectioned:
+        plan = report_section_plan(data, view)
+        rows = FRONT_MATTER_ROWS + sum(weight for _, weight in plan)
+        parts = min(SECTION_WORKERS + 1, len(plan) + 1, rows // SECTION_MIN_ROWS)
+        if parts > 1:
+            runs = partition_sections(plan, parts)
+
+    parts = None
+    head_started = time.perf_counter()
+    if len(runs) > 1:
+        try:
+            pool = get_section_pool()
+            futures = [pool.submit(render_report_part, data, run, False, compact, True) for run in runs[1:]]
+            head = render_report_part(data, runs[0], True, compact, True, view=view)
+            parts = [head] + [future.result() for future in futures]
+        except BrokenProcessPool as e:
+            shutdown_section_pool()
+            logger.warning("Pool de secciones caído, se renderiza el reporte completo en este proceso: %s", e)
+            head_started = time.perf_counter()
+    if parts is None:
+        head = render_report_part(data, None, True, compact, output=output, view=view)
+        parts = [head]
+        buffer = head["pdf"]
+    else:
+        buffer = merge_report_parts(parts, output, compact)
+
+    if stats is not None:
+        head_stats = head["stats"]
+        story = head_started - started + head_stats["story"]
+        # Las secciones suman el trabajo de todas las partes; build y serialize quedan en tiempo de
+        # pared, como las etapas
+        spans = _sum_spans(parts)
+        spans["build"]["seconds"] = head_stats["build"]
+        spans["serialize"]["seconds"] = head_stats["serialize"]
+        stats.update(
+            story=story,
+            build=head_stats["build"],
+            serialize=head_stats["serialize"],
+            splice=time.perf_counter() - started - story - head_stats["build"] - head_stats["serialize"],
+            pages=sum(part["pages"] for part in parts),
+            flowables=sum(part["stats"]["flowables"] for part in parts),
+            parts=len(parts),
+            spans=spans,
+        )
     return buffer
 
+# --- Render por secciones ---
+# Las partes de un reporte se maquetan en un pool propio: el de jobs ya tiene ocupados sus procesos
+# con reportes completos y los jobs renderizan sin secciones para no anidar pools.
+# Los pools de procesos (este y el de jobs) arrancan sus procesos con forkserver, o spawn donde no
+# existe: el servicio ya tiene corriendo el hilo del QueueListener y los del servidor, y un fork
+# copiaría sus locks tal como estén. Cada proceso importa el módulo una vez y queda vivo en el pool.
+_pool_context = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+_section_pool = None
+
+def get_section_pool():
+    global _section_pool
+    if _section_pool is None:
+        _section_pool = ProcessPoolExecutor(max_workers=SECTION_WORKERS, mp_context=_pool_context)
+    return _section_pool
+
+def shutdown_section_pool():
+    global _section_pool
+    if _section_pool is not None:
+        _section_pool.shutdown(wait=False, cancel_futures=True)
+        _section_pool = None
+
+def _pdf_string(text):
+    '''PDF literal string in WinAnsi, the encoding of ReportLab's standard fonts.'''
+    chars = []
+    for byte in text.encode("cp1252"):
+        char = chr(byte)
+        chars.append(char if 32 <= byte < 127 and char not in "()\\" else f"\\{byte:03o}")
+    return "(" + "".join(chars) + ")"
+
+def fix_up_pages(writer, drawings, compact=True):
+    '''
+    Draws text on already merged pages without parsing their content: `drawings` maps a page
+    index to a list of (font, size, color, x, y, text), each drawn like canvas.drawRightString.
+    The original content is wrapped in q/Q and one stream is appended per page.
+    '''
+    from pypdf.generic import ArrayObject, DictionaryObject, NameObject, StreamObject
+
+    def add_stream(data):
+        stream = StreamObject()
+        stream.set_data(data.encode("latin-1"))
+        return writer._add_object(stream.flate_encode() if compact else stream)
+
+    resources = {}
+    save_state = add_stream("q\n")
+    for index, items in drawings.items():
+        page = writer.pages[index]
+        page_fonts = page["/Resources"].get_object().setdefault(NameObject("/Font"), DictionaryObject()).get_object()
+        ops = ["Q"]
+        for font, size, color, x, y, text in items:
+            name = resources.setdefault(font, f"/FX{len(resources) + 1}")
+            page_fonts[NameObject(name)] = DictionaryObject({
+                NameObject("/Type"): NameObject("/Font"), NameObject("/Subtype"): NameObject("/Type1"),
+                NameObject("/BaseFont"): NameObject(f"/{font}"), NameObject("/Encoding"): NameObject("/WinAnsiEncoding"),
+            })
+            x -= pdfmetrics.stringWidth(text, font, size)
+            ops.append(f"{fp_str(*color.rgb())} rg BT {name} {fp_str(size)} Tf 1 0 0 1 {fp_str(x, y)} Tm "
+                       f"{_pdf_string(text)} Tj ET")
+        contents = page.raw_get("/Contents")
+        streams = list(contents.get_object()) if isinstance(contents.get_object(), ArrayObject) else [contents]
+        page[NameObject("/Contents")] = ArrayObject([save_state, *streams, add_stream("\n".join(ops) + "\n")])
+
+def merge_report_parts(parts, output=None, compact=True):
+    '''
+    Concatenates the parts of a sectioned render (see render_report_part), then draws the page
+    numbers of every part after the first and the TOC numbers with fix_up_pages. With `compact`
+    the objects repeated across parts (font subsets, header and footer forms) are merged.
+    Writes to `output` (a new BytesIO by default) and returns it rewound.
+    '''
+    from pypdf import PdfReader, PdfWriter
+
+    writer = PdfWriter(clone_from=parts[0]["pdf"])
+    marks = {}
+    drawings = {}
+    offset = 0
+    for i, part in enumerate(parts):
+        if i:
+            writer.append(PdfReader(part["pdf"]), import_outline=False)
+            for page in range(offset, offset + part["pages"]):
+                drawings[page] = [(PAGE_NUMBER_FONT, PAGE_NUMBER_SIZE, PAGE_NUMBER_COLOR, *PAGE_NUMBER_ANCHOR,
+                                   page_number_text(page + 1))]
+        for key, page in part["marks"].items():
+            marks.setdefault(key, offset + page)
+        offset += part["pages"]
+    for key, page, x, y, font_size, color in parts[0]["lines"]:
+        if key in marks:
+            drawings.setdefault(page - 1, []).append((TOC_NUMBER_FONT, font_size, color, x, y, str(marks[key])))
+    fix_up_pages(writer, drawings, compact)
+    if compact:
+        writer.compress_identical_objects()
+    if output is None:
+        output = io.BytesIO()
+    writer.write(output)
+    output.seek(0)
+    return output
+
+# --- Warmup ---
+def warmup_report_data():
+    '''Small report that goes through every section (charts, tables, details, special section).'''
+    dimensiones = [
+        {
+            "orden": i + 1,
+            "nombre": nombre,
+            "subdimensiones": [{
+                "nombre": nombre,
+                "total_indicadores": 5,
+                "indicadores_atendidos": 3,
+                "porcentaje": 60.0,
+                "meta_80": 4.0,
+                "semaforo": "Medio",
+                "indicadores_no_atendidos": [{"texto": "¿Indicador de calentamiento?"}],
+            }],
+        }
+        for i, nombre in enumerate(RADAR_DIMENSION_NAMES)
+    ]
+    return ReporteData(
+        organizacion={"nombre": "Warmup", "responsable": "", "cargo_responsable": "", "fecha_aplicacion": "", "folio": "WARMUP"},
+        metadata={},
+        dimensiones=dimensiones,
+        grafica_dimensiones=[{"dimensionNombre": d["nombre"], "porcentaje": 60.0} for d in dimensiones],
+        composicion_sexo=[{"pregunta_texto": "Cargos directivos", "descripcion": "Total", "cantidad_mujeres": 1, "cantidad_hombres": 1, "diferencia": 0}],
+        salarios=[{"categoria_nombre": "Puestos directivos", "cantidad_hombres": 1000, "cantidad_mujeres": 1000, "diferencia": 0}],
+        quejas={},
+        atenciones={},
+    )
+
+def warmup_render():
+    '''Renders and discards one report to prime chart layers, font subsets and deferred imports.'''
+    create_pdf_in_memory(warmup_report_data()).close()
+
+# --- Caché de PDFs ---
+class ByteCache:
+    '''
+    LRU cache of rendered bytes (PDFs, charts) bounded by total bytes, with an optional on-disk
+    tier bounded by disk_max_bytes (least recently used files, by mtime, go first).
+    '''
+    def __init__(self, max_bytes, directory=None, disk_max_bytes=0):
+        self.max_bytes = max_bytes
+        self.directory = Path(directory) if directory else None
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._disk_size = 0
+        if self.directory:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._disk_size = sum(size for _, size, _ in self._disk_files())
+            self._trim_disk()
+
+    def get(self, key):
+        with self._lock:
+            pdf = self._entries.get(key)
+            if pdf is not None:
+                self._entries.move_to_end(key)
+                return pdf
+        if self.directory:
+            path = self.directory / f"{key}.pdf"
+            try:
+                pdf = path.read_bytes()
+                # El mtime marca el último uso: la evicción del disco sale por aquí
+                os.utime(path)
+            except OSError:
+                return None
+            self._remember(key, pdf)
+            return pdf
+        return None
+
+    def put(self, key, pdf):
+        self._remember(key, pdf)
+        if self.directory:
+            self._write_disk(key, lambda f: f.write(pdf))
+
+    def put_file(self, key, fileobj):
+        '''Stores a PDF too large for the memory tier on the disk tier, copying it in chunks.'''
+        if not self.directory:
+            return
+        try:
+            self._write_disk(key, lambda f: shutil.copyfileobj(fileobj, f, PDF_STREAM_CHUNK))
+        finally:
+            fileobj.seek(0)
+
+    def _write_disk(self, key, write):
+        path = self.directory / f"{key}.pdf"
+        tmp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                write(f)
+            size = tmp_path.stat().st_size
+            if size > self.disk_max_bytes:
+                tmp_path.unlink()
+                return
+            with self._disk_lock:
+                try:
+                    self._disk_size -= path.stat().st_size
+                except OSError:
+                    pass
+                os.replace(tmp_path, path)
+                self._disk_size += size
+        except OSError as e:
+            logger.warning("No se pudo guardar el PDF en la caché de disco: %s", e)
+            tmp_path.unlink(missing_ok=True)
+            return
+        self._trim_disk()
+
+    def _disk_files(self):
+        '''(path, size, mtime) of the cached files; files removed meanwhile are skipped.'''
+        files = []
+        for path in self.directory.glob("*.pdf"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((path, stat.st_size, stat.st_mtime_ns))
+        return files
+
+    def _trim_disk(self):
+        if self._disk_size <= self.disk_max_bytes:
+            return
+        with self._disk_lock:
+            # Se vuelve a medir el directorio: otro proceso puede compartirlo
+            files = sorted(self._disk_files(), key=lambda entry: entry[2])
+            self._disk_size = sum(size for _, size, _ in files)
+            for path, size, _ in files:
+                if self._disk_size <= self.disk_max_bytes:
+                    break
+                try:
+                    path.unlink()
+                except OSError:
+                    continue
+                self._disk_size -= size
+
+    def _remember(self, key, pdf):
+        if len(pdf) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = pdf
+            self._size += len(pdf)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+pdf_cache = ByteCache(PDF_CACHE_MAX_BYTES, PDF_CACHE_DIR or None, PDF_CACHE_DISK_BYTES)
+# SVG y PNG de /charts: la misma LRU por bytes, solo en memoria
+chart_cache = ByteCache(PDF_CHART_CACHE_BYTES)
+
+_content_version = {"key": None, "digest": None}
+
+def report_content_version():
+    '''
+    Digest of the template version, PDF_COMPACT, PDF_IMAGE_DPI, this module, scoring.py, catalog.py
+    and the static content files; recomputed when they change.
+    '''
+    sources = (Path(__file__), SCORING_PATH, CATALOG_MODULE_PATH, LOGO_PATH, INTRO_PATH, MARCO_PATH)
+    key = (PDF_COMPACT, PDF_IMAGE_DPI) + tuple(path.stat().st_mtime_ns if path.exists() else None for path in sources)
+    if _content_version["key"] != key:
+        digest = hashlib.sha256(f"{REPORT_TEMPLATE_VERSION}|compact={PDF_COMPACT:d}|dpi={PDF_IMAGE_DPI}".encode())
+        for path in sources:
+            digest.update(path.read_bytes() if path.exists() else b"")
+        _content_version["digest"] = digest.hexdigest()
+        _content_version["key"] = key
+    return _content_version["digest"]
+
+def report_cache_key(data: ReporteData):
+    '''Content address of a report: canonical JSON of the validated payload plus the content version.'''
+    canonical = json.dumps(data.model_dump(), sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    digest = hashlib.sha256(report_content_version().encode())
+    digest.update(canonical.encode("utf-8"))
+    return digest.hexdigest()
+
+def _etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+# --- Almacenamiento de PDFs ---
+# Con ?delivery=url el PDF se sube a un almacenamiento de objetos y el endpoint responde una URL
+# firmada: las descargas repetidas ya no pasan por este servicio. El nombre del objeto es la llave de
+# report_cache_key (payload normalizado + versión de contenido), así que un reporte que ya subió
+# cualquier instancia no se vuelve a renderizar ni a subir.
+class LocalStorage:
+    '''PDFs in a local directory, downloaded through GET /archivos/{name} with an expiring HMAC signature.'''
+    def __init__(self, directory, secret):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if not secret:
+            logger.warning("PDF_URL_SECRET vacío: las URLs firmadas dejan de valer al reiniciar el servicio")
+            secret = uuid.uuid4().hex
+        self._secret = secret.encode()
+
+    def size(self, name):
+        try:
+            return (self.directory / name).stat().st_size
+        except FileNotFoundError:
+            return None
+
+    def upload(self, name, fileobj):
+        path = self.directory / name
+        tmp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                shutil.copyfileobj(fileobj, f, PDF_STREAM_CHUNK)
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    def signature(self, name, expires, filename):
+        return hmac.new(self._secret, f"{name}|{expires}|{filename}".encode(), hashlib.sha256).hexdigest()
+
+    def signed_url(self, name, filename, expires_in, base_url):
+        expires = int(time.time()) + expires_in
+        query = urlencode({"expires": expires, "filename": filename, "signature": self.signature(name, expires, filename)})
+        return f"{base_url}archivos/{name}?{query}"
+
+class S3Storage:
+    '''
+    PDFs in an S3-compatible bucket. All requests share one client with a connection pool; uploads
+    are streamed from the file object and go multipart above PDF_STORAGE_PART_BYTES, and downloads
+    use presigned GET URLs.
+    '''
+    def __init__(self, bucket, prefix="", endpoint_url=None, region=None, pool_size=10, part_bytes=8 * 1024 * 1024):
+        if not bucket:
+            raise ValueError("PDF_STORAGE=s3 requiere PDF_STORAGE_BUCKET")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.endpoint_url = endpoint_url or None
+        self.region = region or None
+        self.pool_size = pool_size
+        self.part_bytes = part_bytes
+        self._client = None
+        self._transfer = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        # boto3 se importa al primer uso: suma varios cientos de ms al arranque en frío
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import boto3
+                    from boto3.s3.transfer import TransferConfig
+                    from botocore.config import Config
+
+                    config = Config(
+                        max_pool_connections=self.pool_size,
+                        retries={"mode": "standard"},
+                        signature_version="s3v4",
+                        # Cloud Storage (y MinIO antiguos) rechazan los checksums CRC que boto3 agrega por defecto
+                        request_checksum_calculation="when_required",
+                        response_checksum_validation="when_required",
+                        s3={"addressing_style": "path" if self.endpoint_url else "auto"},
+                    )
+                    self._transfer = TransferConfig(multipart_threshold=self.part_bytes,
+                                                    multipart_chunksize=self.part_bytes, max_concurrency=4)
+                    self._client = boto3.client("s3", endpoint_url=self.endpoint_url,
+                                                region_name=self.region, config=config)
+        return self._client
+
+    def size(self, name):
+        from botocore.exceptions import ClientError
+
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self.prefix + name)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return head["ContentLength"]
+
+    def upload(self, name, fileobj):
+        self.client.upload_fileobj(fileobj, self.bucket, self.prefix + name,
+                                   ExtraArgs={"ContentType": "application/pdf"}, Config=self._transfer)
+
+    def signed_url(self, name, filename, expires_in, base_url=None):
+        params = {
+            "Bucket": self.bucket,
+            "Key": self.prefix + name,
+            "ResponseContentType": "application/pdf",
+            "ResponseContentDisposition": f'inline; filename="{filename}"',
+        }
+        return self.client.generate_presigned_url("get_object", Params=params, ExpiresIn=expires_in)
+
+def create_storage():
+    '''Storage backend selected by PDF_STORAGE, or None when URL delivery is disabled.'''
+    if not PDF_STORAGE:
+        return None
+    if PDF_STORAGE == "local":
+        return LocalStorage(PDF_STORAGE_DIR, PDF_URL_SECRET)
+    if PDF_STORAGE == "s3":
+        return S3Storage(PDF_STORAGE_BUCKET, PDF_STORAGE_PREFIX, PDF_STORAGE_ENDPOINT, PDF_STORAGE_REGION,
+                         PDF_STORAGE_POOL, PDF_STORAGE_PART_BYTES)
+    raise ValueError(f"PDF_STORAGE desconocido: {PDF_STORAGE!r} (usa local o s3)")
+
+pdf_storage = create_storage()
+STORED_NAME = re.compile(r"[0-9a-f]{64}\.pdf")
+
+# --- Respuestas PDF ---
+def render_pdf_to_spool(data: ReporteData, stats: Optional[dict] = None):
+    '''Renders the report into a SpooledTemporaryFile that rolls over to disk above PDF_SPOOL_BYTES.'''
+    spool = tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_BYTES)
+    try:
+        return create_pdf_in_memory(data, output=spool, stats=stats)
+    except Exception:
+        spool.close()
+        raise
+
+def pdf_file_response(fileobj, headers):
+    '''Streams a rendered PDF file object in chunks with Content-Length, closing it afterwards.'''
+    size = fileobj.seek(0, io.SEEK_END)
+    fileobj.seek(0)
+
+    def iter_chunks():
+        try:
+            while chunk := fileobj.read(PDF_STREAM_CHUNK):
+                yield chunk
+        finally:
+            fileobj.close()
+
+    headers = dict(headers, **{'Content-Length': str(size)})
+    return StreamingResponse(iter_chunks(), media_type="application/pdf", headers=headers)
+
+# --- Gráficas en SVG y PNG ---
+# Las gráficas del reporte fuera del PDF (/charts y /preview): los mismos LayeredDrawing convertidos
+# con los renderizadores SVG y PM de ReportLab. Las capas compartidas se convierten una vez por
+# proceso, igual que sus form XObjects en el PDF, y cada gráfica terminada queda en una LRU.
+_SVG_LAYERS = {}
+CHART_KINDS = ("bar", "radar", "gauge", "semaforo")
+
+def _svg_group(drawing):
+    '''Drawing group of renderSVG's output for `drawing`, without its clip to the drawing area.'''
+    from reportlab.graphics import renderSVG
+
+    svg = renderSVG.drawToString(drawing)
+    group = svg[svg.index('<g id="group"'):svg.rindex("</svg>")]
+    return group.replace(' id="group"', "").replace(' style="clip-path: url(#clip)"', "")
+
+def _shared_layer(name, drawing):
+    '''(bounds, SVG group) of a shared chart layer, computed once per process.'''
+    layer = _SVG_LAYERS.get(name)
+    if layer is None:
+        layer = _SVG_LAYERS.setdefault(name, (drawing.getBounds(), _svg_group(drawing)))
+    return layer
+
+def layered_bounds(layered):
+    '''
+    Drawing area of a LayeredDrawing grown to the bounds of its shared layers. Like the form
+    XObjects of the PDF, the SVG and PNG output is not clipped: axis and radar labels fall outside.
+    '''
+    x0, y0, x1, y1 = 0, 0, layered.width, layered.height
+    for layer in layered.layers:
+        if isinstance(layer, tuple):
+            bounds = _shared_layer(*layer)[0]
+            x0, y0, x1, y1 = min(x0, bounds[0]), min(y0, bounds[1]), max(x1, bounds[2]), max(y1, bounds[3])
+    return x0, y0, x1, y1
+
+def layered_svg(layered):
+    '''Standalone SVG of a LayeredDrawing, one group per layer from bottom to top.'''
+    groups = [_shared_layer(*layer)[1] if isinstance(layer, tuple) else _svg_group(layer) for layer in layered.layers]
+    x0, y0, x1, y1 = layered_bounds(layered)
+    # Los grupos de renderSVG voltean el eje y: y del dibujo -> alto - y
+    width, height = x1 - x0, y1 - y0
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" version="1.1" '
+            f'width="{width:.0f}" height="{height:.0f}" viewBox="{x0:.1f} {layered.height - y1:.1f} {width:.1f} {height:.1f}" '
+            f'fill-rule="evenodd">{"".join(groups)}</svg>')
+
+def layered_png(layered, dpi):
+    '''PNG of a LayeredDrawing on a white background (needs the rl_renderPM extension).'''
+    from reportlab.graphics import renderPM
+
+    x0, y0, x1, y1 = layered_bounds(layered)
+    group = Group(transform=(1, 0, 0, 1, -x0, -y0))
+    for layer in layered.layers:
+        group.add(Group(*(layer[1] if isinstance(layer, tuple) else layer).contents))
+    drawing = Drawing(x1 - x0, y1 - y0)
+    drawing.add(group)
+    return renderPM.drawToString(drawing, fmt="PNG", dpi=dpi, backend="_renderPM")
+
+class DrawingCanvas:
+    '''
+    Records the canvas calls of a Flowable (the ones SemaforoDIGEI_Lite uses) as shapes of a
+    Drawing, so the flowable can go through the SVG and PNG renderers. Forms are drawn inline.
+    '''
+    def __init__(self, drawing):
+        self.drawing = drawing
+        self._state = {"fill": colors.black, "stroke": colors.black, "width": 1, "font": ("Helvetica", 10)}
+        self._saved = []
+
+    def saveState(self):
+        self._saved.append(dict(self._state))
+
+    def restoreState(self):
+        self._state = self._saved.pop()
+
+    def setFillColor(self, color):
+        self._state["fill"] = color
+
+    def setStrokeColor(self, color):
+        self._state["stroke"] = color
+
+    def setLineWidth(self, width):
+        self._state["width"] = width
+
+    def setFont(self, name, size):
+        self._state["font"] = (name, size)
+
+    def _paint(self, fill, stroke):
+        return dict(fillColor=self._state["fill"] if fill else None, strokeColor=self._state["stroke"] if stroke else None,
+                    strokeWidth=self._state["width"])
+
+    def rect(self, x, y, width, height, stroke=1, fill=0):
+        self.drawing.add(Rect(x, y, width, height, **self._paint(fill, stroke)))
+
+    def circle(self, x, y, r, stroke=1, fill=0):
+        self.drawing.add(Circle(x, y, r, **self._paint(fill, stroke)))
+
+    def drawString(self, x, y, text):
+        font, size = self._state["font"]
+        self.drawing.add(String(x, y, text, fontName=font, fontSize=size, fillColor=self._state["fill"]))
+
+    def hasForm(self, name):
+        return False
+
+    def beginForm(self, name, *bounds):
+        pass
+
+    def endForm(self):
+        pass
+
+    def doForm(self, name):
+        pass
+
+def flowable_drawing(flowable):
+    '''Drawing of a canvas-drawn Flowable, through DrawingCanvas.'''
+    width, height = flowable.wrap(0, 0)
+    drawing = Drawing(width, height)
+    flowable.canv = DrawingCanvas(drawing)
+    flowable.draw()
+    del flowable.canv
+    return drawing
+
+def chart_drawing(kind, values, scope="general"):
+    '''
+    LayeredDrawing of one report chart for `values` (percentages): bar and radar take one per
+    dimension, gauge their average and semaforo a single value, with the thresholds and card of the
+    general semáforo or, with scope "dimension", of the per-dimension cards.
+    '''
+    if kind == "bar":
+        return dimensiones_chart_drawing([{'pct_vs_100': value} for value in values])
+    if kind == "radar":
+        return radar_chart_drawing(values)
+    if kind == "gauge":
+        return gauge_chart_drawing([{'pct_vs_100': value} for value in values])
+    if scope == "dimension":
+        card = SemaforoDIGEI_Lite(current=values[0], thresholds=DIMENSION_THRESHOLDS, unit="%", width=7*cm, height=4*cm, no_border=True)
+    else:
+        frame_width = A4[0] - PAGE_MARGINS['leftMargin'] - PAGE_MARGINS['rightMargin']
+        card = SemaforoDIGEI_Lite(current=values[0], unit="%", width=frame_width * 0.45, height=6*cm)
+    return LayeredDrawing(card.width, card.height, [flowable_drawing(card)])
+
+def render_chart(kind, values, fmt="svg", scope="general", dpi=CHART_PNG_DPI):
+    '''
+    Returns (key, bytes, cached) for one chart. The key hashes the inputs and the content version
+    (so it changes with a deploy) and is the entry in chart_cache.
+    '''
+    values = [float(value) for value in values]
+    params = [kind, values, fmt, scope if kind == "semaforo" else None, dpi if fmt == "png" else None]
+    digest = hashlib.sha256(report_content_version().encode())
+    digest.update(json.dumps(params).encode())
+    key = digest.hexdigest()
+    content = chart_cache.get(key)
+    if content is not None:
+        return key, content, True
+    layered = chart_drawing(kind, values, scope)
+    content = layered_svg(layered).encode("utf-8") if fmt == "svg" else layered_png(layered, dpi)
+    chart_cache.put(key, content)
+    return key, content, False
+
+# --- Vista previa HTML ---
+# /preview arma el mismo ReportView que el PDF pero lo escribe como HTML, sin maquetación ni PDF; las
+# gráficas salen de render_chart.
+SEMAFORO_BAND_COLORS = {"alto": "#4CAF50", "medio": "#FFC107", "bajo": "#F44336"}
+
+PREVIEW_CSS = """
+body { font-family: Helvetica, Arial, sans-serif; color: #212121; max-width: 60rem; margin: 2rem auto; padding: 0 1rem; }
+h1 { font-size: 1.4rem; } h2 { color: #757575; font-size: 1.1rem; text-align: center; margin-top: 2.5rem; }
+h3 { font-size: 0.95rem; } h4 { font-size: 0.85rem; margin-bottom: 0.3rem; }
+.datos { color: #616161; font-size: 0.9rem; }
+.cards { display: flex; gap: 1.5rem; flex-wrap: wrap; }
+.card { flex: 1 1 18rem; border: 1px solid #E0E0E0; padding: 1rem; }
+.card h3 { font-size: 0.8rem; margin-top: 0; }
+.semaforo { display: flex; align-items: center; gap: 1.5rem; }
+.focos { display: flex; flex-direction: column; gap: 0.35rem; }
+.foco { width: 1.4rem; height: 1.4rem; border-radius: 50%; border: 3px solid transparent; }
+.foco.actual { border-color: #6A1B9A; }
+.valor { font-size: 2.2rem; font-weight: bold; color: #111111; }
+.grafica { text-align: center; } .grafica svg { max-width: 100%; height: auto; }
+table { border-collapse: collapse; width: 100%; font-size: 0.8rem; }
+th { background: #757575; color: white; padding: 0.3rem; } td { border: 1px solid #BDBDBD; padding: 0.25rem 0.4rem; }
+td.num { text-align: right; } tr.dimension td { background: #F0F0F0; font-weight: bold; }
+"""
+
+def _semaforo_html(title, value, thresholds=SEMAFORO_THRESHOLDS):
+    '''Semáforo card like SemaforoDIGEI_Lite: three lamps, the current band ringed, and the value.'''
+    current = BANDS[band_index(value, thresholds)]
+    lamps = "".join(
+        f'<span class="foco{" actual" if band == current else ""}" style="background:{SEMAFORO_BAND_COLORS[band]}" title="{band.capitalize()}"></span>'
+        for band in reversed(BANDS)
+    )
+    return (f'<div class="card"><h3>{title}</h3><div class="semaforo"><div class="focos">{lamps}</div>'
+            f'<span class="valor">{int(value)}%</span></div></div>')
+
+def chart_svg(kind, values):
+    return render_chart(kind, values)[1].decode("utf-8")
+
+def render_preview_html(data: ReporteData):
+    '''HTML preview of the report: semáforos, gauge, GRÁFICA 01, radar, TABLA 01 and the unattended indicators.'''
+    view = ReportView(data)
+    org = data.organizacion
+    nombre = escape(str(org.get('nombre', 'Sin nombre')))
+    out = [
+        f'<!DOCTYPE html><html lang="es"><head><meta charset="utf-8"><title>Vista previa · {nombre}</title>'
+        f'<style>{PREVIEW_CSS}</style></head><body>',
+        f'<h1>{nombre}</h1><p class="datos">Responsable: {escape(str(org.get("responsable", "")))} · '
+        f'Folio: {escape(str(org.get("folio", "")))} · Fecha de aplicación: {escape(str(org.get("fecha_aplicacion", "")))}</p>',
+        '<h2>INDICADORES DE NIVEL DE CUMPLIMIENTO</h2><div class="cards">',
+        _semaforo_html("PORCENTAJE DE INDICADORES ATENDIDOS RESPECTO AL 100% DE INDICADORES", view.pct_vs_100),
+        _semaforo_html(f"PORCENTAJE DE INDICADORES ATENDIDOS RESPECTO AL {META_PCT}% DE INDICADORES", view.pct_vs_80),
+        '</div>',
+    ]
+    if view.chart_data:
+        values = [item['pct_vs_100'] for item in view.chart_data]
+        out += [
+            f'<div class="grafica">{chart_svg("gauge", values)}</div>',
+            '<h2>PORCENTAJE DE INDICADORES ATENDIDOS POR DIMENSIÓN <small>(GRÁFICA 01)</small></h2>',
+            f'<div class="grafica">{chart_svg("bar", values)}</div>',
+            '<h2>PANORAMA GENERAL POR DIMENSIÓN <small>(GRÁFICA DE RADAR)</small></h2>',
+            f'<div class="grafica">{chart_svg("radar", view.radar_values)}</div>',
+        ]
+
+    if data.dimensiones:
+        out.append('<h2>SUBDIMENSIONES POR DIMENSIÓN <small>(TABLA 01)</small></h2>'
+                   f'<p>{escape(view.tabla["descripcion"])}</p><table><tr><th>ID</th><th>Subdimensión</th>'
+                   '<th>Indicadores (Total)</th><th>Indicadores (Atendidos)</th><th>% vs 100</th>'
+                   f'<th>% vs {META_PCT}</th><th>Semáforo</th></tr>')
+        for dimension in view.tabla["dimensiones"]:
+            out.append(f'<tr class="dimension"><td colspan="7">{dimension["id"]}. {escape(dimension["nombre"])}</td></tr>')
+            for sub in dimension["subdimensiones"]:
+                out.append(
+                    f'<tr><td>{escape(str(sub["id"]))}</td><td>{escape(sub["nombre"])}</td>'
+                    f'<td class="num">{sub["indicadores_total"]}</td><td class="num">{sub["indicadores_atendidos"]}</td>'
+                    f'<td class="num">{sub["porcentaje_vs_100"]:.1f}%</td><td class="num">{sub["porcentaje_vs_80"]:.1f}%</td>'
+                    f'<td style="background:{SEMAFORO_BAND_COLORS.get(sub["semaforo"], "white")}">{sub["semaforo"].capitalize()}</td></tr>'
+                )
+        out.append('</table>')
+
+    for detalle in view.detalles:
+        out.append(f'<h2>{escape(detalle["dimension_nombre"].upper())}</h2><div class="cards">')
+        out.append(_semaforo_html("PORCENTAJE DE INDICADORES ATENDIDOS EN LA DIMENSIÓN", detalle["porcentaje_atendido"],
+                                  DIMENSION_THRESHOLDS))
+        out.append('</div>')
+        if not detalle["puntos_no_atendidos"]:
+            out.append('<p>No hay puntos no atendidos para esta dimensión.</p>')
+            continue
+        # Numeración continua entre subdimensiones, como en la tabla del PDF
+        out.append('<h3>PREGUNTAS NO ATENDIDAS POR SUBDIMENSIÓN</h3>')
+        numero = 1
+        for punto in detalle["puntos_no_atendidos"]:
+            preguntas = "".join(f"<li>{escape(pregunta)}</li>" for pregunta in punto["preguntas"])
+            out.append(f'<h4>{escape(punto["subdimension"])}</h4><ol start="{numero}">{preguntas}</ol>')
+            numero += len(punto["preguntas"])
+
+    out.append('</body></html>')
+    return "".join(out)
+
 # --- FastAPI Endpoints ---
+def render_stats_summary(stats):
+    '''Compact view of the render stats for the per-request log line.'''
+    return {
+        "pages": stats.get("pages"),
+        "flowables": stats.get("flowables"),
+        "parts": stats.get("parts"),
+        "sections_ms": {name: round(span["seconds"] * 1000, 1) for name, span in stats.get("spans", {}).items()},
+    }
+
+def _add_breakdown(pdf, headers, summary):
+    '''?breakdown=1: bytes by kind in the X-PDF-Bytes header and the request log.'''
+    breakdown = pdf_byte_breakdown(pdf)
+    headers['X-PDF-Bytes'] = pdf_breakdown_header(breakdown)
+    summary["bytes"] = breakdown
+    if breakdown["fonts_not_subset"]:
+        logger.warning("Fuentes embebidas sin subset: %s", ", ".join(breakdown["fonts_not_subset"]))
+
+def _report_response(data: ReporteData, request: Request, profile: bool, breakdown: bool, summary: dict):
+    '''Cache lookup, render and response for /generar-pdf; fills `summary` for the request log.'''
+    # ?profile=1 solo aplica si PDF_PROFILE_DIR está configurado; fuerza el render saltando la caché
+    profile = profile and bool(PDF_PROFILE_DIR)
+    cache_key = report_cache_key(data)
+    etag = f'"{cache_key}"'
+    if not profile and _etag_matches(request.headers.get("if-none-match"), etag):
+        summary["cache"] = "not-modified"
+        return Response(status_code=304, headers={"ETag": etag})
+
+    folio = summary["folio"]
+    filename = f"reporte-{folio}.pdf"
+    headers = {'Content-Disposition': f'inline; filename="{filename}"', 'ETag': etag}
+    lookup_started = time.perf_counter()
+    pdf = None if profile else pdf_cache.get(cache_key)
+    if pdf is not None:
+        report_metrics.cache_result(hit=True)
+        summary.update(cache="hit", size=len(pdf))
+        headers['X-Cache'] = 'HIT'
+        headers['Server-Timing'] = f'cache;desc="hit";dur={(time.perf_counter() - lookup_started) * 1000:.1f}'
+        if breakdown:
+            _add_breakdown(pdf, headers, summary)
+        return Response(content=pdf, media_type="application/pdf", headers=headers)
+
+    report_metrics.cache_result(hit=False)
+    headers['X-Cache'] = 'MISS'
+    stats = {}
+    if profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        spool = profiler.runcall(render_pdf_to_spool, data, stats)
+        headers['X-Profile-File'] = summary["profile"] = dump_profile(profiler, folio).name
+    else:
+        spool = render_pdf_to_spool(data, stats)
+    size = spool.seek(0, io.SEEK_END)
+    spool.seek(0)
+    report_metrics.observe(stats, size)
+    summary.update(cache="miss", size=size, **render_stats_summary(stats))
+    headers['Server-Timing'] = server_timing_header(stats)
+    # La respuesta siempre sale del spool por chunks. Solo los PDFs que el spool aún tiene en memoria
+    # (hasta PDF_SPOOL_BYTES) se copian a la caché en memoria; los demás van a la de disco por bloques
+    pdf = None
+    if size <= min(PDF_SPOOL_BYTES, pdf_cache.max_bytes):
+        pdf = spool.read()
+        spool.seek(0)
+        pdf_cache.put(cache_key, pdf)
+    else:
+        pdf_cache.put_file(cache_key, spool)
+    if breakdown:
+        _add_breakdown(pdf if pdf is not None else spool.read(), headers, summary)
+        spool.seek(0)
+    return pdf_file_response(spool, headers)
+
+def _stored_report_response(data: ReporteData, request: Request, summary: dict):
+    '''?delivery=url: stores the report unless the store already has it and returns a signed URL.'''
+    cache_key = report_cache_key(data)
+    name = f"{cache_key}.pdf"
+    size = pdf_storage.size(name)
+    if size is not None:
+        summary.update(storage="existing", size=size)
+    else:
+        pdf = pdf_cache.get(cache_key)
+        report_metrics.cache_result(hit=pdf is not None)
+        if pdf is not None:
+            fileobj = io.BytesIO(pdf)
+            summary["cache"] = "hit"
+        else:
+            stats = {}
+            fileobj = render_pdf_to_spool(data, stats)
+            summary.update(cache="miss", **render_stats_summary(stats))
+        try:
+            size = fileobj.seek(0, io.SEEK_END)
+            fileobj.seek(0)
+            if pdf is None:
+                report_metrics.observe(stats, size)
+            pdf_storage.upload(name, fileobj)
+        finally:
+            fileobj.close()
+        summary.update(storage="uploaded", size=size)
+
+    filename = f"reporte-{summary['folio']}.pdf"
+    return JSONResponse({
+        "url": pdf_storage.signed_url(name, filename, PDF_URL_TTL, str(request.base_url)),
+        "expires_in": PDF_URL_TTL,
+        "etag": f'"{cache_key}"',
+        "size": size,
+    })
+
 @app.post("/generar-pdf", summary="Generate PDF from JSON data")
-def generate_pdf_from_json(data: ReporteData):
+def generate_pdf_from_json(data: ReporteData, request: Request, profile: bool = False, breakdown: bool = False,
+                           delivery: Literal["inline", "url"] = "inline"):
+    started = time.perf_counter()
+    summary = {"endpoint": "/generar-pdf", "folio": data.organizacion.get('folio', 'DIGEI')}
+    logger.debug("Payload: organización=%s, dimensiones=%d, gráfica=%d",
+                 data.organizacion.get('nombre', 'N/A'), len(data.dimensiones), len(data.grafica_dimensiones))
+    if delivery == "url" and pdf_storage is None:
+        raise HTTPException(status_code=400, detail="La entrega por URL requiere configurar PDF_STORAGE")
     try:
-        # Log para depuración
-        print(f"📊 Datos recibidos:")
-        print(f"  - Organización: {data.organizacion.get('nombre', 'N/A')}")
-        print(f"  - Total dimensiones: {len(data.dimensiones)}")
-        print(f"  - Gráfica dimensiones: {len(data.grafica_dimensiones)}")
-        if data.grafica_dimensiones:
-            print(f"  - Primer dato gráfica: {data.grafica_dimensiones[0]}")
-        
-        pdf_buffer = create_pdf_in_memory(data)
-        filename = f"reporte-{data.organizacion.get('folio', 'DIGEI')}.pdf"
-        headers = {'Content-Disposition': f'inline; filename="{filename}"'}
-        return Response(content=pdf_buffer.getvalue(), media_type="application/pdf", headers=headers)
+        if delivery == "url":
+            response = _stored_report_response(data, request, summary)
+        else:
+            response = _report_response(data, request, profile, breakdown, summary)
     except Exception as e:
-        print(f"❌ Error generando PDF: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log_event("Error generando PDF", logging.ERROR, exc_info=True, status=500, error=str(e),
+                  duration_ms=round((time.perf_counter() - started) * 1000, 1), **summary)
         raise HTTPException(status_code=500, detail=f"Error generando PDF: {str(e)}")
+    log_event("Reporte servido", status=response.status_code,
+              duration_ms=round((time.perf_counter() - started) * 1000, 1), **summary)
+    return response
+
+@app.post("/preview", summary="HTML preview of the report, without building the PDF", response_class=HTMLResponse)
+def preview_report(data: ReporteData, request: Request):
+    started = time.perf_counter()
+    summary = {"endpoint": "/preview", "folio": data.organizacion.get('folio', 'DIGEI')}
+    # Misma dirección de contenido que el PDF, con otro ETag porque la representación es otra
+    etag = f'"preview-{report_cache_key(data)}"'
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        response = Response(status_code=304, headers={"ETag": etag})
+    else:
+        html = render_preview_html(data)
+        summary["size"] = len(html)
+        response = HTMLResponse(html, headers={
+            "ETag": etag, "Server-Timing": f"preview;dur={(time.perf_counter() - started) * 1000:.1f}",
+        })
+    log_event("Vista previa servida", status=response.status_code,
+              duration_ms=round((time.perf_counter() - started) * 1000, 1), **summary)
+    return response
+
+@app.get("/charts/{kind}", summary="Render one report chart as SVG or PNG")
+def get_chart(kind: Literal[CHART_KINDS], request: Request, values: list[float] = Query(...),
+              format: Literal["svg", "png"] = "svg", scope: Literal["general", "dimension"] = "general",
+              dpi: int = Query(CHART_PNG_DPI, ge=36, le=600)):
+    started = time.perf_counter()
+    limit = 1 if kind == "semaforo" else len(RADAR_DIMENSION_NAMES)
+    if not 1 <= len(values) <= limit or not all(math.isfinite(value) for value in values):
+        raise HTTPException(status_code=400, detail=f"values debe traer entre 1 y {limit} porcentajes")
+    key, content, cached = render_chart(kind, values, format, scope, dpi)
+    etag = f'"{key}"'
+    headers = {"ETag": etag, "X-Cache": "HIT" if cached else "MISS"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        response = Response(status_code=304, headers=headers)
+    else:
+        headers["Server-Timing"] = f'chart;desc="{"hit" if cached else "miss"}";dur={(time.perf_counter() - started) * 1000:.1f}'
+        response = Response(content=content, media_type="image/svg+xml" if format == "svg" else "image/png", headers=headers)
+    # Los tableros consultan muy seguido: solo en DEBUG
+    log_event("Gráfica servida", logging.DEBUG, endpoint="/charts", kind=kind, format=format, cache="hit" if cached else "miss",
+              status=response.status_code, size=len(content), duration_ms=round((time.perf_counter() - started) * 1000, 1))
+    return response
+
+@app.get("/catalogo", summary="Catalog of dimensions, subdimensions and indicators with their ids")
+def get_catalogo(request: Request):
+    catalog = get_catalog()
+    if catalog is None:
+        raise HTTPException(status_code=404, detail="No hay catálogo cargado")
+    etag = f'"catalogo-{catalog.digest}"'
+    headers = {"ETag": etag, "X-Catalog-Version": catalog.version}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(CATALOG_PATH, media_type="application/json", headers=headers)
+
+@app.get("/archivos/{name}", summary="Download a stored PDF through a signed URL (local storage)")
+def get_stored_pdf(name: str, expires: int, filename: str, signature: str):
+    if not isinstance(pdf_storage, LocalStorage) or not STORED_NAME.fullmatch(name):
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    if expires < time.time() or not hmac.compare_digest(signature, pdf_storage.signature(name, expires, filename)):
+        raise HTTPException(status_code=403, detail="URL vencida o con firma inválida")
+    path = pdf_storage.directory / name
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    return FileResponse(path, media_type="application/pdf",
+                        headers={'Content-Disposition': f'inline; filename="{filename}"'})
+
+# --- Jobs asíncronos ---
+# El layout de ReportLab es CPU-bound y retiene el GIL: los jobs se renderizan en un pool de procesos.
+_jobs = {}
+_job_pool = None
+_job_avg_seconds = 1.0
+
+def get_job_pool():
+    global _job_pool
+    if _job_pool is None:
+        _job_pool = ProcessPoolExecutor(max_workers=JOB_WORKERS, mp_context=_pool_context)
+    return _job_pool
+
+def discard_job_pool(pool):
+    '''Forgets a broken job pool so the next get_job_pool() starts a new one (if it is still current).'''
+    global _job_pool
+    if _job_pool is pool:
+        _job_pool = None
+
+def shutdown_job_pool():
+    global _job_pool
+    if _job_pool is not None:
+        _job_pool.shutdown(wait=False, cancel_futures=True)
+        _job_pool = None
+
+def render_pdf_bytes(payload: dict, scores=None):
+    '''
+    Worker entry point: renders a ReporteData payload (as a dict) and returns the PDF bytes and
+    the render stats, so the parent process can record them in report_metrics. The batch passes
+    the `scores` it computed for the payload with score_reports.
+    '''
+    stats = {}
+    pdf = create_pdf_in_memory(ReporteData(**payload), stats=stats, sectioned=False, scores=scores).getvalue()
+    return pdf, stats
+
+# Renders que excedieron JOB_TIMEOUT pero ya corrían: un proceso no se puede interrumpir, así que
+# siguen ocupando un worker hasta terminar y cuentan para la contrapresión de /jobs y del batch
+_abandoned_renders = set()
+
+def _forget_render(waiter):
+    _abandoned_renders.discard(waiter)
+    if not waiter.cancelled():
+        waiter.exception()  # El resultado se descarta (sin "exception was never retrieved")
+
+def _abandon_render(future, waiter):
+    '''Drops a render still queued in the pool, or keeps one already running in _abandoned_renders.'''
+    if not future.cancel():
+        _abandoned_renders.add(waiter)
+        waiter.add_done_callback(_forget_render)
+
+async def await_render(future):
+    '''
+    Result of a render submitted to the job pool, waiting at most JOB_TIMEOUT (asyncio.TimeoutError
+    after that). The pool future stays tracked until the worker is really free.
+    '''
+    waiter = asyncio.wrap_future(future)
+    try:
+        done, _ = await asyncio.wait((waiter,), timeout=JOB_TIMEOUT)
+    except asyncio.CancelledError:
+        _abandon_render(future, waiter)
+        raise
+    if not done:
+        _abandon_render(future, waiter)
+        raise asyncio.TimeoutError
+    return waiter.result()
+
+def _pending_jobs():
+    '''Queued or running jobs plus timed-out renders that still hold a worker.'''
+    return sum(1 for job in _jobs.values() if job["status"] == "pending") + len(_abandoned_renders)
+
+def _purge_jobs():
+    '''Drops finished jobs older than JOB_TTL.'''
+    now = time.time()
+    expired = [job_id for job_id, job in _jobs.items()
+               if job["finished_at"] is not None and now - job["finished_at"] > JOB_TTL]
+    for job_id in expired:
+        del _jobs[job_id]
+
+async def _run_job(job_id, payload):
+    global _job_avg_seconds
+    job = _jobs[job_id]
+    started = time.time()
+    pool = get_job_pool()
+    try:
+        job["pdf"], stats = await await_render(pool.submit(render_pdf_bytes, payload))
+        job["status"] = "done"
+        report_metrics.observe(stats, len(job["pdf"]))
+        job["stats"] = render_stats_summary(stats)
+        _job_avg_seconds = 0.8 * _job_avg_seconds + 0.2 * (time.time() - started)
+    except asyncio.TimeoutError:
+        # Si ya corría, el worker sigue ocupado hasta terminar (ver await_render)
+        job["status"] = "timeout"
+        job["error"] = f"El job excedió el límite de {JOB_TIMEOUT:.0f}s"
+    except BrokenProcessPool as e:
+        discard_job_pool(pool)
+        job["status"] = "error"
+        job["error"] = f"Pool de procesos caído: {e}"
+    except Exception as e:
+        job["status"] = "error"
+        job["error"] = str(e)
+    job["finished_at"] = time.time()
+    job.pop("task", None)
+    log_event("Job terminado", logging.INFO if job["status"] == "done" else logging.ERROR,
+              job_id=job_id, folio=job["folio"], status=job["status"], error=job["error"],
+              size=len(job["pdf"]) if job["pdf"] else None,
+              duration_ms=round((job["finished_at"] - started) * 1000, 1), **job.pop("stats", {}))
+
+def _job_status(job_id, job):
+    status = {
+        "job_id": job_id,
+        "status": job["status"],
+        "folio": job["folio"],
+        "created_at": job["created_at"],
+        "finished_at": job["finished_at"],
+    }
+    if job["status"] == "done":
+        status["size"] = len(job["pdf"])
+        status["pdf_url"] = f"/jobs/{job_id}/pdf"
+    if job["error"]:
+        status["error"] = job["error"]
+    return status
+
+@app.post("/jobs", status_code=202, summary="Queue a PDF generation job")
+async def create_pdf_job(data: ReporteData):
+    _purge_jobs()
+    pending = _pending_jobs()
+    if pending >= JOB_QUEUE_LIMIT:
+        retry_after = max(1, math.ceil(_job_avg_seconds * pending / JOB_WORKERS))
+        raise HTTPException(status_code=429, detail="Cola de generación llena, intenta más tarde",
+                            headers={"Retry-After": str(retry_after)})
+
+    job_id = uuid.uuid4().hex
+    _jobs[job_id] = {
+        "status": "pending",
+        "folio": data.organizacion.get('folio', 'DIGEI'),
+        "created_at": time.time(),
+        "finished_at": None,
+        "pdf": None,
+        "error": None,
+    }
+    _jobs[job_id]["task"] = asyncio.create_task(_run_job(job_id, data.model_dump()))
+    return _job_status(job_id, _jobs[job_id])
+
+@app.get("/jobs/{job_id}", summary="Get the status of a PDF generation job")
+async def get_pdf_job(job_id: str):
+    job = _jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job no encontrado")
+    return _job_status(job_id, job)
+
+@app.get("/jobs/{job_id}/pdf", summary="Download the PDF of a finished job")
+async def get_pdf_job_result(job_id: str):
+    job = _jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job no encontrado")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"El job no tiene PDF disponible (estado: {job['status']})")
+    filename = f"reporte-{job['folio']}.pdf"
+    headers = {'Content-Disposition': f'inline; filename="{filename}"'}
+    return Response(content=job["pdf"], media_type="application/pdf", headers=headers)
+
+# --- Batch de reportes ---
+class _ZipSink:
+    '''Write-only target for zipfile that buffers output until it is drained into the response.'''
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+async def _spool_request_body(request: Request):
+    '''
+    Copies the request body to a spooled temp file. The body has to be consumed before the
+    streaming response starts (Starlette listens for disconnects on the same channel).
+    '''
+    spool = tempfile.SpooledTemporaryFile(max_size=BATCH_SPOOL_BYTES)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+async def _iter_ndjson(spool):
+    '''Yields one raw JSON line at a time from a spooled NDJSON body.'''
+    try:
+        for line in spool:
+            if line.strip():
+                yield line
+    finally:
+        spool.close()
+
+async def _iter_list(items):
+    for item in items:
+        yield item
+
+async def _batch_zip_stream(entries):
+    '''
+    Renders each payload in the process pool and streams a ZIP with one reporte-{folio}.pdf per entry.
+    Payloads are validated in windows of BATCH_IN_FLIGHT and each window is scored with one
+    score_reports call. Only BATCH_IN_FLIGHT PDFs are held in memory at once; manifest.json records
+    per-entry results.
+    '''
+    started = time.perf_counter()
+    sink = _ZipSink()
+    zf = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED)
+    manifest = []
+    names = set()
+    in_flight = {}
+
+    def write_result(task):
+        entry, pool = in_flight.pop(task)
+        try:
+            pdf, stats = task.result()
+        except asyncio.TimeoutError:
+            entry.update(status="error", error=f"El reporte excedió el límite de {JOB_TIMEOUT:.0f}s")
+            return
+        except BrokenProcessPool as e:
+            discard_job_pool(pool)
+            entry.update(status="error", error=f"Pool de procesos caído: {e}")
+            return
+        except Exception as e:
+            entry.update(status="error", error=str(e))
+            return
+        name = f"reporte-{entry['folio']}.pdf"
+        if name in names:
+            name = f"reporte-{entry['folio']}-{entry['index']}.pdf"
+        names.add(name)
+        zf.writestr(name, pdf)
+        report_metrics.observe(stats, len(pdf))
+        entry.update(status="ok", archivo=name, size=len(pdf))
+
+    async def submit(window):
+        # Las puntuaciones de toda la ventana salen de una pasada vectorizada y viajan al worker
+        for (entry, data), scores in zip(window, score_reports([data for _, data in window])):
+            pool = get_job_pool()
+            try:
+                future = pool.submit(render_pdf_bytes, data.model_dump(), scores)
+            except (BrokenProcessPool, RuntimeError) as e:
+                # Un worker murió (o el pool ya se cerró): el siguiente reporte usa un pool nuevo
+                discard_job_pool(pool)
+                entry.update(status="error", error=f"Pool de procesos caído: {e}")
+                continue
+            in_flight[asyncio.ensure_future(await_render(future))] = entry, pool
+
+            # Los renders vencidos que siguen corriendo también ocupan workers: no se envían más hasta que terminen
+            while len(in_flight) + len(_abandoned_renders) >= BATCH_IN_FLIGHT:
+                done, _ = await asyncio.wait(list(in_flight) + list(_abandoned_renders), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task in in_flight:
+                        write_result(task)
+                yield sink.drain()
+
+    try:
+        index = 0
+        window = []
+        async for raw in entries:
+            entry = {"index": index, "folio": None}
+            manifest.append(entry)
+            index += 1
+            try:
+                payload = raw if isinstance(raw, dict) else json.loads(raw)
+                data = ReporteData.model_validate(payload)
+            except Exception as e:
+                entry.update(status="error", error=f"Payload inválido: {e}")
+                continue
+            entry["folio"] = data.organizacion.get('folio', 'DIGEI')
+            window.append((entry, data))
+            if len(window) >= BATCH_IN_FLIGHT:
+                async for chunk in submit(window):
+                    yield chunk
+                window = []
+        if window:
+            async for chunk in submit(window):
+                yield chunk
+
+        while in_flight:
+            done, _ = await asyncio.wait(list(in_flight), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                write_result(task)
+            yield sink.drain()
+
+        ok = sum(1 for entry in manifest if entry["status"] == "ok")
+        zf.writestr("manifest.json", json.dumps({
+            "total": len(manifest),
+            "ok": ok,
+            "errores": len(manifest) - ok,
+            "reportes": manifest,
+        }, ensure_ascii=False, indent=2))
+        zf.close()
+        yield sink.drain()
+        log_event("Batch servido", endpoint="/generar-pdf/batch", total=len(manifest), ok=ok,
+                  errores=len(manifest) - ok, duration_ms=round((time.perf_counter() - started) * 1000, 1))
+    finally:
+        # Si el cliente se desconecta, no seguir esperando los reportes pendientes
+        for task in in_flight:
+            task.cancel()
+
+@app.post("/generar-pdf/batch", summary="Generate many PDFs and stream them back as a ZIP")
+async def generate_pdf_batch(request: Request):
+    '''Accepts a JSON list of ReporteData payloads or an NDJSON stream (application/x-ndjson).'''
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        entries = _iter_ndjson(await _spool_request_body(request))
+    else:
+        try:
+            items = json.loads(await request.body())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"JSON inválido: {e}")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Se esperaba una lista de reportes")
+        entries = _iter_list(items)
+    headers = {'Content-Disposition': 'attachment; filename="reportes.zip"'}
+    return StreamingResponse(_batch_zip_stream(entries), media_type="application/zip", headers=headers)
+
+@app.post("/ingesta/personal", summary="Aggregate a raw personnel survey export into report inputs")
+async def ingest_personal(request: Request):
+    '''
+    NDJSON or JSON array body with one record per person (see ingest.py). The body is parsed
+    and grouped as it arrives, never held whole; the answer has composicion_sexo and salarios
+    ready for ReporteData, plus brecha_por_genero. 400 when no record has a known puesto and sexo.
+    '''
+    started = time.perf_counter()
+    parser, aggregator = JsonRecordStream(), PersonalAggregator()
+    received = 0
+    try:
+        # Cada bloque del body (~64 KB) se procesa en unos ms: el event loop atiende otros requests entre bloques
+        async for chunk in request.stream():
+            received += len(chunk)
+            aggregator.extend(parser.feed(chunk))
+        aggregator.extend(parser.close())
+        result = aggregator.result()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    log_event("Ingesta procesada", endpoint="/ingesta/personal", registros=result["registros"],
+              descartados=result["descartados"], sin_sexo=result["sin_sexo"], size=received,
+              duration_ms=round((time.perf_counter() - started) * 1000, 1))
+    return JSONResponse(result)
+
+@app.get("/metrics", summary="Render metrics in Prometheus text format")
+def get_metrics():
+    return Response(content=report_metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.get("/pdf", summary="Generate a test PDF (deprecated)")
 def generate_test_pdf():
@@ -1490,9 +3903,8 @@ def generate_test_pdf():
         dimensiones=[],
         grafica_dimensiones=[]
     )
-    pdf_buffer = create_pdf_in_memory(test_data)
     headers = {'Content-Disposition': 'inline; filename="reporte-test.pdf"'}
-    return Response(content=pdf_buffer.getvalue(), media_type="application/pdf", headers=headers)
+    return pdf_file_response(render_pdf_to_spool(test_data), headers)
 
 @app.get("/")
 def read_root():
@@ -1500,6 +3912,11 @@ def read_root():
         "message": "Servicio de reportes PDF funcionando.",
         "endpoints": {
             "POST /generar-pdf": "Genera PDF desde JSON (principal)",
+            "POST /generar-pdf/batch": "Genera varios PDFs (lista JSON o NDJSON) y los devuelve en un ZIP",
+            "POST /jobs": "Encola la generación de un PDF en el pool de procesos",
+            "GET /jobs/{id}": "Estado de un job",
+            "GET /jobs/{id}/pdf": "PDF de un job terminado",
+            "GET /metrics": "Métricas de render en formato Prometheus",
             "GET /pdf": "Genera PDF de prueba"
         }
     }
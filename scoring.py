@@ -0,0 +1,111 @@
+"""
+Motor de puntuación del autodiagnóstico DIGEI.
+
+Guarda los conteos de indicadores de uno o varios reportes en arreglos planos y calcula con
+NumPy los porcentajes por subdimensión, dimensión y reporte, y las bandas del semáforo. Es el
+único lugar donde viven los umbrales del semáforo y la meta del 80%: main.py (tablas,
+semáforos, gauge y línea de meta de la GRÁFICA 01) y los benchmarks los importan de aquí.
+"""
+from bisect import bisect_right
+
+# --- Umbrales ---
+# Meta del autodiagnóstico: atender el 80% de los indicadores
+META_PCT = 80
+META_RATIO = META_PCT / 100
+# Semáforo general y de subdimensiones: bajo < 40 ≤ medio < 70 ≤ alto
+SEMAFORO_THRESHOLDS = (40, 70)
+# Semáforo de cada dimensión y gauge: bajo < 50 ≤ medio < meta ≤ alto
+DIMENSION_THRESHOLDS = (50, META_PCT)
+BANDS = ("bajo", "medio", "alto")
+
+
+def band_index(value, thresholds=SEMAFORO_THRESHOLDS):
+    '''Band of one percentage: 0 bajo, 1 medio, 2 alto.'''
+    return bisect_right(thresholds, value)
+
+
+def band_indices(values, thresholds=SEMAFORO_THRESHOLDS):
+    '''band_index over an array of percentages.'''
+    import numpy as np
+    return np.searchsorted(thresholds, values, side="right")
+
+
+def _percent(num, den):
+    '''num / den * 100 elementwise, 0 where den is 0 (same operation order as the scalar code).'''
+    import numpy as np
+    return np.divide(num, den, out=np.zeros(len(num)), where=den > 0) * 100
+
+
+def _count(value):
+    '''A summed count as int when it is whole, else as float.'''
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+# --- Puntuación ---
+class ReportScores:
+    '''
+    Scores of one report. Subdimension arrays are flat in document order (dimension by
+    dimension); dimension arrays follow data.dimensiones. All arrays are views into the
+    batch computed by score_reports.
+    '''
+    def __init__(self, sub_pct_vs_80, sub_band, dim_total, dim_atendidos, dim_pct):
+        self.sub_pct_vs_80 = sub_pct_vs_80
+        self.sub_band = sub_band
+        self.dim_total = dim_total
+        self.dim_atendidos = dim_atendidos
+        self.dim_pct = dim_pct
+        self.total = _count(dim_total.sum())
+        self.atendidos = _count(dim_atendidos.sum())
+        self.pct_vs_100 = (self.atendidos / self.total * 100) if self.total > 0 else 0
+        self.pct_vs_80 = (self.atendidos / (self.total * META_RATIO) * 100) if self.total > 0 else 0
+
+
+def score_reports(reports):
+    '''
+    Scores a list of ReporteData (one institution or a whole batch) in one vectorized pass:
+    subdimension % vs meta_80 and semáforo band, and per-dimension totals and % attended.
+    '''
+    import numpy as np
+
+    total, atendidos, meta, porcentaje, sub_dim, dim_report = [], [], [], [], [], []
+    for r, report in enumerate(reports):
+        for dim in report.dimensiones:
+            d = len(dim_report)
+            dim_report.append(r)
+            for sub in dim.subdimensiones:
+                total.append(sub.total_indicadores)
+                atendidos.append(sub.indicadores_atendidos)
+                meta.append(sub.meta_80)
+                porcentaje.append(sub.porcentaje)
+                sub_dim.append(d)
+
+    # Los conteos pueden venir fraccionarios (ponderados): se suman como float
+    total = np.array(total, dtype=np.float64)
+    atendidos = np.array(atendidos, dtype=np.float64)
+    meta = np.array(meta, dtype=np.float64)
+    sub_dim = np.array(sub_dim, dtype=np.intp)
+    dim_report = np.array(dim_report, dtype=np.intp)
+
+    sub_pct_vs_80 = _percent(atendidos, meta)
+    sub_band = band_indices(np.array(porcentaje, dtype=np.float64))
+    dim_total = np.bincount(sub_dim, weights=total, minlength=len(dim_report))
+    dim_atendidos = np.bincount(sub_dim, weights=atendidos, minlength=len(dim_report))
+    dim_pct = _percent(dim_atendidos, dim_total)
+
+    # Cortes de cada reporte dentro de los arreglos planos
+    dims_per_report = np.bincount(dim_report, minlength=len(reports))
+    subs_per_report = np.bincount(dim_report[sub_dim], minlength=len(reports))
+    dim_bounds = np.concatenate(([0], np.cumsum(dims_per_report)))
+    sub_bounds = np.concatenate(([0], np.cumsum(subs_per_report)))
+
+    return [
+        ReportScores(
+            sub_pct_vs_80[sub_bounds[r]:sub_bounds[r + 1]],
+            sub_band[sub_bounds[r]:sub_bounds[r + 1]],
+            dim_total[dim_bounds[r]:dim_bounds[r + 1]],
+            dim_atendidos[dim_bounds[r]:dim_bounds[r + 1]],
+            dim_pct[dim_bounds[r]:dim_bounds[r + 1]],
+        )
+        for r in range(len(reports))
+    ]
@@ -0,0 +1,74 @@
+import io
+import json
+import os
+import zipfile
+
+from fastapi.testclient import TestClient
+
+import main
+
+
+def render_or_die(payload, scores=None):
+    '''render_pdf_bytes that kills its worker for folio "MUERE", as a crash mid-batch would.'''
+    if payload["organizacion"].get("folio") == "MUERE":
+        os._exit(1)
+    return main.render_pdf_bytes(payload, scores)
+
+
+def payload(folio):
+    data = main.warmup_report_data().model_dump()
+    data["organizacion"]["folio"] = folio
+    return data
+
+
+def test_batch_survives_a_dead_worker(monkeypatch):
+    monkeypatch.setattr(main, "render_pdf_bytes", render_or_die)
+    monkeypatch.setattr(main, "BATCH_IN_FLIGHT", 1)
+    with TestClient(main.app) as client:
+        response = client.post("/generar-pdf/batch", json=[payload("A"), payload("MUERE"), payload("B")])
+        assert response.status_code == 200
+        with zipfile.ZipFile(io.BytesIO(response.content)) as zf:
+            manifest = json.loads(zf.read("manifest.json"))
+            assert sorted(zf.namelist()) == ["manifest.json", "reporte-A.pdf", "reporte-B.pdf"]
+        assert [entry["status"] for entry in manifest["reportes"]] == ["ok", "error", "ok"]
+        assert "Pool de procesos caído" in manifest["reportes"][1]["error"]
+
+        # El pool caído no se reutiliza en requests posteriores
+        response = client.post("/generar-pdf/batch", json=[payload("C")])
+        with zipfile.ZipFile(io.BytesIO(response.content)) as zf:
+            assert json.loads(zf.read("manifest.json"))["ok"] == 1
+
+
+def test_batch_when_submit_hits_a_broken_pool(monkeypatch):
+    class BrokenPool:
+        def submit(self, *args):
+            raise main.BrokenProcessPool("worker muerto")
+
+    with TestClient(main.app) as client:
+        monkeypatch.setattr(main, "_job_pool", BrokenPool())
+        response = client.post("/generar-pdf/batch", json=[payload("A"), payload("B")])
+        with zipfile.ZipFile(io.BytesIO(response.content)) as zf:
+            manifest = json.loads(zf.read("manifest.json"))
+            assert "reporte-B.pdf" in zf.namelist()
+    assert [entry["status"] for entry in manifest["reportes"]] == ["error", "ok"]
+
+
+def test_batch_is_scored_once_per_window(monkeypatch):
+    windows = []
+    score_window = main.score_reports
+
+    def score_reports(reports):
+        windows.append([report.organizacion["folio"] for report in reports])
+        return score_window(reports)
+
+    monkeypatch.setattr(main, "score_reports", score_reports)
+    monkeypatch.setattr(main, "BATCH_IN_FLIGHT", 3)
+    folios = ["A", "B", "C", "D", "E"]
+    invalid = {"organizacion": {}}
+    with TestClient(main.app) as client:
+        response = client.post("/generar-pdf/batch", json=[payload(f) for f in folios[:2]] + [invalid]
+                               + [payload(f) for f in folios[2:]])
+        with zipfile.ZipFile(io.BytesIO(response.content)) as zf:
+            manifest = json.loads(zf.read("manifest.json"))
+    assert windows == [["A", "B", "C"], ["D", "E"]]
+    assert manifest["ok"] == 5 and manifest["errores"] == 1
@@ -0,0 +1,106 @@
+import json
+import os
+
+import pytest
+from pydantic import ValidationError
+
+import main
+from catalog import Catalog, get_catalog
+
+DOCUMENT = {
+    "version": "t1",
+    "dimensiones": [
+        {"id": "1", "nombre": "Dimensión uno", "subdimensiones": [
+            {"id": "1.1", "nombre": "Sub uno", "indicadores": [
+                {"id": "1.1.1", "texto": "¿Pregunta uno?"},
+                {"id": "1.1.2", "texto": "¿Pregunta dos?"},
+            ]},
+        ]},
+        {"id": 2, "nombre": "Dimensión dos", "subdimensiones": []},
+    ],
+}
+
+
+def test_catalog_index():
+    catalog = Catalog(json.dumps(DOCUMENT).encode())
+    assert catalog.version == "t1"
+    assert len(catalog) == 5
+    assert catalog.text("1.1.2") == "¿Pregunta dos?"
+    assert catalog.text("2", 0) == "Dimensión dos"
+    assert catalog.parent("1.1.1") == "1.1"
+    assert catalog.parent("1") is None
+    assert catalog.has_text("Sub uno") and not catalog.has_text("otra")
+
+
+@pytest.mark.parametrize("entry_id, level", [("9", None), ("1.1.3", 2), ("1", 2), ("1.1.1", 0), ("1.1", 0)])
+def test_unknown_or_wrong_level_ids(entry_id, level):
+    catalog = Catalog(json.dumps(DOCUMENT).encode())
+    with pytest.raises(KeyError):
+        catalog.text(entry_id, level)
+
+
+@pytest.mark.parametrize("document, message", [
+    ({"dimensiones": [{"id": "1", "subdimensiones": [{"id": "2.1"}]}]}, "no pertenece"),
+    ({"dimensiones": [{"id": "1"}, {"id": "1"}]}, "repetidos"),
+])
+def test_invalid_catalogs(document, message):
+    with pytest.raises(ValueError, match=message):
+        Catalog(json.dumps(document).encode())
+
+
+def test_get_catalog_reloads_when_the_file_changes(tmp_path):
+    path = tmp_path / "catalogo.json"
+    assert get_catalog(path) is None
+    path.write_text(json.dumps(DOCUMENT), encoding="utf-8")
+    first = get_catalog(path)
+    assert get_catalog(path) is first
+    path.write_text(json.dumps(dict(DOCUMENT, version="t2")), encoding="utf-8")
+    os.utime(path, ns=(0, 0))
+    assert get_catalog(path).version == "t2"
+
+
+# --- Resolución de ids en ReporteData (catálogo incluido en data/) ---
+def report(dimensiones, **extra):
+    return main.ReporteData(organizacion={}, metadata={}, dimensiones=dimensiones, grafica_dimensiones=[], **extra)
+
+
+def test_ids_are_resolved_at_every_level():
+    catalog = get_catalog()
+    data = report([{
+        "id": 1,
+        "subdimensiones": [{"id": "1.1", "indicadores_no_atendidos": [{"id": "1.1.1"}]}],
+    }], catalogo=catalog.version)
+    dim = data.dimensiones[0]
+    assert dim.nombre == catalog.text("1")
+    assert dim.subdimensiones[0].nombre == catalog.text("1.1")
+    assert dim.subdimensiones[0].indicadores_no_atendidos[0].texto == catalog.text("1.1.1")
+
+
+def test_sent_texts_are_kept():
+    data = report([{"id": "1", "nombre": "Nombre propio", "subdimensiones": []}])
+    assert data.dimensiones[0].nombre == "Nombre propio"
+
+
+@pytest.mark.parametrize("dimension, message", [
+    ({"id": "99"}, "El id 99 no existe en el catálogo .* \\(dimensiones\\)"),
+    ({"id": "1", "subdimensiones": [{"id": "1.99"}]}, "El id 1.99 no existe .* \\(subdimensiones\\)"),
+    # Un id de otro nivel no se toma como texto de la entrada
+    ({"id": "1", "subdimensiones": [{"id": "1.1", "indicadores_no_atendidos": [{"id": 7}]}]},
+     "El id 7 no existe .* \\(indicadores\\)"),
+])
+def test_unknown_ids_are_rejected(dimension, message):
+    with pytest.raises(ValidationError, match=message):
+        report([dimension])
+
+
+def test_declared_version_is_always_checked():
+    # Aunque todas las entradas traigan su texto
+    with pytest.raises(ValidationError, match="Catálogo 1999.1 no disponible"):
+        report([{"id": "1", "nombre": "Con texto"}], catalogo="1999.1")
+
+
+def test_ids_without_a_catalog(monkeypatch):
+    monkeypatch.setattr(main, "get_catalog", lambda: None)
+    assert report([{"id": "1", "nombre": "Con texto"}]).dimensiones[0].nombre == "Con texto"
+    with pytest.raises(ValidationError, match="No hay catálogo cargado"):
+        report([{"id": "1"}])
@@ -0,0 +1,79 @@
+import pytest
+from reportlab.lib.styles import ParagraphStyle
+
+from main import FixedRow, FixedTable
+
+STYLE = ParagraphStyle("celda", fontName="Helvetica", fontSize=10, leading=12)
+PADDING = (8, 8, 6, 6)
+ROW_HEIGHT = STYLE.leading + PADDING[2] + PADDING[3]
+
+
+def make_table(count, repeat_rows=1, row_options=None):
+    row_options = row_options or {}
+    rows = [FixedRow(["Encabezado", "Valor"])]
+    rows += [FixedRow([f"fila {i}", str(i)], **row_options.get(i, {})) for i in range(1, count + 1)]
+    return FixedTable(rows, [200, 100], [STYLE, STYLE], padding=PADDING, repeat_rows=repeat_rows)
+
+
+def body_rows(table):
+    return table._row_indexes()[table.repeat_rows:]
+
+
+def paginate(table, page_height):
+    pieces = []
+    while True:
+        parts = table.split(300, page_height)
+        assert parts, "ninguna fila cabe en la página"
+        pieces.append(parts[0])
+        if len(parts) == 1:
+            return pieces
+        table = parts[1]
+
+
+def test_whole_table_fits():
+    table = make_table(5)
+    assert table.wrap(300, 1000) == (300, 6 * ROW_HEIGHT)
+    assert table.split(300, 6 * ROW_HEIGHT) == [table]
+
+
+def test_split_repeats_header_and_fits_the_page():
+    table = make_table(20)
+    first, rest = table.split(300, 8.5 * ROW_HEIGHT)
+    assert first._row_indexes() == [0] + list(range(1, 8))
+    assert rest._row_indexes() == [0] + list(range(8, 21))
+    assert first.wrap(300, 0)[1] <= 8.5 * ROW_HEIGHT
+
+
+@pytest.mark.parametrize("page_rows", [2, 3, 7, 20])
+def test_pages_cover_every_row_once_in_order(page_rows):
+    pieces = paginate(make_table(50), page_rows * ROW_HEIGHT)
+    assert [i for piece in pieces for i in body_rows(piece)] == list(range(1, 51))
+    assert all(piece._row_indexes()[0] == 0 for piece in pieces)
+    assert all(piece.wrap(300, 0)[1] <= page_rows * ROW_HEIGHT for piece in pieces)
+
+
+def test_nothing_fits_below_header_plus_one_row():
+    table = make_table(5)
+    assert table.split(300, 2 * ROW_HEIGHT - 1) == []
+
+
+def test_keep_with_next_moves_the_break_up():
+    # Con 7 filas por página el corte cae después de la fila 7, que va pegada a la 8
+    table = make_table(20, row_options={7: {"keep_with_next": True}})
+    first, rest = table.split(300, 8 * ROW_HEIGHT)
+    assert body_rows(first) == list(range(1, 7))
+    assert body_rows(rest)[0] == 7
+
+
+def test_group_header_is_repeated_after_a_split():
+    table = make_table(20, row_options={i: {"group": 3} for i in range(4, 15)})
+    first, rest = table.split(300, 8 * ROW_HEIGHT)
+    assert body_rows(first) == list(range(1, 8))
+    assert rest._row_indexes() == [0, 3] + list(range(8, 21))
+    assert rest.wrap(300, 0)[1] == (2 + 13) * ROW_HEIGHT
+
+
+def test_pieces_share_the_measured_rows():
+    table = make_table(30)
+    first, rest = table.split(300, 10 * ROW_HEIGHT)
+    assert first._layout is table._layout is rest._layout
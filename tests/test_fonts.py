@@ -0,0 +1,48 @@
+import pickle
+from pathlib import Path
+
+import pytest
+from reportlab.pdfbase import ttfonts
+from reportlab.pdfbase.ttfonts import TTFont
+
+import main
+
+FONT = str(Path(main.__file__).parent / "fonts" / "DejaVuSans.ttf")
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "FONT_CACHE_DIR", tmp_path)
+    return tmp_path
+
+
+def test_font_matches_reportlab(cache_dir):
+    font = main.CachedTTFont("Prueba", FONT)
+    plain = TTFont("Prueba", FONT)
+    assert isinstance(font.face, main.CachedTTFontFace)
+    assert ttfonts.TTFontFace is main.TTFontFace
+    assert set(vars(font)) == set(vars(plain))
+    assert font.face.charWidths == plain.face.charWidths
+    assert list(cache_dir.glob("*.pickle"))
+
+
+@pytest.mark.parametrize("content", [b"", b"basura", pickle.dumps(ValueError), b"\x80\x05K"])
+def test_corrupt_cache_is_rebuilt(cache_dir, content):
+    main.CachedTTFontFace.load(FONT)
+    [cache_path] = cache_dir.glob("*.pickle")
+    cache_path.write_bytes(content)
+    face = main.CachedTTFontFace.load(FONT)
+    assert face.unitsPerEm == TTFont("Prueba", FONT).face.unitsPerEm
+    assert pickle.loads(cache_path.read_bytes())["unitsPerEm"] == face.unitsPerEm
+
+
+def test_face_is_set_when_reportlab_builds_its_own(cache_dir, monkeypatch):
+    # Una versión de ReportLab que no creara la cara con ttfonts.TTFontFace
+    original_init = TTFont.__init__
+
+    def init(self, name, filename, *args, **kwargs):
+        original_init(self, name, filename, *args, **kwargs)
+        self.face = main.TTFontFace(filename)
+
+    monkeypatch.setattr(TTFont, "__init__", init)
+    assert isinstance(main.CachedTTFont("Prueba", FONT).face, main.CachedTTFontFace)
@@ -0,0 +1,35 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "pdf_cache", main.ByteCache(main.PDF_CACHE_MAX_BYTES))
+    with TestClient(main.app) as client:
+        yield client
+
+
+def payload(folio):
+    data = main.warmup_report_data().model_dump()
+    data["organizacion"]["folio"] = folio
+    return data
+
+
+def test_miss_is_streamed_and_cached(client):
+    first = client.post("/generar-pdf", json=payload("S-1"))
+    assert first.headers["x-cache"] == "MISS"
+    assert int(first.headers["content-length"]) == len(first.content)
+    assert first.content.startswith(b"%PDF")
+
+    second = client.post("/generar-pdf", json=payload("S-1"))
+    assert second.headers["x-cache"] == "HIT"
+    assert second.content == first.content
+
+
+def test_pdf_larger_than_the_spool_skips_the_memory_cache(client, monkeypatch):
+    monkeypatch.setattr(main, "PDF_SPOOL_BYTES", 1024)
+    first = client.post("/generar-pdf", json=payload("S-2"))
+    assert int(first.headers["content-length"]) == len(first.content) > 1024
+    assert client.post("/generar-pdf", json=payload("S-2")).headers["x-cache"] == "MISS"
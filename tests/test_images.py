@@ -0,0 +1,45 @@
+import io
+
+from pypdf import PdfReader
+from reportlab.pdfgen.canvas import Canvas
+
+import main
+
+
+def render_logo(times=2):
+    asset = main.load_image_asset(main.LOGO_PATH, 100)
+    buffer = io.BytesIO()
+    canv = Canvas(buffer)
+    for _ in range(times):
+        for page in range(2):
+            main.AssetImage(asset, 100).drawOn(canv, 50, 50 + 150 * page)
+        canv.showPage()
+    canv.save()
+    return PdfReader(io.BytesIO(buffer.getvalue()))
+
+
+def image_xobjects(reader):
+    names = set()
+    for page in reader.pages:
+        xobjects = page["/Resources"]["/XObject"]
+        names.update(ref.idnum for ref in xobjects.values() if ref.get_object()["/Subtype"] == "/Image")
+    return names
+
+
+def test_asset_is_embedded_once_per_document():
+    assert len(image_xobjects(render_logo())) == 1
+
+
+def test_falls_back_to_draw_image_without_canvas_internals(monkeypatch):
+    asset = main.load_image_asset(main.LOGO_PATH, 100)
+    assert main.embed_image_asset(object(), asset) is False
+    monkeypatch.setattr(main, "embed_image_asset", lambda canv, asset: False)
+    reader = render_logo()
+    assert len(image_xobjects(reader)) == 1
+    assert len(reader.pages) == 2
+
+
+def test_image_dpi_changes_the_content_version(monkeypatch):
+    before = main.report_content_version()
+    monkeypatch.setattr(main, "PDF_IMAGE_DPI", main.PDF_IMAGE_DPI // 2)
+    assert main.report_content_version() != before
@@ -0,0 +1,120 @@
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+import ingest
+from ingest import JsonRecordStream, PersonalAggregator, iter_records
+
+RECORDS = [
+    {"sexo": "mujer", "puesto": "Dirección", "area": "Finanzas", "salario": 45000.5},
+    {"sexo": "H", "puesto": "Operativo", "salario": None},
+    {"sexo": "F", "puesto": "Operativo", "area": "Almacén [norte]", "nota": "año \"2024\", ñandú"},
+    {"sexo": "hombre", "puesto": "Dirección", "area": "Finanzas", "salario": 52000},
+]
+
+FORMATS = {
+    "ndjson": "\n".join(json.dumps(r, ensure_ascii=False) for r in RECORDS) + "\n",
+    "array": " [\n" + ",\n".join(json.dumps(r, ensure_ascii=False) for r in RECORDS) + "\n] \n",
+    "concatenated": "".join(json.dumps(r, ensure_ascii=False) for r in RECORDS),
+}
+
+
+def parse_split(data, cuts):
+    '''Feeds `data` cut at the given byte offsets and returns every record.'''
+    parser = JsonRecordStream()
+    records, start = [], 0
+    for cut in list(cuts) + [len(data)]:
+        records += parser.feed(data[start:cut])
+        start = cut
+    return records + parser.close()
+
+
+@pytest.mark.parametrize("kind", FORMATS)
+def test_every_single_cut(kind):
+    # Cortes dentro de strings, números, escapes y caracteres UTF-8 de varios bytes
+    data = FORMATS[kind].encode("utf-8")
+    for cut in range(len(data) + 1):
+        assert parse_split(data, [cut]) == RECORDS, cut
+
+
+@pytest.mark.parametrize("kind", FORMATS)
+def test_byte_by_byte(kind):
+    data = FORMATS[kind].encode("utf-8")
+    assert parse_split(data, range(1, len(data))) == RECORDS
+
+
+def test_records_come_out_as_soon_as_they_close():
+    line = json.dumps(RECORDS[0]).encode() + b"\n"
+    parser = JsonRecordStream()
+    assert parser.feed(line + line[:10]) == [RECORDS[0]]
+    assert parser.feed(line[10:]) == [RECORDS[0]]
+    assert parser.close() == []
+
+
+def test_utf8_bom_split_across_chunks():
+    data = "\ufeff".encode("utf-8") + FORMATS["array"].encode("utf-8")
+    assert parse_split(data, [1, 2]) == RECORDS
+
+
+def test_iter_records_with_small_chunks():
+    data = FORMATS["array"].encode("utf-8")
+    assert list(iter_records(io.BytesIO(data), chunk_size=3)) == RECORDS
+
+
+@pytest.mark.parametrize("data, message", [
+    (b'[{"a": 1},', "no está cerrado"),
+    (b'{"a": 1}\n{"a": ', "JSON inválido"),
+    (b'[{"a": 1}] {"b": 2}', "después del final"),
+])
+def test_malformed_streams(data, message):
+    with pytest.raises(ValueError, match=message):
+        parse_split(data, [len(data) // 2])
+
+
+def test_record_larger_than_the_limit(monkeypatch):
+    monkeypatch.setattr(ingest, "MAX_RECORD_CHARS", 16)
+    parser = JsonRecordStream()
+    with pytest.raises(ValueError, match="JSON inválido"):
+        parser.feed(b'{"texto": "' + b"x" * 32)
+
+
+def test_aggregation_does_not_depend_on_the_chunk_size():
+    data = ("\n".join(json.dumps(r) for r in RECORDS * 50)).encode("utf-8")
+    results = []
+    for chunk_size in (1, 7, len(data)):
+        aggregator = PersonalAggregator()
+        aggregator.extend(iter_records(io.BytesIO(data), chunk_size=chunk_size))
+        results.append(aggregator.result())
+    assert results[0] == results[1] == results[2]
+    assert results[0]["registros"] == 200
+    assert results[0]["composicion_sexo"][0] == {
+        "pregunta_texto": "Dirección", "descripcion": "Finanzas",
+        "cantidad_mujeres": 50, "cantidad_hombres": 50, "diferencia": 0,
+    }
+
+
+def test_brecha_por_genero_is_signed():
+    aggregator = PersonalAggregator()
+    aggregator.extend(RECORDS + [{"sexo": "mujer", "puesto": "Operativo"}])
+    result = aggregator.result()
+    assert result["brecha_por_genero"] == [
+        {"pregunta": "Dirección", "grupo_o_categoria": "Finanzas", "mujeres": 1, "hombres": 1, "brecha": 0},
+        {"pregunta": "Operativo", "grupo_o_categoria": "Total", "mujeres": 1, "hombres": 1, "brecha": 0},
+        {"pregunta": "Operativo", "grupo_o_categoria": "Almacén [norte]", "mujeres": 1, "hombres": 0, "brecha": -1},
+    ]
+    assert [row["diferencia"] for row in result["composicion_sexo"]] == [0, 0, 1]
+
+
+@pytest.mark.parametrize("records", [[], [{"sexo": "mujer"}], [{"puesto": "Operativo", "sexo": "otro"}]])
+def test_no_usable_records_is_an_error(records):
+    aggregator = PersonalAggregator()
+    aggregator.extend(records)
+    with pytest.raises(ValueError, match="Ningún registro"):
+        aggregator.result()
+
+
+def test_cli_rejects_a_pre_aggregated_file(capsys):
+    assert ingest.main_cli([str(Path(__file__).parent.parent / "data" / "encuestas_personal.json")]) == 1
+    assert "Ningún registro" in capsys.readouterr().err
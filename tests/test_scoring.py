@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from scoring import (BANDS, DIMENSION_THRESHOLDS, META_RATIO, SEMAFORO_THRESHOLDS, band_index, band_indices,
+                     score_reports)
+
+# Porcentajes justo antes, en y después de cada umbral (40, 70 y la meta de 80)
+EDGES = [0, 39.99, 40, 40.01, 49.99, 50, 69.99, 70, 70.01, 79.99, 80, 80.01, 100]
+
+
+def sub(total, atendidos, porcentaje=0.0):
+    return SimpleNamespace(total_indicadores=total, indicadores_atendidos=atendidos,
+                           meta_80=total * META_RATIO, porcentaje=porcentaje)
+
+
+def report(*dimensiones):
+    return SimpleNamespace(dimensiones=[SimpleNamespace(subdimensiones=list(subs)) for subs in dimensiones])
+
+
+@pytest.mark.parametrize("value, expected", [(39.99, "bajo"), (40, "medio"), (69.99, "medio"), (70, "alto")])
+def test_semaforo_edges(value, expected):
+    assert BANDS[band_index(value)] == expected
+
+
+@pytest.mark.parametrize("value, expected", [(49.99, "bajo"), (50, "medio"), (79.99, "medio"), (80, "alto")])
+def test_dimension_edges(value, expected):
+    assert BANDS[band_index(value, DIMENSION_THRESHOLDS)] == expected
+
+
+@pytest.mark.parametrize("thresholds", [SEMAFORO_THRESHOLDS, DIMENSION_THRESHOLDS])
+def test_band_indices_match_band_index(thresholds):
+    assert band_indices(np.array(EDGES), thresholds).tolist() == [band_index(v, thresholds) for v in EDGES]
+
+
+def test_subdimension_bands_match_band_index():
+    [scores] = score_reports([report([sub(10, 5, pct) for pct in EDGES])])
+    assert scores.sub_band.tolist() == [band_index(pct) for pct in EDGES]
+
+
+def test_dimension_percentages_hit_the_thresholds():
+    # 40%, 70% y 80% exactos por dimensión: la banda del gauge no debe caer por redondeo
+    [scores] = score_reports([report([sub(5, 2)], [sub(6, 4), sub(4, 3)], [sub(10, 8)], [sub(0, 0)])])
+    assert scores.dim_pct.tolist() == [40, 70, 80, 0]
+    assert [band_index(p) for p in scores.dim_pct] == [1, 2, 2, 0]
+    assert [band_index(p, DIMENSION_THRESHOLDS) for p in scores.dim_pct] == [0, 1, 2, 0]
+
+
+def test_batch_matches_scalar_scoring():
+    reports = [
+        report([sub(10, 7), sub(3, 0)], [sub(8, 8)]),
+        report(),
+        report([sub(0, 0)], [sub(5, 1), sub(5, 4), sub(2, 2)], [sub(4, 3)]),
+    ]
+    for data, scores in zip(reports, score_reports(reports)):
+        totals = [sum(s.total_indicadores for s in d.subdimensiones) for d in data.dimensiones]
+        attended = [sum(s.indicadores_atendidos for s in d.subdimensiones) for d in data.dimensiones]
+        assert scores.dim_total.tolist() == totals
+        assert scores.dim_atendidos.tolist() == attended
+        assert scores.dim_pct.tolist() == pytest.approx([a / t * 100 if t else 0 for a, t in zip(attended, totals)])
+        assert scores.total == sum(totals) and isinstance(scores.total, int)
+        assert scores.atendidos == sum(attended)
+        expected = sum(attended) / sum(totals) * 100 if sum(totals) else 0
+        assert scores.pct_vs_100 == pytest.approx(expected)
+        assert scores.pct_vs_80 == pytest.approx(expected / META_RATIO)
+
+
+def test_fractional_counts_are_kept():
+    [scores] = score_reports([report([sub(2.5, 1.25), sub(1, 0)])])
+    assert scores.total == 3.5
+    assert scores.atendidos == 1.25